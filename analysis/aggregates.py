@@ -0,0 +1,336 @@
+"""
+Materialized views of the analysis CSVs, for collect_informations.ipynb.
+Instead of rereading the CSVs and recomputing everything in every cell, the aggregates are kept in
+SQLite and updated incrementally: for each source CSV we remember the byte offset up to which it was
+consumed, and `update()` only parses the rows appended since. A source that was rewritten (smaller
+than the offset, or its first bytes changed) is consumed again from the start.
+
+Views:
+- yearly_counts      regressions per BIC year                 (regression, chain sources)
+- fix_periods        count per (repo, fix period in days)     (regression, chain sources)
+- fix_period_stats   n / mean / M2 of the fix period, Welford (regression, chain sources)
+                     -> Welch's t-test between regressions and regression chains
+- edge_counts        count per (bug0_types, bug1_types)       (memory source)
+Histograms, box plots, value counts and the Sankey-style map are drawn from these small tables.
+
+AGGREGATES_PATH -> location of the SQLite file (default: aggregates.sqlite)
+"""
+
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import sys
+from datetime import datetime
+
+# Shared helpers live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlite_store import SQLiteStore, shared
+
+ANALYSIS_DIR = os.path.dirname(os.path.abspath(__file__))
+AGGREGATES_PATH = os.getenv("AGGREGATES_PATH", "aggregates.sqlite")
+
+# source name -> CSV it is read from
+SOURCES = {
+    "regression": os.path.join(ANALYSIS_DIR, "regression_information.csv"),
+    "chain": os.path.join(ANALYSIS_DIR, "regression_chains_information.csv"),
+    "memory": os.path.join(os.path.dirname(ANALYSIS_DIR), "memory_related_chains_all_source.csv"),
+}
+# Bytes hashed to notice that a source was rewritten rather than appended to
+_PREFIX_BYTES = 1024
+
+
+def _complete_part(chunk: bytes) -> int:
+    """
+    Length of the part of `chunk` made of complete CSV records: up to the last newline that is not
+    inside a quoted field. The rest is left for the next update.
+    """
+    quotes = chunk.count(b'"')
+    end = len(chunk)
+    while True:
+        newline = chunk.rfind(b"\n", 0, end)
+        if newline < 0:
+            return 0
+        if (quotes - chunk.count(b'"', newline + 1)) % 2 == 0:
+            return newline + 1
+        end = newline
+
+
+def _prefix_hash(file, consumed: int) -> str:
+    file.seek(0)
+    return hashlib.sha1(file.read(min(consumed, _PREFIX_BYTES))).hexdigest()
+
+
+def _year(timestamp: str):
+    try:
+        return datetime.fromisoformat(timestamp.replace("Z", "")).year
+    except (ValueError, AttributeError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _merge_stats(n: int, mean: float, m2: float, values: list) -> tuple:
+    """
+    Welford / Chan: fold `values` into the running (n, mean, M2).
+    """
+    if not values:
+        return n, mean, m2
+    batch_n = len(values)
+    batch_mean = sum(values) / batch_n
+    batch_m2 = sum((value - batch_mean) ** 2 for value in values)
+    total = n + batch_n
+    delta = batch_mean - mean
+    return total, mean + delta * batch_n / total, m2 + batch_m2 + delta ** 2 * n * batch_n / total
+
+
+class AnalysisAggregates(SQLiteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sources (
+            name       TEXT PRIMARY KEY,
+            path       TEXT NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            prefix_hash TEXT NOT NULL,
+            header     TEXT NOT NULL,
+            row_count  INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS yearly_counts (
+            source TEXT NOT NULL,
+            year   INTEGER NOT NULL,
+            count  INTEGER NOT NULL,
+            PRIMARY KEY (source, year)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS fix_periods (
+            source     TEXT NOT NULL,
+            repo       TEXT NOT NULL,
+            fix_period INTEGER NOT NULL,
+            count      INTEGER NOT NULL,
+            PRIMARY KEY (source, repo, fix_period)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS fix_period_stats (
+            source TEXT PRIMARY KEY,
+            n      INTEGER NOT NULL,
+            mean   REAL NOT NULL,
+            m2     REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS edge_counts (
+            source TEXT NOT NULL,
+            bug0   TEXT NOT NULL,
+            bug1   TEXT NOT NULL,
+            count  INTEGER NOT NULL,
+            PRIMARY KEY (source, bug0, bug1)
+        ) WITHOUT ROWID;
+        """
+
+    def __init__(self, path: str = AGGREGATES_PATH, sources: dict = None):
+        super().__init__(path)
+        self.sources = sources or SOURCES
+
+    # ------------------ updates ------------------
+
+    def _reset(self, name: str):
+        for table in ("yearly_counts", "fix_periods", "fix_period_stats", "edge_counts"):
+            self._conn.execute(f"DELETE FROM {table} WHERE source = ?", (name,))
+        self._conn.execute("DELETE FROM sources WHERE name = ?", (name,))
+
+    def _apply(self, name: str, rows: list):
+        if name == "memory":
+            edges = {}
+            for row in rows:
+                key = (row.get("bug0_types") or "", row.get("bug1_types") or "")
+                edges[key] = edges.get(key, 0) + 1
+            self._conn.executemany(
+                "INSERT INTO edge_counts (source, bug0, bug1, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (source, bug0, bug1) DO UPDATE SET count = count + excluded.count",
+                [(name, bug0, bug1, count) for (bug0, bug1), count in edges.items()],
+            )
+            return
+
+        years, periods, values = {}, {}, []
+        for row in rows:
+            year = _year(row.get("BIC_time"))
+            if year is not None:
+                years[year] = years.get(year, 0) + 1
+            period = _int(row.get("fix_period"))
+            if period is not None:
+                key = (row.get("repo") or "", period)
+                periods[key] = periods.get(key, 0) + 1
+                values.append(period)
+        self._conn.executemany(
+            "INSERT INTO yearly_counts (source, year, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (source, year) DO UPDATE SET count = count + excluded.count",
+            [(name, year, count) for year, count in years.items()],
+        )
+        self._conn.executemany(
+            "INSERT INTO fix_periods (source, repo, fix_period, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source, repo, fix_period) DO UPDATE SET count = count + excluded.count",
+            [(name, repo, period, count) for (repo, period), count in periods.items()],
+        )
+        row = self._conn.execute("SELECT n, mean, m2 FROM fix_period_stats WHERE source = ?", (name,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fix_period_stats (source, n, mean, m2) VALUES (?, ?, ?, ?)",
+            (name, *_merge_stats(*(row or (0, 0.0, 0.0)), values)),
+        )
+
+    def _update_source(self, name: str) -> int:
+        path = self.sources[name]
+        if not os.path.isfile(path):
+            return 0
+        with open(path, "rb") as file:
+            state = self._conn.execute(
+                "SELECT byte_offset, prefix_hash, header, row_count FROM sources WHERE name = ?", (name,)
+            ).fetchone()
+            size = file.seek(0, os.SEEK_END)
+            if state is not None:
+                offset, old_hash, header, row_count = state
+                # Same start as when it was last read (hashed up to _PREFIX_BYTES of what was consumed)?
+                if size < offset or _prefix_hash(file, offset) != old_hash:
+                    print(f"[INFO] {path} was rewritten, rebuilding its aggregates")
+                    self._reset(name)
+                    state = None
+            if state is None:
+                offset, header, row_count = 0, None, 0
+            if size == offset:
+                return 0
+            file.seek(offset)
+            chunk = file.read(size - offset)
+            chunk = chunk[:_complete_part(chunk)]
+            prefix_hash = _prefix_hash(file, offset + len(chunk))
+
+        rows = list(csv.reader(io.StringIO(chunk.decode("utf-8"))))
+        if header is None:
+            if not rows:
+                return 0
+            header = json.dumps(rows.pop(0))
+        fieldnames = json.loads(header)
+        records = [dict(zip(fieldnames, row)) for row in rows if row]
+        self._apply(name, records)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sources (name, path, byte_offset, prefix_hash, header, row_count) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (name, path, offset + len(chunk), prefix_hash, header, row_count + len(records)),
+        )
+        return len(records)
+
+    def update(self, names=None) -> dict:
+        """
+        Fold the rows appended to the sources (all, or `names`) since the last update into the views.
+        Return the number of new rows per source.
+        """
+        added = {}
+        with self._lock:
+            for name in names or self.sources:
+                added[name] = self._update_source(name)
+                self._conn.commit()
+        return added
+
+    # ------------------ views ------------------
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def yearly_counts(self, source: str = "regression") -> dict:
+        return dict(self._query("SELECT year, count FROM yearly_counts WHERE source = ? ORDER BY year", (source,)))
+
+    def fix_period_counts(self, source: str = "regression", repo: str = None, max_period: int = None) -> dict:
+        """
+        {fix period: count}, over all repos or one; `max_period` keeps periods below it.
+        Draw histograms with plt.hist(list(counts), weights=list(counts.values()), ...).
+        """
+        sql = "SELECT fix_period, SUM(count) FROM fix_periods WHERE source = ?"
+        params = [source]
+        if repo is not None:
+            sql += " AND repo = ?"
+            params.append(repo)
+        if max_period is not None:
+            sql += " AND fix_period < ?"
+            params.append(max_period)
+        return dict(self._query(sql + " GROUP BY fix_period ORDER BY fix_period", params))
+
+    def fix_periods(self, source: str = "regression", repo: str = None) -> list:
+        """
+        All fix periods, expanded from the counts (for box plots).
+        """
+        return [period for period, count in self.fix_period_counts(source, repo).items() for _ in range(count)]
+
+    def repo_counts(self, source: str = "regression", min_count: int = 0) -> dict:
+        """
+        {repo: number of rows}, largest first.
+        """
+        return dict(self._query(
+            "SELECT repo, SUM(count) AS total FROM fix_periods WHERE source = ? GROUP BY repo "
+            "HAVING total >= ? ORDER BY total DESC, repo", (source, min_count),
+        ))
+
+    def fix_period_stats(self, source: str = "regression") -> tuple:
+        """
+        (n, mean, sample variance) of the fix period.
+        """
+        rows = self._query("SELECT n, mean, m2 FROM fix_period_stats WHERE source = ?", (source,))
+        if not rows:
+            return 0, 0.0, 0.0
+        n, mean, m2 = rows[0]
+        return n, mean, m2 / (n - 1) if n > 1 else 0.0
+
+    def welch_ttest(self, a: str = "regression", b: str = "chain") -> tuple:
+        """
+        Welch's t-test on the fix periods of two sources, from the running stats: (t, p).
+        p needs scipy (the notebook has it); without it p is None.
+        """
+        n1, mean1, var1 = self.fix_period_stats(a)
+        n2, mean2, var2 = self.fix_period_stats(b)
+        se1, se2 = var1 / n1, var2 / n2
+        t_stat = (mean1 - mean2) / math.sqrt(se1 + se2)
+        try:
+            from scipy.stats import t as student_t
+        except ImportError:
+            return t_stat, None
+        dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+        return t_stat, 2 * student_t.sf(abs(t_stat), dof)
+
+    def edge_counts(self, source: str = "memory") -> list:
+        """
+        [(bug0_types, bug1_types, count)], as grouped by generate_map.
+        """
+        return self._query(
+            "SELECT bug0, bug1, count FROM edge_counts WHERE source = ? ORDER BY bug0, bug1", (source,)
+        )
+
+    def type_counts(self, side: str = "bug0", source: str = "memory") -> dict:
+        """
+        {bug type: count} of one side of the edges ("bug0" or "bug1"), largest first.
+        """
+        if side not in ("bug0", "bug1"):
+            raise ValueError(f"Unknown side {side}")
+        return dict(self._query(
+            f"SELECT {side}, SUM(count) AS total FROM edge_counts WHERE source = ? GROUP BY {side} "
+            f"ORDER BY total DESC, {side}", (source,),
+        ))
+
+
+@shared
+def _shared_aggregates() -> AnalysisAggregates:
+    return AnalysisAggregates()
+
+
+def get_aggregates(update: bool = True) -> AnalysisAggregates:
+    """
+    Open the shared aggregates lazily; by default fold in whatever was appended to the sources.
+    """
+    aggregates = _shared_aggregates()
+    if update:
+        aggregates.update()
+    return aggregates
+
+
+if __name__ == "__main__":
+    for name, count in get_aggregates(update=False).update().items():
+        print(f"[INFO] {name}: {count} new row(s)")
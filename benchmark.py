@@ -0,0 +1,279 @@
+"""
+Offline benchmark of the collection stages, on fixed fixtures served by the replay stub (replay.py).
+Each stage runs in its own process, with empty caches and its own working directory, against the same
+inputs every time:
+    collect_all_regression, collect_regression_chain, filter_commits,
+    collect_memory_related_regression, collect_regression_information
+and reports seconds, rows / second, requests served by the stub, and the stage's own run metrics
+(cache outcomes, retries, sleeps; see metrics.py). Results go to a JSON file; with --baseline, the
+previous results are shown next to the new ones, to compare two versions of the scripts.
+
+Fixtures are a directory with
+- cassette.jsonl         responses to serve (recorded with GITHUB_RECORD_PATH, or generated)
+- repos.txt              repos to scan, one per line
+- regressions.csv        repo, BFC_sha, BIC_sha: input of the chain / filter / memory stages
+- regression_commits_tail.csv   repo, BIC_sha, BFC_sha: input of collect_regression_information
+Without --fixtures, a synthetic set is generated (--repos x --commits); it includes a 403 with
+rate limit reset, 202 stats answers, missing commits (422) and missing issues (404).
+
+python benchmark.py [--fixtures DIR] [--repos 3] [--commits 400] [--max-in-flight 1]
+                    [--stages a,b] [--output benchmark_results.json] [--baseline old.json]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from replay import ReplayServer, make_entry, write_cassette
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = [
+    "collect_all_regression",
+    "collect_regression_chain",
+    "filter_commits",
+    "collect_memory_related_regression",
+    "collect_regression_information",
+]
+# Name each stage reports its rows under in the run metrics
+METRIC_STAGES = {
+    "collect_all_regression": "regressions",
+    "collect_regression_chain": "chains",
+    "filter_commits": "filtered",
+    "collect_memory_related_regression": "memory",
+    "collect_regression_information": "information",
+}
+
+
+# ------------------ SYNTHETIC FIXTURES ------------------
+
+def _sha(repo: str, index: int) -> str:
+    return hashlib.sha1(f"{repo}:{index}".encode()).hexdigest()
+
+
+def _commit(repo: str, index: int, message: str, files: list) -> dict:
+    date = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_600_000_000 - index * 3600))
+    return {
+        "sha": _sha(repo, index),
+        "commit": {"message": message, "author": {"date": date}, "committer": {"date": date}},
+        "files": files,
+    }
+
+
+def synthetic_fixtures(directory: str, repos: int = 3, commits: int = 400, per_page: int = 100):
+    """
+    Write a fixture set: every 10th commit fixes a regression introduced 5 commits earlier;
+    those BICs are fixes themselves (chains) and name a memory bug and an issue.
+    """
+    os.makedirs(directory, exist_ok=True)
+    entries, regressions = [], []
+    for repo_index in range(repos):
+        repo = f"bench/repo{repo_index}"
+        listing = []
+        for index in range(commits):
+            files = [{"filename": f"src/module{index % 4}.c", "additions": index % 7 + 1, "deletions": index % 3,
+                      "changes": index % 7 + 1 + index % 3},
+                     {"filename": "include/module.h", "additions": 1, "deletions": 0, "changes": 1}]
+            if index % 10 == 0 and index + 5 < commits:
+                bic = _sha(repo, index + 5)[:9]
+                message = f"Fix crash in the parser\n\nThis was introduced in 2.1, introduced by {bic}"
+                regressions.append((repo, _sha(repo, index), bic))
+            elif index % 10 == 5:
+                # Issue numbers divisible by 3 don't exist (404)
+                message = f"Fix use after free in buffer handling, fixes #{index}"
+                entries.append(make_entry("GET", f"/repos/{repo}/issues/{index}", 404, {"message": "Not Found"})
+                               if index % 3 == 0 else
+                               make_entry("GET", f"/repos/{repo}/issues/{index}", 200,
+                                          {"title": "Heap use after free", "body": "ASan: heap-use-after-free"}))
+                if index % 20 == 15:
+                    # Every other BIC touches no C file
+                    files = [{"filename": "docs/index.md", "additions": 2, "deletions": 1, "changes": 3}]
+            elif index == 3:
+                # A regression pointing at a commit GitHub doesn't know
+                message = "Revert change, introduced in 2.0, introduced by deadbeef0"
+            else:
+                message = f"Refactor module {index % 4}"
+            commit = _commit(repo, index, message, files)
+            listing.append({key: value for key, value in commit.items() if key != "files"})
+            entries.append(make_entry("GET", f"/repos/{repo}/commits/{commit['sha']}", 200, commit,
+                                      headers={"ETag": f'"{commit["sha"][:12]}"'}))
+            if index % 10 == 5:
+                entries.append(make_entry("GET", f"/repos/{repo}/commits/{commit['sha'][:9]}", 200, commit))
+        entries.append(make_entry("GET", f"/repos/{repo}/commits/deadbeef0", 422,
+                                  {"message": "No commit found for SHA: deadbeef0"}))
+
+        pages = [listing[start:start + per_page] for start in range(0, len(listing), per_page)] + [[]]
+        for page, items in enumerate(pages, start=1):
+            query = f"per_page={per_page}&page={page}"
+            if repo_index == 0 and page == 1:
+                # The first listing is throttled once: rate limit exhausted, reset 1s later
+                entries.append(make_entry("GET", f"/repos/{repo}/commits", 403,
+                                          {"message": "API rate limit exceeded"}, query,
+                                          headers={"X-RateLimit-Remaining": "0"}, reset_in=1))
+            entries.append(make_entry("GET", f"/repos/{repo}/commits", 200, items, query,
+                                      headers={"X-RateLimit-Remaining": "4999"}))
+
+        entries.append(make_entry("GET", f"/repos/{repo}", 200,
+                                  {"full_name": repo, "stargazers_count": 1000, "default_branch": "main"}))
+        entries.append(make_entry("GET", f"/repos/{repo}/languages", 200, {"C": 250000 * (repo_index + 1)}))
+        entries.append(make_entry("GET", f"/repos/{repo}/stats/contributors", 202, {}))
+        entries.append(make_entry("GET", f"/repos/{repo}/stats/contributors", 200, [{"total": commits}]))
+
+    write_cassette(os.path.join(directory, "cassette.jsonl"), entries)
+    with open(os.path.join(directory, "repos.txt"), "w", encoding="utf-8") as file:
+        file.write("".join(f"bench/repo{repo_index}\n" for repo_index in range(repos)))
+    with open(os.path.join(directory, "regressions.csv"), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["repo", "BFC_sha", "BIC_sha"])
+        writer.writerows(regressions)
+    with open(os.path.join(directory, "regression_commits_tail.csv"), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["repo", "BIC_sha", "BFC_sha"])
+        writer.writerows((repo, bic, bfc) for repo, bfc, bic in regressions)
+
+
+# ------------------ STAGES (run in a child process) ------------------
+
+def run_stage(stage: str, fixtures: str, max_commits: int):
+    """
+    Run one stage in the current directory; env (API URL, caches, metrics) is set by the parent.
+    """
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, "analysis"))
+    for name in ("regressions.csv", "regression_commits_tail.csv"):
+        shutil.copy(os.path.join(fixtures, name), name)
+
+    if stage == "collect_all_regression":
+        from collect_regression_commits import collect_all_regression
+        with open(os.path.join(fixtures, "repos.txt"), "r", encoding="utf-8") as file:
+            for repo in file.read().split():
+                collect_all_regression(repo, max_commits=max_commits, output_file="regression_commits_all.csv")
+    elif stage == "collect_regression_chain":
+        from collect_regression_commits import collect_regression_chain
+        collect_regression_chain("regressions.csv")
+    elif stage == "filter_commits":
+        import filter_commits
+        filter_commits.main("regressions.csv")
+    elif stage == "collect_memory_related_regression":
+        from collect_memory_related_chains import collect_memory_related_regression
+        collect_memory_related_regression("regressions.csv", "memory_related_chains.csv")
+    elif stage == "collect_regression_information":
+        from collect_regression_imformation import collect_regression_information
+        collect_regression_information()
+    else:
+        raise ValueError(f"Unknown stage {stage}")
+
+
+# ------------------ DRIVER ------------------
+
+def bench_stage(stage: str, fixtures: str, server: ReplayServer, workdir: str, max_in_flight: int,
+                max_commits: int) -> dict:
+    stage_dir = os.path.join(workdir, stage)
+    os.makedirs(stage_dir)
+    env = dict(
+        os.environ,
+        GITHUB_API_URL=server.url,
+        GITHUB_TOKEN="replay",
+        GITHUB_TOKENS="",
+        GITHUB_MAX_IN_FLIGHT=str(max_in_flight),
+        METRICS_DIR=stage_dir,
+        METRICS_INTERVAL="0",
+        GITHUB_RECORD_PATH="",
+        **{name: os.path.join(stage_dir, f"{name.lower()}.sqlite") for name in (
+            "GITHUB_CACHE_PATH", "COMMIT_FACTS_PATH", "SHA_INDEX_PATH", "SCAN_STATE_PATH", "REPO_METADATA_PATH",
+        )},
+    )
+    # Each stage sees the cassette from the start, whatever ran before it
+    server.rewind()
+    server.reset_counts()
+    start = time.monotonic()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--fixtures", fixtures,
+         "--max-commits", str(max_commits)],
+        cwd=stage_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    seconds = time.monotonic() - start
+    if result.returncode != 0:
+        print(result.stderr)
+        raise RuntimeError(f"Stage {stage} failed")
+
+    with open(os.path.join(stage_dir, "run_metrics.json"), "r", encoding="utf-8") as file:
+        metrics = json.load(file)
+    rows = metrics["stages"].get(METRIC_STAGES[stage], {}).get("rows", 0)
+    return {
+        "seconds": round(seconds, 3),
+        "rows": rows,
+        "rows_per_second": round(rows / seconds, 3) if seconds else 0,
+        "requests": sum(server.statuses.values()),
+        "statuses": {str(status): count for status, count in sorted(server.statuses.items())},
+        "unmatched": sum(server.unmatched.values()),
+        "cpu_seconds": metrics["cpu_seconds"],
+        "request_seconds": metrics["request_seconds"],
+        "cache": metrics["cache"],
+        "retries": metrics["retries"],
+        "sleep_seconds": metrics["sleep_seconds"],
+    }
+
+
+def print_report(results: dict, baseline: dict = None):
+    print(f"{'stage':<36}{'seconds':>9}{'rows':>7}{'rows/s':>10}{'requests':>10}")
+    for stage, result in results.items():
+        print(f"{stage:<36}{result['seconds']:>9.2f}{result['rows']:>7}{result['rows_per_second']:>10.1f}"
+              f"{result['requests']:>10}")
+        previous = (baseline or {}).get(stage)
+        if previous:
+            print(f"{'  baseline':<36}{previous['seconds']:>9.2f}{previous['rows']:>7}"
+                  f"{previous['rows_per_second']:>10.1f}{previous['requests']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the collection stages")
+    parser.add_argument("--fixtures", help="fixture directory (default: generate synthetic fixtures)")
+    parser.add_argument("--repos", type=int, default=3)
+    parser.add_argument("--commits", type=int, default=400)
+    parser.add_argument("--max-commits", type=int, default=500, help="regressions kept per repo")
+    parser.add_argument("--max-in-flight", type=int, default=1)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results of a previous run to compare with")
+    parser.add_argument("--run-stage", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage(args.run_stage, args.fixtures, args.max_commits)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        fixtures = os.path.abspath(args.fixtures) if args.fixtures else os.path.join(workdir, "fixtures")
+        if not args.fixtures:
+            synthetic_fixtures(fixtures, args.repos, args.commits)
+        results = {}
+        with ReplayServer(os.path.join(fixtures, "cassette.jsonl")) as server:
+            for stage in args.stages.split(","):
+                print(f"[INFO] Benchmarking {stage} ...")
+                results[stage] = bench_stage(stage, fixtures, server, workdir, args.max_in_flight, args.max_commits)
+                if results[stage]["unmatched"]:
+                    print(f"[WARN] {stage}: {results[stage]['unmatched']} request(s) missing from the cassette")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["stages"]
+    print_report(results, baseline)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({"max_in_flight": args.max_in_flight, "stages": results}, file, indent=2)
+    print(f"[INFO] Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
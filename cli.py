@@ -0,0 +1,183 @@
+"""
+One entry point for every stage of the collection flow and the local helpers:
+
+    python cli.py projects      [--output projects3.csv] [--input projects.csv] [--filtered filtered_projects3.csv]
+    python cli.py regressions   [--projects filtered_projects3.csv] [--output regression_commits_all_3.csv]
+                                [--chains regression_chains3.csv] [--workers N] [--no-state]
+    python cli.py chains        [--input regression_commits_all_3.csv] [--output regression_chains3.csv]
+    python cli.py filter        [--input regression_commits.csv] [--output regression_commits_filtered.csv]
+    python cli.py memory        [--input regression_commits_all_3.csv] [--output memory_related_chains_3.csv]
+    python cli.py information   [--input regression_commits_tail.csv] [--output regression_information.csv]
+    python cli.py pipeline      [--projects filtered_projects.csv] [--output pipeline_output/regression_information.csv]
+    python cli.py dedup         [--input regression_chains.csv] [--output regression_chains_de.csv]
+    python cli.py graph         [--input regression_commits.csv] [--output regression_chains_graph.csv]
+    python cli.py aggregates
+    python cli.py classify      [TEXT ...]   (reads stdin without TEXT)
+
+Defaults are the paths the scripts used as `__main__`. The stages that read commits take
+--source api|git|graphql (default: COMMIT_SOURCE) and --max-in-flight (default: GITHUB_MAX_IN_FLIGHT).
+Each command imports its module when it runs, so requests / pandas are only loaded by the commands
+that need them, and the GitHub token is only looked up on the first live request: `classify`, `dedup`
+and `graph` run without a token or a network.
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _commit_source(args):
+    from commit_source import get_commit_source
+    return get_commit_source(args.source)
+
+
+def cmd_projects(args):
+    from collect_projects import collect_projects, filter_projects
+    if not args.skip_search:
+        collect_projects(args.output)
+    filter_projects(args.input, args.filtered, args.min_commits, args.max_commits)
+
+
+def cmd_regressions(args):
+    from collect_regression_commits import main
+    from scan_state import ScanState
+    main(args.projects, source=_commit_source(args), max_in_flight=args.max_in_flight,
+         state=None if args.no_state else ScanState(), workers=args.workers,
+         regressions_path=args.output, chains_path=args.chains)
+
+
+def cmd_chains(args):
+    from collect_regression_commits import collect_regression_chain
+    collect_regression_chain(args.input, source=_commit_source(args), max_in_flight=args.max_in_flight,
+                             output_file=args.output)
+
+
+def cmd_filter(args):
+    from filter_commits import main
+    main(args.input, source=_commit_source(args), max_in_flight=args.max_in_flight, output_path=args.output)
+
+
+def cmd_memory(args):
+    from collect_memory_related_chains import collect_memory_related_regression
+    collect_memory_related_regression(args.input, args.output, source=_commit_source(args),
+                                      max_in_flight=args.max_in_flight)
+
+
+def cmd_information(args):
+    sys.path.insert(0, os.path.join(ROOT, "analysis"))
+    from collect_regression_imformation import collect_regression_information
+    collect_regression_information(source=_commit_source(args), max_in_flight=args.max_in_flight,
+                                   input_path=args.input, output_path=args.output)
+
+
+def cmd_pipeline(args):
+    from pipeline import main
+    main(args.projects, args.output, materialize_dir=args.materialize_dir)
+
+
+def cmd_dedup(args):
+    from entry_deduplicate import deduplicate_commits_csv
+    from sha_index import get_sha_index
+    # Short and full SHAs of a commit are treated as the same
+    deduplicate_commits_csv(args.input, args.output, index=get_sha_index())
+
+
+def cmd_graph(args):
+    from regression_graph import get_regression_graph
+    graph = get_regression_graph()
+    print(f"[INFO] {graph.update_from_csv(args.input)} new regression edge(s)")
+    lengths = graph.write_chains(args.output, min_length=args.min_length)
+    for length, count in sorted(lengths.items()):
+        print(f"[INFO] {count} chain(s) of length {length}")
+
+
+def cmd_aggregates(args):
+    sys.path.insert(0, os.path.join(ROOT, "analysis"))
+    from aggregates import get_aggregates
+    for name, count in get_aggregates(update=False).update().items():
+        print(f"[INFO] {name}: {count} new row(s)")
+
+
+def cmd_classify(args):
+    from collect_memory_related_chains import match_memory_bug_type
+    texts = args.text or [sys.stdin.read()]
+    for text in texts:
+        print("; ".join(match_memory_bug_type(text)))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Regression / memory bug collection from GitHub")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def command(name, func, help, commits=False):
+        sub = commands.add_parser(name, help=help)
+        sub.set_defaults(func=func)
+        if commits:
+            sub.add_argument("--source", choices=["api", "git", "graphql"],
+                             help="where commits are read from (default: COMMIT_SOURCE, else api)")
+            sub.add_argument("--max-in-flight", type=int, help="concurrent lookups (default: GITHUB_MAX_IN_FLIGHT)")
+        return sub
+
+    sub = command("projects", cmd_projects, "search C projects and filter them by commit count")
+    sub.add_argument("--output", default="projects3.csv")
+    sub.add_argument("--input", default="projects.csv", help="projects CSV to filter")
+    sub.add_argument("--filtered", default="filtered_projects3.csv")
+    sub.add_argument("--min-commits", type=int, default=200)
+    sub.add_argument("--max-commits", type=int, default=50000)
+    sub.add_argument("--skip-search", action="store_true", help="only filter an existing projects CSV")
+
+    sub = command("regressions", cmd_regressions, "scan projects for regressions, then find chains", commits=True)
+    sub.add_argument("--projects", default="filtered_projects3.csv")
+    sub.add_argument("--output", default="regression_commits_all_3.csv")
+    sub.add_argument("--chains", default="regression_chains3.csv")
+    sub.add_argument("--workers", type=int, default=int(os.getenv("SCAN_WORKERS", 0)),
+                     help="scan processes, 0 to only find chains (default: SCAN_WORKERS)")
+    sub.add_argument("--no-state", action="store_true", help="rescan every repo from scratch")
+
+    sub = command("chains", cmd_chains, "keep the regressions whose BIC is itself a fix", commits=True)
+    sub.add_argument("--input", default="regression_commits_all_3.csv")
+    sub.add_argument("--output", default="regression_chains3.csv")
+
+    sub = command("filter", cmd_filter, "keep the pairs whose BIC and BFC both change C files", commits=True)
+    sub.add_argument("--input", default="regression_commits.csv")
+    sub.add_argument("--output", default="regression_commits_filtered.csv")
+
+    sub = command("memory", cmd_memory, "classify the memory bug types of the BICs", commits=True)
+    sub.add_argument("--input", default="regression_commits_all_3.csv")
+    sub.add_argument("--output", default="memory_related_chains_3.csv")
+
+    sub = command("information", cmd_information, "collect the lifecycle information of regressions", commits=True)
+    sub.add_argument("--input", default="regression_commits_tail.csv")
+    sub.add_argument("--output", default="regression_information.csv")
+
+    sub = command("pipeline", cmd_pipeline, "run every stage as one streaming pipeline")
+    sub.add_argument("--projects", default="filtered_projects.csv")
+    sub.add_argument("--output", default="pipeline_output/regression_information.csv")
+    sub.add_argument("--materialize-dir", default="pipeline_output", help='"" to skip the per-stage CSVs')
+
+    sub = command("dedup", cmd_dedup, "remove duplicate (repo, SHA, SHA) rows, short SHAs included")
+    sub.add_argument("--input", default="regression_chains.csv")
+    sub.add_argument("--output", default="regression_chains_de.csv")
+
+    sub = command("graph", cmd_graph, "regression chains of any length from the regression graph")
+    sub.add_argument("--input", default="regression_commits.csv")
+    sub.add_argument("--output", default="regression_chains_graph.csv")
+    sub.add_argument("--min-length", type=int, default=2)
+
+    command("aggregates", cmd_aggregates, "fold new analysis CSV rows into the notebook aggregates")
+
+    sub = command("classify", cmd_classify, "print the memory bug types matched in texts")
+    sub.add_argument("text", nargs="*", help="texts to classify (default: read stdin)")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,15 +12,16 @@ So far we considering bug types as follows:
 
 import csv
 import re
-import os
-import requests
-import time
 
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    raise ValueError("Please set the GITHUB_TOKEN environment variable")
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
 
-HEADERS = {"Authorization": f"token {GITHUB_TOKEN}"}
+from commit_facts import get_commit_facts
+from commit_source import get_commit_source
+from concurrent_enrich import run_ordered
+from issue_resolver import fetch_issue_text, get_issue_resolver
 
 ########################################################################
 # - Use r"heap(?:\W+\w+){0,5}\W+overflow" to limit how far apart the words can be. Here we set 5.
@@ -108,37 +109,102 @@ memory_bug_patterns = {
     ],
 }
 
+def _required_literals(parsed):
+    """
+    Return a set of lowercase strings of which at least one must occur in any text `parsed` matches,
+    or None if no such set can be derived. Used to skip patterns cheaply before running the regex.
+    """
+    best = None
+    run = ""
+    candidates = []
+    for op, av in list(parsed) + [(None, None)]:
+        if op is sre_parse.LITERAL:
+            run += chr(av).lower()
+            continue
+        if run:
+            candidates.append({run})
+            run = ""
+        if op is sre_parse.SUBPATTERN:
+            candidates.append(_required_literals(av[-1]))
+        elif op is sre_parse.BRANCH:
+            options = [_required_literals(branch) for branch in av[1]]
+            if all(options):
+                candidates.append(set().union(*options))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            candidates.append(_required_literals(av[2]))
+    for options in candidates:
+        # Prefer the requirement whose shortest option is longest, i.e. the most selective one
+        if options and (best is None or min(map(len, options)) > min(map(len, best))):
+            best = options
+    return best
+
+class MemoryBugClassifier:
+    """
+    All bug type patterns compiled once, each with the literal words it requires (e.g. "overflow", "leak").
+    For every text, only patterns whose required words occur in it (a cheap substring test) are run,
+    and a bug type stops being searched as soon as one of its patterns matched.
+    Returns exactly the labels of the per-pattern loop, in the order of `patterns`.
+    """
+
+    def __init__(self, patterns: dict = None):
+        patterns = memory_bug_patterns if patterns is None else patterns
+        self.bug_types = list(patterns.keys())
+        # One entry per pattern: (bug type index, compiled regex, required literals or None)
+        self._patterns = []
+        for type_index, type_patterns in enumerate(patterns.values()):
+            for pattern in type_patterns:
+                try:
+                    literals = _required_literals(sre_parse.parse(pattern, re.IGNORECASE))
+                except Exception:
+                    # Unknown construct: always run this pattern
+                    literals = None
+                # re.IGNORECASE might overlap with text.lower() but it keeps e.g. "SIGSEGV" matching
+                self._patterns.append((type_index, re.compile(pattern, flags=re.IGNORECASE), literals))
+
+    def classify(self, text: str) -> list:
+        """
+        Return matched bug types from a commit message or bug report content.
+        """
+        lower_text = text.lower()
+        # With IGNORECASE some non-ASCII characters fold onto ASCII letters (e.g. "\u017f" matches "s"),
+        # so the substring prefilter is only safe for ASCII text.
+        prefilter = lower_text.isascii()
+        matched = set()
+        for type_index, regex, literals in self._patterns:
+            if type_index in matched:
+                continue
+            if prefilter and literals is not None and not any(literal in lower_text for literal in literals):
+                continue
+            if regex.search(lower_text):
+                matched.add(type_index)
+        return [self.bug_types[i] for i in sorted(matched)]
+
+    def classify_many(self, texts) -> list:
+        """
+        Classify a batch of texts, e.g. all stored messages after the taxonomy changed.
+        """
+        return [self.classify(text) for text in texts]
+
+_default_classifier = None
+
 def match_memory_bug_type(text: str):
     """
     Return matched bug types from a commit message or bug report content.
 
     Each 'bug_type' might have multiple possible regex patterns.
+    Avoid labeling the same bug_type multiple times, but different types can be labeled on the same commit.
     """
-    matched = []
-    lower_text = text.lower()
-    for bug_type, patterns in memory_bug_patterns.items():
-        for pattern in patterns:
-            # re.IGNORECASE might overlap with text.lower() but it's fine
-            if re.search(pattern, lower_text, flags=re.IGNORECASE):
-                matched.append(bug_type)
-                # Avoid labeling the same bug_type multiple times, but different types can be labeled on the same commit
-                break 
-    return matched
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = MemoryBugClassifier()
+    return _default_classifier.classify(text)
 
 def fetch_commit_message(repo: str, sha: str) -> str:
     """
     Fetch the commit message for a given (repo, commit SHA).
     """
-    url = f"https://api.github.com/repos/{repo}/commits/{sha}"
-    response = requests.get(url, headers=HEADERS)
-    while response.status_code == 403:  # Rate limit
-        print("[WAIT] Rate limit hit. Sleeping for 60s...")
-        time.sleep(60)
-        response = requests.get(url, headers=HEADERS)
-    if response.status_code != 200:
-        print(f"[ERROR] Could not fetch commit {sha} from {repo}")
-        return ""
-    return response.json().get("commit", {}).get("message", "") or ""
+    facts = get_commit_facts().ensure(repo, sha)
+    return facts["message"] if facts else ""
 
 # def fetch_linked_issue_content(commit_msg: str, repo: str) -> str:
 #     """
@@ -172,70 +238,53 @@ def fetch_issue_content(repo: str, issue_number: str) -> str:
     Fetch the title and body of a GitHub issue (or PR) from the same or a specified repo.
     Return the combined title + body string.
     """
-    url = f"https://api.github.com/repos/{repo}/issues/{issue_number}"
-    response = requests.get(url, headers=HEADERS)
-    while response.status_code == 403:  # Rate limit
-        print("[WAIT] Rate limit hit. Sleeping for 60s...")
-        time.sleep(60)
-        response = requests.get(url, headers=HEADERS)
-    if response.status_code != 200:
-        print(f"[WARN] Could not fetch issue/PR #{issue_number} from {repo}")
-        return ""
-
-    data = response.json()
-    issue_title = data.get("title") or ""
-    issue_body = data.get("body") or ""
-    
-    combined_issue_text = issue_title + "\n" + issue_body
-    return combined_issue_text
+    return fetch_issue_text(f"{repo}#{issue_number}")
 
 
 def fetch_linked_issue_content(commit_msg: str, repo: str) -> str:
     """
-    1) Try to find the FIRST GitHub issue or PR link in the commit message
-       matching https://github.com/<owner>/<repo>/(issues|pull)/<number>
-       and return its content.
-    2) If no direct link is found, look for references of the form:
-         fix #123, fixes #123, close #123, closes #123, etc.
-       in the same repo, and fetch that issue content.
+    Return the content of ALL issues / PRs the commit message references:
+    1) GitHub issue or PR links https://github.com/<owner>/<repo>/(issues|pull)/<number>
+    2) references of the form fix #123, fixes #123, close #123, closes #123, etc. in the same repo.
+    Each issue is fetched once per run (see issue_resolver.py).
     """
-    # 1) Check for direct GitHub issue/PR link
-    issue_match = re.search(
-        r"https://github\.com/([\w\-_]+)/([\w\-_]+)/(issues|pull)/(\d+)", 
-        commit_msg, 
-        flags=re.IGNORECASE
-    )
-    if issue_match:
-        gh_user_or_org, gh_repo_name, issue_type, number = issue_match.groups()
-        repo_full = f"{gh_user_or_org}/{gh_repo_name}"
-        print(f"[INFO] Fetched linked {issue_type} #{number} from {repo_full}")
-        return fetch_issue_content(repo_full, number)
-    
-    # 2) If no direct link, try references like "fix #123" or "closes #123" for the SAME repo
-    #    We'll capture variations: fix, fixes, fixed, close, closes, closed, resolve, resolves, resolved
-    issue_reference_match = re.search(
-        r"(?:fix(?:ed|es)?|close(?:d|s)?|resolve(?:d|s)?)\s*#(\d+)",
-        commit_msg, 
-        flags=re.IGNORECASE
-    )
-    if issue_reference_match:
-        number = issue_reference_match.group(1)
-        # print(f"[INFO] Found commit message referencing issue #{number} in {repo}")
-        return fetch_issue_content(repo, number)
-    
-    # If nothing is found, return empty
-    return ""
+    return get_issue_resolver().text_for_message(commit_msg, repo)
+
+def classify_regression_row(row, source=None):
+    """
+    Fetch the BIC message (+ linked issue text) of one [repo, BFC_sha, BIC_sha] row
+    and return the matched memory bug types (empty list if none).
+    """
+    repo, bfc_sha, bic_sha = row
+    print(f"[INFO] Checking {repo} BIC: {bic_sha}")
+
+    facts = get_commit_facts().ensure(repo, bic_sha, source)
+    commit_msg = facts["message"] if facts else ""
+    if not commit_msg:
+        return []
+
+    # Check linked bug content in commit message (references were extracted with the facts)
+    linked_bug_text = get_issue_resolver().text(facts["issue_refs"])
+    # if linked_bug_text:
+    #     print(f"  -> Linked issue text: {linked_bug_text[:50]}...")  # Debug
+
+    # Combine commit message + linked issue text
+    combined_text = commit_msg + "\n" + linked_bug_text
+
+    # Identify bug types
+    return match_memory_bug_type(combined_text)
 
-def collect_memory_related_regression(csv_path: str, output_path: str):
+def collect_memory_related_regression(csv_path: str, output_path: str, source=None, max_in_flight=None):
     """
     `regresion_commit_all.csv` is in the format:
         repo, BFC_sha, BIC_sha
     For each row:
-      1) Fetch BIC commit message
-      2) Attempt to fetch linked issue text
+      1) Fetch BIC commit message (commit facts table, filled from `source` if given, else the GitHub API)
+      2) Attempt to fetch linked issue text (all referenced issues of the batch, deduplicated)
       3) Match memory bug types
       4) If matched, write to `output_path`
          Format: [repo, BIC_sha, bug_types, BFC_sha]
+    `max_in_flight` > 1 classifies that many rows concurrently; rows are still written in input order.
     """
     with open(csv_path, "r", newline="", encoding="utf-8") as infile, \
          open(output_path, "w", newline="", encoding="utf-8") as outfile:
@@ -244,28 +293,9 @@ def collect_memory_related_regression(csv_path: str, output_path: str):
         writer = csv.writer(outfile)
         writer.writerow(["repo", "BIC_sha", "bug_types", "linked_BFC_sha"])
 
-        next(reader, None)  # regresion_commit_all.csv contains first row, so skip it
-        for row in reader:
-            if len(row) < 3:
-                continue
-            repo, bfc_sha, bic_sha = row
-            print(f"[INFO] Checking {repo} BIC: {bic_sha}")
-            
-            commit_msg = fetch_commit_message(repo, bic_sha)
-            if not commit_msg:
-                continue 
-
-            # Check linked bug content in commit message
-            linked_bug_text = fetch_linked_issue_content(commit_msg, repo)
-            # if linked_bug_text:
-            #     print(f"  -> Linked issue text: {linked_bug_text[:50]}...")  # Debug
-
-            # Combine commit message + linked issue text
-            combined_text = commit_msg + "\n" + linked_bug_text
-
-            # Identify bug types
-            bug_types = match_memory_bug_type(combined_text)
+        def write(row, bug_types):
             if bug_types:
+                repo, bfc_sha, bic_sha = row
                 # Save to CSV
                 writer.writerow([
                     repo,
@@ -275,8 +305,20 @@ def collect_memory_related_regression(csv_path: str, output_path: str):
                 ])
                 print(f"  -> Matched memory bug(s): {bug_types}")
 
+        next(reader, None)  # regresion_commit_all.csv contains first row, so skip it
+        rows = [row for row in reader if len(row) >= 3]
+        # Extract the facts of all BICs first (in bulk from the commit source, if any)
+        facts = get_commit_facts()
+        facts.extract([(row[0], row[2]) for row in rows], source, max_in_flight)
+        # Then fetch every issue the BICs reference, once, concurrently
+        resolver = get_issue_resolver()
+        refs = [ref for row in rows for ref in (facts.get(row[0], row[2]) or {}).get("issue_refs", [])]
+        print(f"[INFO] {resolver.resolve(refs, max_in_flight)} linked issue(s) to fetch for {len(refs)} reference(s)")
+        run_ordered(lambda row: classify_regression_row(row, source), rows, write, max_in_flight, stage="memory")
+
 if __name__ == "__main__":
     collect_memory_related_regression(
         csv_path="regression_commits_all_3.csv",
-        output_path="memory_related_chains_3.csv"
+        output_path="memory_related_chains_3.csv",
+        source=get_commit_source()
     )
\ No newline at end of file
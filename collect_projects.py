@@ -1,122 +1,303 @@
 """
-This script aims at collecting C projects on github with more than 1000 stars and filtering them by commit count.
+This script aims at collecting C projects on github with more than 500 stars and filtering them by commit count.
 output: filtered_projects.csv
 """
 
-import requests
 import csv
 import time
-import pandas as pd
 import os
+import heapq
+import queue
+import re
+import threading
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlparse
 
-GITHUB_API_URL = "https://api.github.com"
-# Get GitHub token from environment
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    raise ValueError("Please set the GITHUB_TOKEN environment variable")
+from concurrent_enrich import run_ordered
+from github_api import GITHUB_API_URL, backoff_delay, cached_get, check_response, get_json
+from repo_metadata import get_store
+
+# "link": count commits from the last page of a per_page=1 listing (one request per repo)
+# "stats": sum /stats/contributors (202s are polled in the background)
+COMMIT_COUNT_METHOD = os.getenv("COMMIT_COUNT_METHOD", "link")
+
+# The search API never returns more than 1000 results for one query
+SEARCH_CAP = 1000
+SEARCH_PER_PAGE = 100
+# GitHub was founded in 2008; no repo was created earlier
+FIRST_CREATED = date(2008, 1, 1)
 
-""" 
-Search GitHub for C projects with 500+ stars.
-However, because we can only get 1000 results at a time,
-I am going to use upperbound to gradually fetch the projects.
 """
-def search_c_projects():
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    params = {
-        "q": "stars:500..510 language:C",
-        "sort": "stars",
-        "order": "desc",
-        "per_page": 100
-    }
-    
-    projects = []
-    page = 1
-
-    while len(projects) < 1000:  # Limit to 1000 projects
-        print(f"Fetching page {page}...")
-        response = requests.get(f"{GITHUB_API_URL}/search/repositories", headers=headers, params={**params, "page": page})
-        if response.status_code == 403:
-            print("Rate limit exceeded. Try again later.")
-            break
-        elif response.status_code == 422:
-            print(response.json())
-            break
-        response.raise_for_status()
-        items = response.json().get("items", [])
-        if not items:
-            break
+Build the search query of one slice: a star range, optionally narrowed to a creation date range.
+"""
+def slice_query(min_stars: int, max_stars: int, created=None) -> str:
+    query = f"language:C stars:{min_stars}..{max_stars}"
+    if created:
+        query += f" created:{created[0].isoformat()}..{created[1].isoformat()}"
+    return query
+
+"""
+Return (total_count, first item) of a search query, with a single one-result call.
+"""
+def search_total(query: str, sort: str = None):
+    params = {"q": query, "per_page": 1}
+    if sort:
+        params.update(sort=sort, order="desc")
+    data = get_json(f"{GITHUB_API_URL}/search/repositories", params=params, ttl=0)
+    if data is None:
+        return 0, None
+    items = data.get("items", [])
+    return data.get("total_count", 0), items[0] if items else None
+
+"""
+Split the star range [min_stars, max_stars] into slices of at most SEARCH_CAP results each,
+based on total_count: a slice over the cap is halved by stars, and once it is down to a single
+star count, by creation date. Return [(query, total_count), ...], most stars first.
+"""
+def partition_search(min_stars: int, max_stars: int):
+    slices = []
+    calls = 0
+    todo = [(min_stars, max_stars, None)]
+    while todo:
+        low, high, created = todo.pop()
+        query = slice_query(low, high, created)
+        total, _ = search_total(query)
+        calls += 1
+        if total <= SEARCH_CAP:
+            if total:
+                slices.append((query, total, high, created[1] if created else None))
+            continue
+        if low < high:
+            middle = (low + high) // 2
+            todo += [(low, middle, created), (middle + 1, high, created)]
+            continue
+        first, last = created or (FIRST_CREATED, date.today())
+        if first < last:
+            middle = first + (last - first) // 2
+            todo += [(low, high, (first, middle)), (low, high, (middle + timedelta(days=1), last))]
+        else:
+            print(f"[WARN] {query} has {total} results and can't be split further; keeping the first {SEARCH_CAP}")
+            slices.append((query, SEARCH_CAP, high, last))
+    print(f"[INFO] Star range {min_stars}..{max_stars} split into {len(slices)} search slice(s) ({calls} count queries)")
+    slices.sort(key=lambda item: (item[2], item[3] or date.max), reverse=True)
+    return [(query, total) for query, total, _, _ in slices]
+
+"""
+Search GitHub for C projects with `min_stars`+ stars.
+Because the search API only returns 1000 results per query, the star range is split into slices
+below that cap (partition_search); the pages of all slices are fetched concurrently
+and repos are deduplicated by full name.
+"""
+def search_c_projects(min_stars: int = 500, max_in_flight=None):
+    total, top = search_total(f"language:C stars:>={min_stars}", sort="stars")
+    if not top:
+        return []
+    print(f"[INFO] {total} C projects with {min_stars}+ stars")
+    slices = partition_search(min_stars, top["stargazers_count"])
+    pages = [
+        (query, page)
+        for query, count in slices
+        for page in range(1, -(-count // SEARCH_PER_PAGE) + 1)
+    ]
+
+    def fetch_page(task):
+        query, page = task
+        print(f"Fetching {query} page {page}...")
+        params = {"q": query, "sort": "stars", "order": "desc", "per_page": SEARCH_PER_PAGE, "page": page}
+        data = get_json(f"{GITHUB_API_URL}/search/repositories", params=params, ttl=0)
+        return data.get("items", []) if data else []
+
+    projects = {}
+
+    def add_items(task, items):
         for repo in items:
-            projects.append({
+            if repo["full_name"] in projects:
+                continue
+            # Search results carry repo-level facts for free; keep them for later stages
+            get_store().update(repo["full_name"], stars=repo["stargazers_count"], default_branch=repo["default_branch"])
+            projects[repo["full_name"]] = {
                 "name": repo["full_name"],
                 "stars": repo["stargazers_count"],
                 "commits_url": repo["commits_url"].split("{")[0]
-            })
-        page += 1
-        time.sleep(1)
+            }
+
+    run_ordered(fetch_page, pages, add_items, max_in_flight, stage="search_pages")
+    print(f"[INFO] Collected {len(projects)} projects from {len(pages)} result pages")
+    return list(projects.values())
+
+def get_commit_count_fast(repo_full_name):
+    """
+    Commit count of the default branch with a single request: list commits with per_page=1,
+    so the page number of the rel="last" link is the number of commits.
+    Unlike /stats/contributors, merge commits are counted too.
+    """
+    url = f"{GITHUB_API_URL}/repos/{repo_full_name}/commits"
+    # Revalidated on every call; an unchanged head comes back as a free 304
+    response = cached_get(url, params={"per_page": 1}, ttl=0)
+    commits = check_response(response, url)
+    if commits is None:
+        return None
+    link = next((value for name, value in response.headers.items() if name.lower() == "link"), "")
+    last = re.search(r'<([^>]*)>;\s*rel="last"', link)
+    if last:
+        return int(parse_qs(urlparse(last.group(1)).query)["page"][0])
+    # A single page: the repo has 0 or 1 commit
+    return len(commits)
 
-    return projects
 
-def get_commit_count(repo_full_name, attempt=1, max_attempts=5):
+def contributors_total(response, url: str):
+    """
+    Sum of the contributors' commit totals of a /stats/contributors answer.
+    """
+    contributors = check_response(response, url)
+    if not contributors:
+        return None
+    return sum(contributor["total"] for contributor in contributors)
+
+
+class StatsPoller:
+    """
+    Background poll queue for repos whose /stats/contributors answer is still 202 (being computed).
+    A worker thread re-requests each repo when it is due, with a growing interval, while the
+    caller moves on to other repos; results() hands back the counts as they become ready.
+    """
+
+    def __init__(self, max_attempts: int = 5, interval: float = 20):
+        self.max_attempts = max_attempts
+        self.interval = interval
+        self._due = []
+        self._cond = threading.Condition()
+        self._results = queue.Queue()
+        self._submitted = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, repo_full_name: str):
+        with self._cond:
+            heapq.heappush(self._due, (time.time() + self.interval, 1, repo_full_name))
+            self._submitted += 1
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due or self._due[0][0] > time.time():
+                    self._cond.wait(timeout=self._due[0][0] - time.time() if self._due else None)
+                _, attempt, repo_full_name = heapq.heappop(self._due)
+            url = f"{GITHUB_API_URL}/repos/{repo_full_name}/stats/contributors"
+            try:
+                response = cached_get(url, ttl=0)
+                if response.status_code == 202 and attempt < self.max_attempts:
+                    with self._cond:
+                        due = time.time() + self.interval + backoff_delay(attempt, base=self.interval)
+                        heapq.heappush(self._due, (due, attempt + 1, repo_full_name))
+                    continue
+                if response.status_code == 202:
+                    print(f"[SKIP] Stats not ready after {self.max_attempts} attempts for {repo_full_name}. Skipping.")
+                    count = None
+                else:
+                    count = contributors_total(response, url)
+            except Exception as error:
+                print(f"[ERROR] {repo_full_name}: {error}")
+                count = None
+            self._results.put((repo_full_name, count))
+
+    def results(self):
+        """
+        Yield (repo, commit count or None) for every submitted repo, as their stats become ready.
+        Call once all repos are submitted.
+        """
+        for _ in range(self._submitted):
+            yield self._results.get()
+
+
+def get_commit_count(repo_full_name, max_attempts=5, poller: StatsPoller = None):
     """
     Retrieves commit count for a repo via /stats/contributors endpoint.
     Try up to max_attempts times if a 202 status indicates stats are still being generated.
     202 -> the repository is too large and GitHub is still processing stats
-    403 -> rate limit or permission issue
+           (with a `poller`, the repo is handed to it and None is returned right away)
+    403 -> permission issue (throttling is retried inside github_api)
     """
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
     url = f"{GITHUB_API_URL}/repos/{repo_full_name}/stats/contributors"
 
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 202:
-        # GitHub is still generating contributor stats
-        print(f"[WAIT] GitHub is processing stats for {repo_full_name}, attempt #{attempt}")
-        time.sleep(20)
-
-        if attempt < max_attempts:
-            return get_commit_count(repo_full_name, attempt + 1, max_attempts)
-        else:
-            print(f"[SKIP] Stats not ready after {max_attempts} attempts for {repo_full_name}. Skipping.")
+    for attempt in range(max_attempts):
+        # Revalidated on every call; unchanged stats come back as free 304s
+        response = cached_get(url, ttl=0)
+        if response.status_code != 202:
+            break
+        if poller is not None:
+            print(f"[WAIT] GitHub is processing stats for {repo_full_name}, polling in the background")
+            poller.submit(repo_full_name)
             return None
-
-    if response.status_code == 403:
-        print(f"[SKIP] Skipping {repo_full_name} due to rate limits or permission.")
+        # GitHub is still generating contributor stats
+        delay = 10 + backoff_delay(attempt, base=10)
+        print(f"[WAIT] GitHub is processing stats for {repo_full_name}, attempt #{attempt + 1}, retrying in {delay:.0f}s")
+        time.sleep(delay)
+    else:
+        print(f"[SKIP] Stats not ready after {max_attempts} attempts for {repo_full_name}. Skipping.")
         return None
 
-    response.raise_for_status()
-    contributors = response.json()
-
-    if not contributors:
+    total_commits = contributors_total(response, url)
+    if not total_commits:
         print(f"[WARNING] No commit data for {repo_full_name}")
         return None
-
-    total_commits = sum(contributor["total"] for contributor in contributors)
     return total_commits
 
 
-def collect_projects():
+def get_stored_commit_count(repo_full_name, poller: StatsPoller = None):
+    """
+    Commit count from the repo metadata store if it is still fresh, else from GitHub (and stored).
+    COMMIT_COUNT_METHOD picks how: "link" (default, one request) or "stats" (/stats/contributors).
+    """
+    store = get_store()
+    metadata = store.get(repo_full_name)
+    if store.is_fresh(metadata, "commits") and metadata["commits"]:
+        return metadata["commits"]
+    if COMMIT_COUNT_METHOD == "stats":
+        commit_count = get_commit_count(repo_full_name, poller=poller)
+    else:
+        commit_count = get_commit_count_fast(repo_full_name)
+    if commit_count:
+        store.update(repo_full_name, commits=commit_count)
+    return commit_count
+
+
+def collect_projects(output_path: str = "projects3.csv"):
     projects = search_c_projects()
+    # Repos whose contributor stats are still being computed are polled in the background
+    poller = StatsPoller() if COMMIT_COUNT_METHOD == "stats" else None
     
-    with open("projects3.csv", "a", newline="") as csvfile:
+    with open(output_path, "a", newline="") as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(["name", "stars", "commits"])
 
         for project in projects:
-            commit_count = get_commit_count(project["name"])
+            commit_count = get_stored_commit_count(project["name"], poller)
             if commit_count:
                 writer.writerow([project["name"], project["stars"], commit_count])
                 print(f"Saved {project['name']} with {commit_count} commits.")
 
-def filter_projects():
-    df = pd.read_csv("projects.csv")
+        if poller is not None:
+            stars = {project["name"]: project["stars"] for project in projects}
+            for name, commit_count in poller.results():
+                if commit_count:
+                    get_store().update(name, commits=commit_count)
+                    writer.writerow([name, stars[name], commit_count])
+                    print(f"Saved {name} with {commit_count} commits.")
+
+def filter_projects(input_path: str = "projects.csv", output_path: str = "filtered_projects3.csv",
+                    min_commits: int = 200, max_commits: int = 50000):
+    import pandas as pd
+
+    df = pd.read_csv(input_path)
 
     median_commits = df["commits"].median()
     print(f"Median commits: {median_commits}")
 
-    # Apply filtering: Keep projects with commit count in [200, 50000]
-    filtered_df = df[(df["commits"] >= 200) & (df["commits"] < 50000)]
-    filtered_df.to_csv("filtered_projects3.csv", index=False)
-    print(f"Filtered dataset saved as 'filtered_projects3.csv'")
+    # Apply filtering: Keep projects with commit count in [min_commits, max_commits)
+    filtered_df = df[(df["commits"] >= min_commits) & (df["commits"] < max_commits)]
+    filtered_df.to_csv(output_path, index=False)
+    print(f"Filtered dataset saved as '{output_path}'")
 
 if __name__ == "__main__":
     # Fetch projects and commit counts
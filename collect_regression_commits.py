@@ -1,15 +1,20 @@
 import csv
 import re
 import os
-import requests
-import time
+from functools import partial
 
-# --------------------------- CONFIGURATION ------------------
-# Get GitHub token from environment
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    raise ValueError("Please set the GITHUB_TOKEN environment variable")
+from commit_facts import get_commit_facts
+from commit_source import get_commit_source, source_name
+from concurrent_enrich import run_ordered
+from github_api import GITHUB_API_URL, get_json
+from keyword_matcher import KeywordMatcher
+from metrics import get_metrics
+from result_writer import ResultWriter
+from scan_state import ScanState
+from sha_index import get_sha_index
 
+# --------------------------- CONFIGURATION ------------------
+# The GitHub token (GITHUB_TOKEN / GITHUB_TOKENS) is read by the token pool on the first request
 # Borrowed from Minecraft project
 bug0_keywords = [
     "fixed ", " bug", "fixes ", "fix ", " fix", " fixed", " fixes", "crash", "solves", " resolves",
@@ -29,6 +34,17 @@ bug1_keywords = [
     "introduced in"
 ]
 
+# Both keyword lists compiled once; see keyword_matcher.py
+bug0_matcher = KeywordMatcher(bug0_keywords)
+bug1_matcher = KeywordMatcher(bug1_keywords)
+
+# How regression candidates are found over the REST API:
+# "scan"   -> page through every commit of the repo
+# "search" -> ask the commit search API for the bug1_keywords phrases, falling back to "scan"
+#             when the search results are incomplete or over the 1000-result cap
+DISCOVERY_MODE = os.getenv("DISCOVERY_MODE", "scan")
+SEARCH_CAP = 1000
+
 # ------------------ UTILITIES ------------------
 def parse_repo_full_name(repo_name: str) -> str:
     """
@@ -38,35 +54,28 @@ def parse_repo_full_name(repo_name: str) -> str:
 
 """
 Fetch commits from a repo's default branch.
+`since` (ISO 8601) only returns commits newer than that date.
 """
-def get_commits(repo: str, page: int = 1, per_page: int = 100):
-    url = f"https://api.github.com/repos/{repo}/commits"
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
+def get_commits(repo: str, page: int = 1, per_page: int = 100, since: str = None):
+    url = f"{GITHUB_API_URL}/repos/{repo}/commits"
     params = {
         "per_page": per_page,
         "page": page
     }
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 403:
-        print("[WAIT] Rate limit hit, waiting for 60 seconds...")
-        time.sleep(60)
-        return get_commits(repo, page, per_page)
-    elif response.status_code == 401:
-        print("[SKIP] 401 Unauthorized: Check your GitHub token!")
-        print(f"Response: {response.text}")
-        return []
-    elif response.status_code == 404:
-        print(f"[SKIP] 404 Not Found: Repository {repo} does not exist or is private.")
-        print(f"Response: {response.text}")
-        return []
-    response.raise_for_status()
-    return response.json()
+    if since:
+        params["since"] = since
+    # Listings change, so always revalidate; unchanged pages come back as free 304s.
+    # Throttling is retried inside github_api; a missing / private / empty repo gives [].
+    return get_json(url, params=params, ttl=0) or []
 
 """
 Fetch commit message for a given commit hash from the GitHub API.
 Returns an empty string if the commit is invalid or not found.
 """
 def get_commit_message(repo: str, commit_sha: str) -> str:
+    # Abbreviated hashes are expanded from the local SHA index when possible,
+    # which also lets the response cache hit on the full-SHA URL
+    commit_sha = get_sha_index().expand(repo, commit_sha) or commit_sha
     # Quick sanity check for commit hash length, in case it's obviously invalid
     if len(commit_sha) < 7:
         # Often short SHAs won't match the full commit in remote
@@ -74,33 +83,19 @@ def get_commit_message(repo: str, commit_sha: str) -> str:
         print(f"[SKIP] Commit hash '{commit_sha}' seems invalid.")
         return ""
 
-    url = f"https://api.github.com/repos/{repo}/commits/{commit_sha}"
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 404:
-        print(f"[SKIP] Commit {commit_sha} not found in {repo}")
+    url = f"{GITHUB_API_URL}/repos/{repo}/commits/{commit_sha}"
+    data = get_json(url)
+    if data is None:
         return ""
-    elif response.status_code == 403:
-        print("[WAIT] Rate limit hit, waiting for 60 seconds...")
-        time.sleep(60)
-        return get_commit_message(repo, commit_sha)
-    elif response.status_code == 401:
-        print("[SKIP] 401 Unauthorized: Check your GitHub token!")
-        print(f"Response: {response.text}")
-        return ""
-    elif response.status_code == 422:
-        print(f"[SKIP] 422 Unprocessable Entity: {repo} might be empty or a redirect.")
-        print(f"Response: {response.text}")
-        return ""
-    response.raise_for_status()
-    return response.json().get("commit", {}).get("message", "") or ""
+    return data.get("commit", {}).get("message", "") or ""
 
 
 """
 Fetch commit message for all the regression in regression_commits_all.csv
 """
 def collect_commit_message(csv_path: str):
-    with open(csv_path, "r", newline="", encoding="utf-8") as csvfile:
+    with open(csv_path, "r", newline="", encoding="utf-8") as csvfile, \
+         ResultWriter("commit_messages.csv") as writer:
         reader = csv.reader(csvfile)
         # Skip the CSV header row
         next(reader, None)
@@ -112,14 +107,14 @@ def collect_commit_message(csv_path: str):
             repo = parse_repo_full_name(project_name)
             if not repo:
                 continue
-            print(f"\n[INFO] Collecting {repo} commit message...")
             bfc_commit_sha = row[1].strip()
             bic_commit_sha = row[2].strip()
+            key = (repo, bfc_commit_sha, bic_commit_sha)
+            if writer.done(key):
+                continue
+            print(f"\n[INFO] Collecting {repo} commit message...")
             commit_msg = get_commit_message(repo, bic_commit_sha)
-            if commit_msg:
-                with open("commit_messages.csv", "a", newline="", encoding="utf-8") as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow([repo, bic_commit_sha, commit_msg, bfc_commit_sha])
+            writer.write(key, [repo, bic_commit_sha, commit_msg, bfc_commit_sha] if commit_msg else None)
 
 # ------------------ MAIN FUNCTION ------------------
 
@@ -127,84 +122,218 @@ def collect_commit_message(csv_path: str):
 Check if the mentioned BIC for bug1 is a bug fix commit.
 """
 def commit_contains_bug0(commit_msg: str) -> bool:
-    lower_msg = commit_msg.lower()
-    return any(keyword in lower_msg for keyword in bug0_keywords)
+    return bug0_matcher.contains_any(commit_msg.lower())
+
+"""
+Return which bug0_keywords occur in a commit message.
+"""
+def bug0_keyword_hits(commit_msg: str) -> list:
+    return bug0_matcher.find(commit_msg.lower())
+
+"""
+Return [(sha, message), ...] (newest first) of the commits whose message contains one of the
+bug1_keywords, using the commit search API: only pages of hits are fetched.
+A regression message must contain a bug1 keyword (iter_regressions checks it before the regex),
+so the keyword phrases alone are enough to find every candidate.
+Return None when the search can't be trusted to be complete (incomplete_results, or more hits
+than the search API returns), so the caller falls back to a full scan.
+"""
+def search_commit_candidates(repo: str, per_page: int = 100):
+    url = f"{GITHUB_API_URL}/search/commits"
+    candidates = {}
+    for keyword in dict.fromkeys(keyword.strip() for keyword in bug1_keywords):
+        page = 1
+        while True:
+            params = {"q": f'repo:{repo} "{keyword}"', "sort": "committer-date", "order": "desc",
+                      "per_page": per_page, "page": page}
+            data = get_json(url, params=params, ttl=0)
+            if data is None:
+                return None
+            total = data.get("total_count", 0)
+            if data.get("incomplete_results") or total > SEARCH_CAP:
+                print(f"[INFO] Commit search for {repo} is truncated ({total} hits), falling back to a full scan")
+                return None
+            items = data.get("items", [])
+            for item in items:
+                candidates[item["sha"]] = (item["commit"]["committer"]["date"], item["commit"]["message"])
+            if not items or page * per_page >= total:
+                break
+            page += 1
+    get_sha_index().build_from_commits(repo, candidates)
+    print(f"[INFO] Commit search found {len(candidates)} candidate(s) in {repo}")
+    ordered = sorted(candidates.items(), key=lambda item: item[1][0], reverse=True)
+    return [(sha, message) for sha, (_, message) in ordered]
+
+def _save_cursor(checkpoint, save_cursor):
+    if checkpoint is None:
+        save_cursor()
+    else:
+        checkpoint(save_cursor)
+
+"""
+Yield (sha, message) for the commits of a repo's default branch, newest first.
+With a ScanState (scan_state.py), only commits newer than the last completed scan are fetched,
+and an interrupted scan continues after its last finished page.
+With `discovery` "search" (default: DISCOVERY_MODE), only the commit search hits are yielded
+when the search is complete.
+Cursor updates are handed to `checkpoint(save_cursor)` when given, so the caller can make the
+rows found so far durable before the cursor moves past them (or defer the update).
+"""
+def iter_commit_messages(repo: str, source=None, state: ScanState = None, discovery: str = None, checkpoint=None):
+    if source is not None:
+        yield from source.iter_commits(repo)
+        return
+
+    if (discovery or DISCOVERY_MODE) == "search":
+        candidates = search_commit_candidates(repo)
+        if candidates is not None:
+            yield from candidates
+            return
+
+    cursor = state.get(repo) if state is not None else None
+    if cursor and cursor["pending_sha"]:
+        # Resume the interrupted scan
+        since = cursor["since"]
+        page = cursor["last_page"] + 1
+        print(f"[INFO] Resuming scan of {repo} at page {page}")
+    else:
+        since = cursor["newest_date"] if cursor else None
+        page = 1
+    stop_sha = cursor["newest_sha"] if cursor else None
+
+    while True:
+        commits = get_commits(repo, page=page, per_page=100, since=since)
+        if not commits:
+            break
+        get_sha_index().build_from_commits(repo, commits)
+        if state is not None and page == 1:
+            head = commits[0]
+            state.start(repo, head["sha"], head["commit"]["committer"]["date"], since)
+        for commit_obj in commits:
+            if commit_obj["sha"] == stop_sha:
+                # Everything from here on was covered by the previous scan
+                break
+            yield commit_obj["sha"], commit_obj["commit"]["message"]
+        else:
+            if state is not None:
+                _save_cursor(checkpoint, partial(state.page_done, repo, page))
+            page += 1
+            continue
+        break
+
+    if state is not None:
+        _save_cursor(checkpoint, partial(state.finish, repo))
+
+"""
+Yield (BFC sha, BIC sha) for every regression commit of a repo as soon as it is found.
+"""
+def iter_regressions(repo: str, max_commits=500, source=None, state: ScanState = None, checkpoint=None):
+    found_count = 0
+
+    for sha, message in iter_commit_messages(repo, source, state, checkpoint=checkpoint):
+        msg = message.lower()
+        if bug1_matcher.contains_any(msg):
+            match = re.search(
+                r"(?:regression by|regressed by|introduced by|caused by)\s*([a-f0-9]+)",
+                msg, re.IGNORECASE
+            )
+            if match:
+                bug_commit_hash = match.group(1)
+                if source is not None:
+                    bug_msg = source.get_message(repo, bug_commit_hash)
+                else:
+                    bug_msg = get_commit_message(repo, bug_commit_hash)
+                if bug_msg:
+                    found_count+=1
+                    print(f"[FOUND] {repo}: Regression commit {sha} references to commit {bug_commit_hash}")
+                    yield sha, bug_commit_hash
+                    if found_count >= max_commits:
+                        break
 
 """
 Collect all regression commits by identifying "regressed by" etc
 It doesn't check if BIC reference a bug fix commit.
 """
-def collect_all_regression(repo: str, max_commits=500) -> int:
+def collect_all_regression(repo: str, max_commits=500, source=None, state: ScanState = None,
+                           output_file: str = "regression_commits_all_3.csv") -> int:
     """
     Search for commits that match bug1_keywords. 
     From the commit message, extract the bug-introducing commit.
     This is for calculating the percentage of regression commits that reference a bug fix commit.
+    `source` is an optional commit source (see commit_source.py); None uses the GitHub REST API.
+    `state` is an optional ScanState to only fetch commits newer than the previous run.
+    Rows are appended to `output_file` (a per-repo shard in parallel scan mode);
+    regressions already written by an earlier (or interrupted) run are not written again.
     """
     found_count = 0
-    page = 1
 
-    while found_count < max_commits:
-        commits = get_commits(repo, page=page, per_page=100)
-        if not commits:
-            break
+    with ResultWriter(output_file) as writer, get_metrics().stage("regressions") as stats:
+        def checkpoint(save_cursor):
+            # The rows of the pages scanned so far are on disk before the cursor moves past them
+            writer.flush()
+            save_cursor()
 
-        for commit_obj in commits:
-            msg = commit_obj["commit"]["message"].lower()
-            if any(k in msg for k in bug1_keywords):
-                match = re.search(
-                    r"(?:regression by|regressed by|introduced by|caused by)\s*([a-f0-9]+)",
-                    msg, re.IGNORECASE
-                )
-                if match:
-                    bug_commit_hash = match.group(1)
-                    bug_msg = get_commit_message(repo, bug_commit_hash)
-                    if bug_msg:
-                        found_count+=1
-                        print(f"[FOUND] {repo}: Regression commit {commit_obj['sha']} references to commit {bug_commit_hash}")
-                        with open("regression_commits_all_3.csv", "a", newline="", encoding="utf-8") as csvfile:
-                            writer = csv.writer(csvfile)
-                            writer.writerow([repo, commit_obj["sha"], bug_commit_hash])
-                        if found_count >= max_commits:
-                            break
-        page += 1
+        for sha, bug_commit_hash in iter_regressions(repo, max_commits, source, state, checkpoint):
+            found_count+=1
+            stats.add()
+            if not writer.done((repo, sha)):
+                writer.write((repo, sha), [repo, sha, bug_commit_hash])
 
     return found_count
 
+"""
+Check one regression row: return [repo, BFC, BIC] if the BIC is itself a bug fix, else None.
+"""
+def check_regression_chain(row, source=None):
+    project_name = row[0].strip()
+    repo = parse_repo_full_name(project_name)
+    if not repo:
+        return None
+    print(f"\n[INFO] Collecting {repo} regression chain...")
+    bfc_commit_sha = row[1].strip()
+    bic_commit_sha = row[2].strip()
+    facts = get_commit_facts().ensure(repo, bic_commit_sha, source)
+    commit_msg = facts["message"] if facts else ""
+    if commit_msg and commit_contains_bug0(commit_msg):
+        return [repo, bfc_commit_sha, bic_commit_sha]
+    return None
+
 """
 collect_all_regression forms regression_commits_all.csv
 This function aims at finding the regression chain, here we check the BIC commit message
+`max_in_flight` > 1 checks that many rows concurrently; rows are still written in input order.
+Rows checked by an earlier (or interrupted) run are skipped.
 """
-def collect_regression_chain(path: str, max_commits=200):
-    output_file = "regression_chains3.csv"
-    file_exists = os.path.isfile(output_file)
+def collect_regression_chain(path: str, max_commits=200, source=None, max_in_flight=None,
+                             output_file: str = "regression_chains3.csv"):
+    def row_key(row):
+        return [cell.strip() for cell in row[:3]]
 
-    if not file_exists:
-        with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["repo", "bfc_commit_sha", "bic_commit_sha"])
-
-    with open(path, "r", newline="", encoding="utf-8") as csvfile:
+    with open(path, "r", newline="", encoding="utf-8") as csvfile, \
+         ResultWriter(output_file, header=["repo", "bfc_commit_sha", "bic_commit_sha"]) as writer:
         reader = csv.reader(csvfile)
         next(reader, None)
 
-        for row in reader:
-            if not row:
-                continue
-            project_name = row[0].strip()
-            repo = parse_repo_full_name(project_name)
-            if not repo:
-                continue
-            print(f"\n[INFO] Collecting {repo} regression chain...")
-            bfc_commit_sha = row[1].strip()
-            bic_commit_sha = row[2].strip()
-            commit_msg = get_commit_message(repo, bic_commit_sha)
-            if commit_msg and commit_contains_bug0(commit_msg):
-                with open(output_file, "a", newline="", encoding="utf-8") as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow([repo, bfc_commit_sha, bic_commit_sha])
+        def write_chain(row, chain):
+            writer.write(row_key(row), chain)
+
+        rows = [row for row in reader if row and not writer.done(row_key(row))]
+        # Extract the facts of all BICs first (in bulk from the commit source, if any)
+        pairs = [(parse_repo_full_name(row[0].strip()), row[2].strip()) for row in rows]
+        get_commit_facts().extract([pair for pair in pairs if pair[0]], source, max_in_flight)
+        run_ordered(lambda row: check_regression_chain(row, source), rows, write_chain, max_in_flight,
+                    stage="chains")
+
 
+def main(project_path: str, source=None, max_in_flight=None, state: ScanState = None, workers=None,
+         regressions_path: str = "regression_commits_all_3.csv", chains_path: str = "regression_chains3.csv"):
+    if workers:
+        # Parallel scan mode: one process per repo at a time, one shard per repo, merged in project order
+        from parallel_scan import read_projects, scan_repos_parallel
+        # Workers open the same kind of commit source as the caller's
+        scan_repos_parallel(read_projects(project_path), regressions_path, workers=workers,
+                            source_name=source_name(source), incremental=state is not None)
 
-def main(project_path: str):
     # with open(project_path, "r", newline="", encoding="utf-8") as projectsfile:
     #     reader = csv.reader(projectsfile)
     #     # Skip the CSV header row
@@ -218,11 +347,12 @@ def main(project_path: str):
     #         if not repo:
     #             continue
     #         print(f"\n[INFO] Processing {repo} ...")
-    #         collect_all_regression(repo)
+    #         collect_all_regression(repo, source=source, state=state)
         
         # based on the collected regression commits, find regression chains
-    collect_regression_chain("regression_commits_all_3.csv")
+    collect_regression_chain(regressions_path, source=source, max_in_flight=max_in_flight, output_file=chains_path)
 
 if __name__ == "__main__":
     PROJECT_PATH = "filtered_projects3.csv" 
-    main(PROJECT_PATH)
\ No newline at end of file
+    # SCAN_WORKERS > 0 rescans the projects with a process pool (see parallel_scan.py)
+    main(PROJECT_PATH, source=get_commit_source(), state=ScanState(), workers=int(os.getenv("SCAN_WORKERS", 0)))
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""
+Per-commit facts, extracted once and shared by every stage.
+For each (repo, sha) we store the message, author date, changed files (with their extension and
++/- lines), total additions / deletions and the issues / PRs the message references.
+filter_commits (C files), collect_regression_information (date, files count, changes),
+collect_memory_related_chains (message, linked issue) and collect_regression_chain (message)
+then query this table instead of downloading the same commit again.
+
+Facts come from the commit source when one is given, else from one REST call per commit.
+A GraphQL source has no per-file data: its facts carry the counts only, and a stage that needs the
+file list (the C-file filter) completes them with the REST call.
+Abbreviated SHAs are resolved once and remembered in an alias table.
+
+COMMIT_FACTS_PATH -> location of the SQLite file (default: commit_facts.sqlite)
+"""
+
+import json
+import os
+import re
+import time
+
+from concurrent_enrich import run_ordered
+from github_api import GITHUB_API_URL, get_json
+from sha_index import get_sha_index
+from sqlite_store import SQLiteStore, shared
+
+COMMIT_FACTS_PATH = os.getenv("COMMIT_FACTS_PATH", "commit_facts.sqlite")
+
+_ISSUE_URL = re.compile(r"https://github\.com/([\w\-_]+)/([\w\-_]+)/(issues|pull)/(\d+)", re.IGNORECASE)
+_ISSUE_KEYWORD = re.compile(r"(?:fix(?:ed|es)?|close(?:d|s)?|resolve(?:d|s)?)\s*#(\d+)", re.IGNORECASE)
+
+
+def extract_issue_refs(message: str, repo: str) -> list:
+    """
+    Issues / PRs referenced by a commit message, as "owner/repo#number", without duplicates:
+    first the github.com issue / pull links, then "fixes #123"-style references to `repo`.
+    """
+    refs = [f"{owner}/{name}#{number}" for owner, name, _, number in _ISSUE_URL.findall(message or "")]
+    refs += [f"{repo}#{number}" for number in _ISSUE_KEYWORD.findall(message or "")]
+    return list(dict.fromkeys(refs))
+
+
+def _extension(filename: str) -> str:
+    # Case is kept: ".C" is C++, not C
+    return os.path.splitext(filename)[1]
+
+
+def _facts_from_rest(repo: str, ref: str):
+    data = get_json(f"{GITHUB_API_URL}/repos/{repo}/commits/{ref}")
+    if data is None:
+        return None
+    commit = data.get("commit", {})
+    return {
+        "sha": data["sha"],
+        "message": commit.get("message", "") or "",
+        "author_date": commit.get("author", {}).get("date", ""),
+        "files": [
+            {"filename": file["filename"], "additions": file["additions"],
+             "deletions": file["deletions"], "changes": file["changes"]}
+            for file in data.get("files", [])
+        ],
+    }
+
+
+def _facts_from_source(source, repo: str, ref: str):
+    sha = source.resolve_sha(repo, ref)
+    if not sha:
+        return None
+    facts = {
+        "sha": sha,
+        "message": source.get_message(repo, sha),
+        "author_date": source.get_author_date(repo, sha),
+    }
+    if _lists_files(source):
+        facts["files"] = source.get_files(repo, sha)
+    else:
+        facts.update(source.get_stats(repo, sha), files=None)
+    return facts
+
+
+def _lists_files(source) -> bool:
+    return source is not None and not getattr(source, "lacks_files", False)
+
+
+class CommitFacts(SQLiteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS commits (
+            repo        TEXT NOT NULL,
+            sha         TEXT NOT NULL,
+            message     TEXT NOT NULL,
+            author_date TEXT,
+            files_count INTEGER NOT NULL,
+            additions   INTEGER NOT NULL,
+            deletions   INTEGER NOT NULL,
+            files_known INTEGER NOT NULL,
+            issue_refs  TEXT NOT NULL,
+            fetched_at  REAL NOT NULL,
+            PRIMARY KEY (repo, sha)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS commit_files (
+            repo      TEXT NOT NULL,
+            sha       TEXT NOT NULL,
+            filename  TEXT NOT NULL,
+            extension TEXT NOT NULL,
+            additions INTEGER NOT NULL,
+            deletions INTEGER NOT NULL,
+            changes   INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS commit_files_by_extension ON commit_files (repo, sha, extension);
+        CREATE TABLE IF NOT EXISTS sha_aliases (
+            repo TEXT NOT NULL,
+            ref  TEXT NOT NULL,
+            sha  TEXT NOT NULL,
+            PRIMARY KEY (repo, ref)
+        ) WITHOUT ROWID;
+        """
+
+    def __init__(self, path: str = COMMIT_FACTS_PATH):
+        super().__init__(path)
+
+    def resolve(self, repo: str, ref: str) -> str:
+        """
+        Full SHA of `ref` as far as we know locally (alias table, then SHA index), else `ref` itself.
+        """
+        ref = (ref or "").strip()
+        if len(ref) == 40:
+            return ref.lower()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha FROM sha_aliases WHERE repo = ? AND ref = ?", (repo, ref)
+            ).fetchone()
+        if row:
+            return row[0]
+        return get_sha_index().expand(repo, ref) or ref
+
+    def get(self, repo: str, ref: str):
+        """
+        Stored facts of a commit as a dict, or None if it was never extracted.
+        """
+        sha = self.resolve(repo, ref)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT message, author_date, files_count, additions, deletions, files_known, issue_refs "
+                "FROM commits WHERE repo = ? AND sha = ?", (repo, sha)
+            ).fetchone()
+            if row is None:
+                return None
+            files = self._conn.execute(
+                "SELECT filename, extension, additions, deletions, changes FROM commit_files "
+                "WHERE repo = ? AND sha = ? ORDER BY rowid", (repo, sha)
+            ).fetchall()
+        message, author_date, files_count, additions, deletions, files_known, issue_refs = row
+        return {
+            "repo": repo,
+            "sha": sha,
+            "message": message,
+            "author_date": author_date,
+            "files": [
+                {"filename": filename, "extension": extension, "additions": file_additions,
+                 "deletions": file_deletions, "changes": changes}
+                for filename, extension, file_additions, file_deletions, changes in files
+            ],
+            "files_count": files_count,
+            "additions": additions,
+            "deletions": deletions,
+            # False when the facts came without a file list (GraphQL)
+            "files_known": bool(files_known),
+            "issue_refs": json.loads(issue_refs),
+        }
+
+    def put(self, repo: str, ref: str, facts: dict):
+        """
+        Store the facts extracted for `ref`: full sha, message, author_date and files
+        (or files None plus files_count / additions / deletions).
+        """
+        sha = facts["sha"]
+        files = facts["files"]
+        if files is not None:
+            counts = (len(files), sum(file["additions"] for file in files), sum(file["deletions"] for file in files))
+        else:
+            counts = (facts["files_count"], facts["additions"], facts["deletions"])
+        with self._lock:
+            self._conn.execute("DELETE FROM commit_files WHERE repo = ? AND sha = ?", (repo, sha))
+            self._conn.executemany(
+                "INSERT INTO commit_files (repo, sha, filename, extension, additions, deletions, changes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(repo, sha, file["filename"], _extension(file["filename"]), file["additions"],
+                  file["deletions"], file["changes"]) for file in files or []],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO commits (repo, sha, message, author_date, files_count, additions, "
+                "deletions, files_known, issue_refs, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (repo, sha, facts["message"], facts["author_date"], *counts, files is not None,
+                 json.dumps(extract_issue_refs(facts["message"], repo)), time.time()),
+            )
+            if ref != sha:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sha_aliases (repo, ref, sha) VALUES (?, ?, ?)", (repo, ref, sha)
+                )
+            self._conn.commit()
+
+    def _has(self, facts, need_files: bool) -> bool:
+        return facts is not None and (facts["files_known"] or not need_files)
+
+    def ensure(self, repo: str, ref: str, source=None, need_files: bool = False):
+        """
+        Facts of a commit, extracted (from `source`, else the REST API) and stored on first use.
+        With `need_files`, facts without a file list are completed from the REST API.
+        None if the commit can't be found.
+        """
+        ref = (ref or "").strip()
+        if not ref:
+            return None
+        facts = self.get(repo, ref)
+        if self._has(facts, need_files):
+            return facts
+        if source is not None and (_lists_files(source) or not need_files):
+            extracted = _facts_from_source(source, repo, ref)
+        else:
+            extracted = _facts_from_rest(repo, ref)
+        if extracted is None:
+            return None
+        self.put(repo, ref, extracted)
+        return self.get(repo, ref)
+
+    def extract(self, pairs, source=None, max_in_flight=None, need_files: bool = False) -> int:
+        """
+        The extraction step: make sure the facts of all (repo, sha) `pairs` are stored.
+        A commit source reads the missing commits in bulk; REST lookups run `max_in_flight` at a time.
+        Return the number of commits that had to be extracted.
+        """
+        missing = [(repo, ref.strip()) for repo, ref in dict.fromkeys(pairs)
+                   if ref and ref.strip() and not self._has(self.get(repo, ref), need_files)]
+        if missing and source is not None and (_lists_files(source) or not need_files):
+            source.prefetch(missing)
+        run_ordered(lambda pair: self.ensure(pair[0], pair[1], source, need_files), missing,
+                    lambda pair, facts: None, max_in_flight, stage="commit_facts")
+        return len(missing)
+
+    def touches_extension(self, repo: str, ref: str, extension: str, source=None) -> bool:
+        """
+        True if the commit changes at least one file with `extension` (e.g. ".c").
+        """
+        facts = self.ensure(repo, ref, source, need_files=True)
+        if facts is None:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM commit_files WHERE repo = ? AND sha = ? AND extension = ? LIMIT 1",
+                (repo, facts["sha"], extension),
+            ).fetchone()
+        return row is not None
+
+
+@shared
+def get_commit_facts() -> CommitFacts:
+    """
+    Open the shared commit facts table lazily.
+    """
+    return CommitFacts()
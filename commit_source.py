@@ -0,0 +1,258 @@
+"""
+Pluggable commit sources.
+By default the collection scripts ask the GitHub REST API about commits.
+For big histories (git/git, netdata/netdata, ...) the same questions can be answered from a
+local bare (optionally blobless) clone instead, reading `git log` / `git show --numstat` in bulk:
+- all commit messages of the default branch
+- the message of a single commit
+- changed files with additions/deletions
+- author date
+- abbreviated SHA resolution
+
+COMMIT_SOURCE  -> "api" (default), "git" or "graphql" (batched GraphQL lookups, see graphql_batch.py)
+GIT_MIRROR_DIR -> where the local clones live (default: mirrors)
+"""
+
+import os
+import subprocess
+from datetime import datetime, timezone
+
+from sha_index import get_sha_index
+
+MIRROR_DIR = os.getenv("GIT_MIRROR_DIR", "mirrors")
+
+# Record separator between commits, field separator inside one commit
+_RS = "\x1e"
+_FS = "\x00"
+_SHOW_FORMAT = "--format=" + "%x1e%H%x00%aI%x00%B%x00"
+# Keep command lines reasonably short when prefetching many commits at once
+_SHOW_BATCH = 500
+
+
+def to_utc_iso(date_str: str) -> str:
+    """
+    git prints author dates with the author's offset; GitHub returns them in UTC ("...Z").
+    """
+    return datetime.fromisoformat(date_str).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _numstat_entries(numstat: str):
+    """
+    Yield (additions, deletions, path) from `git show --numstat -z` output. Paths are verbatim
+    (no quoting of special characters); a rename is written "+\t-\t\0old path\0new path\0"
+    and is reported under its new path.
+    """
+    fields = iter(numstat.split(_FS))
+    for field in fields:
+        parts = field.lstrip("\n").split("\t", 2)
+        if len(parts) != 3:
+            continue
+        additions, deletions, path = parts
+        if not path:
+            next(fields, None)
+            path = next(fields, "")
+        yield additions, deletions, path
+
+
+def _parse_show_output(output: str) -> dict:
+    """
+    Parse `git show --numstat -z` output produced with _SHOW_FORMAT into
+    {full_sha: {"message", "date", "files"}} where files mimic the REST API entries.
+    """
+    commits = {}
+    for chunk in output.split(_RS):
+        if not chunk.strip():
+            continue
+        sha, date, message, numstat = chunk.split(_FS, 3)
+        files = []
+        for additions, deletions, path in _numstat_entries(numstat):
+            # Binary files are reported as "-\t-\tpath"
+            additions = int(additions) if additions.isdigit() else 0
+            deletions = int(deletions) if deletions.isdigit() else 0
+            files.append({
+                "filename": path,
+                "additions": additions,
+                "deletions": deletions,
+                "changes": additions + deletions,
+            })
+        commits[sha] = {
+            "message": message.rstrip("\n"),
+            "date": to_utc_iso(date),
+            "files": files,
+        }
+    return commits
+
+
+class GitMirrorCommitSource:
+    """
+    Answer commit questions from local bare clones kept under `mirror_dir`.
+    `url_template` is formatted with the repo full name to get the clone URL;
+    point it at local paths to run against a locally created repository.
+    """
+    # COMMIT_SOURCE value selecting this source (e.g. to open it again in a worker process)
+    name = "git"
+
+    def __init__(self, mirror_dir: str = MIRROR_DIR, url_template: str = "https://github.com/{repo}.git",
+                 blob_filter: str = "blob:none", update: bool = True):
+        self.mirror_dir = mirror_dir
+        self.url_template = url_template
+        self.blob_filter = blob_filter
+        self.update = update
+        self._ready = set()
+        # (repo, ref) -> full sha, "" when the ref doesn't resolve
+        self._resolved = {}
+        # (repo, full sha) -> parsed commit
+        self._details = {}
+
+    def _git(self, repo: str, *args, input: str = None) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["git", "-c", "core.quotepath=off", "--git-dir", self.mirror_path(repo), *args],
+            input=input, capture_output=True, text=True, encoding="utf-8", errors="replace",
+        )
+
+    def mirror_path(self, repo: str) -> str:
+        return os.path.join(self.mirror_dir, repo.replace("/", "__") + ".git")
+
+    def ensure_mirror(self, repo: str) -> bool:
+        """
+        Clone `repo` on first use; fetch new commits once per process afterwards.
+        """
+        if repo in self._ready:
+            return True
+        path = self.mirror_path(repo)
+        filter_args = [f"--filter={self.blob_filter}"] if self.blob_filter else []
+        if not os.path.isdir(path):
+            os.makedirs(self.mirror_dir, exist_ok=True)
+            print(f"[INFO] Cloning {repo} into {path} ...")
+            result = subprocess.run(
+                ["git", "clone", "--quiet", "--bare", *filter_args, self.url_template.format(repo=repo), path],
+                capture_output=True, text=True,
+            )
+        elif self.update:
+            print(f"[INFO] Updating mirror of {repo} ...")
+            result = self._git(repo, "fetch", "--quiet", *filter_args, "origin", "+refs/heads/*:refs/heads/*")
+        else:
+            result = None
+        if result is not None and result.returncode != 0:
+            print(f"[SKIP] Could not clone/update {repo}: {result.stderr.strip()}")
+            return False
+        self._ready.add(repo)
+        # Make the mirror's commits available for expanding short SHAs in later stages
+        get_sha_index().build_from_git(repo, path)
+        return True
+
+    def iter_commits(self, repo: str):
+        """
+        Yield (sha, message) for every commit on the default branch, newest first,
+        like paging through /repos/{repo}/commits.
+        """
+        if not self.ensure_mirror(repo):
+            return
+        result = self._git(repo, "log", "--format=%H%x00%B%x1e", "HEAD")
+        if result.returncode != 0:
+            print(f"[SKIP] git log failed for {repo}: {result.stderr.strip()}")
+            return
+        for record in result.stdout.split(_RS):
+            record = record.lstrip("\n")
+            if not record:
+                continue
+            sha, message = record.split(_FS, 1)
+            yield sha, message.rstrip("\n")
+
+    def resolve_many(self, repo: str, refs) -> dict:
+        """
+        Expand (possibly abbreviated) SHAs to full ones with a single `git cat-file --batch-check`.
+        Unknown or ambiguous refs map to "".
+        """
+        todo = [ref for ref in dict.fromkeys(refs) if ref and (repo, ref) not in self._resolved]
+        if todo and self.ensure_mirror(repo):
+            result = self._git(repo, "cat-file", "--batch-check",
+                               input="".join(f"{ref}^{{commit}}\n" for ref in todo))
+            lines = result.stdout.splitlines()
+            for ref, line in zip(todo, lines):
+                fields = line.split()
+                self._resolved[(repo, ref)] = fields[0] if len(fields) == 3 and fields[1] == "commit" else ""
+        return {ref: self._resolved.get((repo, ref), "") for ref in refs}
+
+    def resolve_sha(self, repo: str, ref: str) -> str:
+        return self.resolve_many(repo, [ref])[ref]
+
+    def prefetch(self, pairs):
+        """
+        Load message, date and numstat of many (repo, sha) pairs with as few `git show` calls as possible.
+        """
+        by_repo = {}
+        for repo, ref in pairs:
+            by_repo.setdefault(repo, []).append(ref)
+        for repo, refs in by_repo.items():
+            self.prefetch_repo(repo, refs)
+
+    def prefetch_repo(self, repo: str, refs):
+        resolved = self.resolve_many(repo, refs)
+        missing = [sha for sha in dict.fromkeys(resolved.values()) if sha and (repo, sha) not in self._details]
+        for start in range(0, len(missing), _SHOW_BATCH):
+            batch = missing[start:start + _SHOW_BATCH]
+            # -m --first-parent: diff merges against their first parent, as the REST API does
+            # -z: paths come unquoted, whatever characters they contain
+            result = self._git(repo, "show", "--numstat", "-z", "-m", "--first-parent", _SHOW_FORMAT, *batch)
+            if result.returncode != 0:
+                print(f"[ERROR] git show failed for {repo}: {result.stderr.strip()}")
+                continue
+            for sha, details in _parse_show_output(result.stdout).items():
+                self._details[(repo, sha)] = details
+
+    def _commit(self, repo: str, ref: str):
+        sha = self.resolve_sha(repo, ref)
+        if not sha:
+            print(f"[SKIP] Commit {ref} not found in {repo}")
+            return None
+        if (repo, sha) not in self._details:
+            self.prefetch_repo(repo, [sha])
+        return self._details.get((repo, sha))
+
+    def get_message(self, repo: str, ref: str) -> str:
+        commit = self._commit(repo, ref)
+        return commit["message"] if commit else ""
+
+    def get_files(self, repo: str, ref: str) -> list:
+        commit = self._commit(repo, ref)
+        return commit["files"] if commit else []
+
+    def get_author_date(self, repo: str, ref: str) -> str:
+        commit = self._commit(repo, ref)
+        return commit["date"] if commit else ""
+
+    def get_stats(self, repo: str, ref: str) -> dict:
+        """
+        Return {"files_count", "additions", "deletions"} of a commit.
+        """
+        files = self.get_files(repo, ref)
+        return {
+            "files_count": len(files),
+            "additions": sum(file["additions"] for file in files),
+            "deletions": sum(file["deletions"] for file in files),
+        }
+
+
+def source_name(source) -> str:
+    """
+    COMMIT_SOURCE value that selects `source` (None is the REST API).
+    """
+    return "api" if source is None else source.name
+
+
+def get_commit_source(name: str = None):
+    """
+    Return the commit source selected by `name` (or the COMMIT_SOURCE environment variable).
+    None means the scripts' own GitHub REST API fetchers.
+    """
+    name = (name or os.getenv("COMMIT_SOURCE", "api")).lower()
+    if name == "api":
+        return None
+    if name == "git":
+        return GitMirrorCommitSource()
+    if name == "graphql":
+        # Imported here to keep the git backend usable without requests installed
+        from graphql_batch import GraphQLCommitSource
+        return GraphQLCommitSource()
+    raise ValueError(f"Unknown commit source: {name} (expected 'api', 'git' or 'graphql')")
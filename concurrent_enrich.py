@@ -0,0 +1,57 @@
+"""
+Concurrent execution mode for the per-row enrichment stages
+(collect_regression_chain, collect_memory_related_regression, filter_commits.main, collect_regression_information).
+
+Each stage hands over one lookup function per input row. Lookups are scheduled by asyncio with at most
+`max_in_flight` running at the same time; since the scripts use blocking `requests`, every lookup runs
+in a worker thread. Results are handed back in input order, so output CSVs look exactly like a
+sequential run. Throttling is handled by the token pool in github_api.py.
+With a `stage` name, the rows handled and the time taken are recorded in the run metrics (metrics.py).
+
+GITHUB_MAX_IN_FLIGHT -> default number of concurrent lookups (default: 1, i.e. sequential)
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import get_metrics
+
+DEFAULT_IN_FLIGHT = int(os.getenv("GITHUB_MAX_IN_FLIGHT", 1))
+
+
+async def _run_ordered(func, items, handle, max_in_flight: int):
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    # Keep a few finished results queued behind a slow row, but never read the whole input ahead
+    window = max_in_flight * 4
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = deque()
+        for item in items:
+            pending.append((item, loop.run_in_executor(pool, func, item)))
+            if len(pending) >= window:
+                head, future = pending.popleft()
+                handle(head, await future)
+        while pending:
+            head, future = pending.popleft()
+            handle(head, await future)
+
+
+def run_ordered(func, items, handle, max_in_flight: int = None, stage: str = None):
+    """
+    Call `func(item)` for every item with up to `max_in_flight` calls in parallel,
+    then `handle(item, result)` in input order from the calling thread.
+    """
+    # asyncio is only needed once a stage runs, not to import the scripts
+    import asyncio
+
+    max_in_flight = max(1, max_in_flight or DEFAULT_IN_FLIGHT)
+    if stage is None:
+        asyncio.run(_run_ordered(func, items, handle, max_in_flight))
+        return
+    with get_metrics().stage(stage) as stats:
+        def handle_row(item, result):
+            handle(item, result)
+            stats.add()
+        asyncio.run(_run_ordered(func, items, handle_row, max_in_flight))
@@ -1,11 +1,14 @@
 # I want to write a script to deduplicate the entries in the csv file.
+# pandas is imported by the functions that use it, so importing this module stays cheap.
 
-import pandas as pd
+from sha_index import canonical_map, get_sha_index
 
 def deduplicate_csv(input_file, output_file):
     """
     Read a CSV file and remove duplicate entries based on the first column."
     """
+    import pandas as pd
+
     # Read the CSV file into a DataFrame
     df = pd.read_csv(input_file, header=None)
 
@@ -16,11 +19,50 @@ def deduplicate_csv(input_file, output_file):
     df_deduplicated.to_csv(output_file, index=False, header=False)
     print(f"Deduplicated CSV saved as {output_file}")
 
+def repo_canonicalizer(repo, shas, index=None):
+    """
+    Return a function mapping each SHA of `shas` (all from `repo`) to the key it is deduplicated on.
+    SHAs are first expanded with the SHA index. The index is often partial (search hits, `max_commits`
+    or `since` scans), so SHAs it has no commit for are then matched against the longer SHAs of the file.
+    Prefixes the index knows to be ambiguous stay as they are.
+    """
+    known = index is not None and index.has_repo(repo)
+    expanded, unknown = {}, set()
+    for sha in set(shas):
+        expanded[sha] = index.canonical(repo, sha) if known else sha.strip().lower()
+        if not (known and index.matches(repo, expanded[sha], limit=1)):
+            unknown.add(sha)
+    mapping = canonical_map(expanded.values())
+    return lambda sha: mapping.get(expanded[sha], expanded[sha]) if sha in unknown else expanded[sha]
+
+def deduplicate_commits_csv(input_file, output_file, index=None, sha_columns=(1, 2)):
+    """
+    Like deduplicate_csv, but a short SHA and the full SHA of the same commit count as one entry.
+    Column 0 is the repo. SHAs are expanded with the SHA index (sha_index.py) where it knows them;
+    a short SHA it can't expand is matched against the longer SHAs of the same repo in the file.
+    The first row of each group is kept, with its SHAs as they were written.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(input_file, header=None, dtype=str, keep_default_na=False)
+    sha_columns = list(sha_columns)
+
+    canonical = {}
+    for repo, group in df.groupby(0, sort=False):
+        canonical[repo] = repo_canonicalizer(repo, group[sha_columns].to_numpy().ravel(), index)
+
+    keys = pd.DataFrame(index=df.index, data={
+        column: [canonical[repo](sha) for repo, sha in zip(df[0], df[column])] for column in sha_columns
+    })
+    df_deduplicated = df[~keys.duplicated(subset=sha_columns)]
+
+    df_deduplicated.to_csv(output_file, index=False, header=False)
+    print(f"Deduplicated CSV saved as {output_file} ({len(df) - len(df_deduplicated)} duplicate(s) removed)")
+
 if __name__ == "__main__":
     # Specify the input and output file paths
     input_file = "regression_chains.csv"
     output_file = "regression_chains_de.csv"
 
-    # Call the deduplication function
-    deduplicate_csv(input_file, output_file)
-    
\ No newline at end of file
+    # Call the deduplication function; short and full SHAs of a commit are treated as the same
+    deduplicate_commits_csv(input_file, output_file, index=get_sha_index())
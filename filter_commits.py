@@ -5,57 +5,32 @@ oputput: filtered_regression_commits.csv file
 """
 
 import csv
-import os
-import time 
-import requests
 
-# Get GitHub token from environment
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    raise ValueError("Please set the GITHUB_TOKEN environment variable")
+from commit_facts import get_commit_facts
+from commit_source import get_commit_source
+from concurrent_enrich import run_ordered
+from result_writer import ResultWriter
 
-def fetch_commit_files(repo_full_name: str, commit_sha: str):
+def commits_touch_c_files(repo: str, BIC_sha: str, BFC_sha: str, source=None) -> bool:
     """
-    Fetch details for a single commit from GitHub, returning its 'files' list.
-    Each file item typically has {filename, additions, deletions, changes, patch, ...}.
+    Return True if both the BIC and the BFC change at least one C file.
     """
-    url = f"https://api.github.com/repos/{repo_full_name}/commits/{commit_sha}"
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-
-    while True:  # Loop to retry in case of rate limits
-        resp = requests.get(url, headers=headers)
-        
-        if resp.status_code == 404:
-            print(f"[SKIP] Commit {commit_sha} not found in {repo_full_name}")
-            return []
-        elif resp.status_code == 403:
-            print("[WAIT] Rate limit exceeded. Waiting for 60 seconds...")
-            time.sleep(60)  # Wait 60 seconds before retrying
-            continue  # Retry request
-        
-        resp.raise_for_status()
-        return resp.json().get("files", [])
-
-def filter_commits(repo: str, BIC_sha: str, BFC_sha: str):
     if not BIC_sha or not BFC_sha:
         print(f"[SKIP] {repo}: Missing BIC or BFC SHA.")
-        return
+        return False
+
+    # Changed files are looked up in the commit facts table (extracted from `source` or the GitHub API)
+    facts = get_commit_facts()
 
     # Check if BIC contains any C files
-    BIC_files = fetch_commit_files(repo, BIC_sha)
-    BIC_file_paths = [file["filename"] for file in BIC_files]
-    BIC_file_paths = [path for path in BIC_file_paths if path.endswith(".c")]
-    if not BIC_file_paths:
+    if not facts.touches_extension(repo, BIC_sha, ".c", source):
         print(f"[SKIP] {repo}: BIC {BIC_sha} does not contain any C files.")
-        return
+        return False
     
     # Check if BFC contains any C files
-    BFC_files = fetch_commit_files(repo, BFC_sha)
-    BFC_file_paths = [file["filename"] for file in BFC_files]
-    BFC_file_paths = [path for path in BFC_file_paths if path.endswith(".c")]
-    if not BFC_file_paths:
+    if not facts.touches_extension(repo, BFC_sha, ".c", source):
         print(f"[SKIP] {repo}: BFC {BFC_sha} does not contain any C files.")
-        return
+        return False
     
     # # Check if BIC contains less than 100 lines of changes(+ and -)
     # BIC_changes = sum(file["changes"] for file in BIC_files)
@@ -67,33 +42,46 @@ def filter_commits(repo: str, BIC_sha: str, BFC_sha: str):
     # BFC_changes = sum(file["changes"] for file in BFC_files)
     # if BFC_changes > 100:
     #     print(f"[SKIP] {repo}: BFC {BFC_sha} has more than 100 lines of changes.")
-    #     return
-    
-    output_file = "regression_commits_filtered.csv"
-    
-    # Create output CSV and add a header if empty
-    if not os.path.exists(output_file) or os.stat(output_file).st_size == 0:
-        with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["repo", "BIC_sha", "BFC_sha"])  # Add CSV Header
+    #     return False
 
-    with open(output_file, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow([repo, BIC_sha, BFC_sha])
+    return True
 
-def main(csv_path: str):
-    with open(csv_path, "r", newline="", encoding="utf-8") as csvfile:
-        reader = csv.reader(csvfile)
+FILTERED_OUTPUT = "regression_commits_filtered.csv"
+FILTERED_HEADER = ["repo", "BIC_sha", "BFC_sha"]
 
-        for row in reader:
-            if not row:
-                continue
+def prefetch_rows(rows, source, max_in_flight=None):
+    """
+    Extract the commit facts of all BICs and BFCs of the input in one go.
+    """
+    pairs = []
+    for row in rows:
+        repo = row[0].strip()
+        pairs.extend([(repo, row[1]), (repo, row[2])])
+    get_commit_facts().extract(pairs, source, max_in_flight, need_files=True)
+
+def main(csv_path: str, source=None, max_in_flight=None, output_path: str = FILTERED_OUTPUT):
+    """
+    `max_in_flight` > 1 checks that many rows concurrently; rows are still written in input order.
+    Rows checked by an earlier (or interrupted) run are skipped.
+    """
+    with ResultWriter(output_path, header=FILTERED_HEADER) as writer:
+        with open(csv_path, "r", newline="", encoding="utf-8") as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader, None)  # skip the header row
+            rows = [row for row in reader if row and not writer.done(row[:3])]
+
+        prefetch_rows(rows, source, max_in_flight)
+
+        def check(row):
             project_name = row[0].strip()
             repo = project_name
-            BIC_sha = row[1]
-            BFC_sha = row[2]
             print(f"\n[INFO] Processing {repo} ...")
-            filter_commits(repo, BIC_sha, BFC_sha)
+            return commits_touch_c_files(repo, row[1], row[2], source)
+
+        def write(row, keep):
+            writer.write(row[:3], [row[0].strip(), row[1], row[2]] if keep else None)
+
+        run_ordered(check, rows, write, max_in_flight, stage="filtered")
 
 if __name__ == "__main__":
-    main("regression_commits.csv")
+    main("regression_commits.csv", source=get_commit_source())
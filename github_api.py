@@ -0,0 +1,211 @@
+"""
+Shared GitHub client used by all collection scripts.
+Every GET goes through the on-disk response cache first (see response_cache.py);
+stale entries are revalidated with conditional requests (ETag / Last-Modified).
+Live requests go through one `requests.Session` (keep-alive connection pool, gzip) and draw their
+token from the shared token pool (see token_pool.py): a throttled token is taken out of rotation
+until its reset / Retry-After and the request is retried with the next one, so callers only wait
+once every token is exhausted. Connection errors and 5xx answers are retried with exponential
+backoff and jitter, a bounded number of times.
+get_json() gives every script the same handling of 401 / 403 / 404 / 409 / 422 answers.
+Requests, cache outcomes, retries and sleeps are recorded in the run metrics (see metrics.py).
+Live responses can be recorded to a cassette and served back by a local stub (see replay.py).
+`requests` is only imported once a live request is sent, so the scripts importing this module for
+their offline parts (classification, dedup, cached data) start without it.
+
+GITHUB_API_URL     -> REST API base URL, e.g. a replay stub (default: https://api.github.com)
+GITHUB_MAX_RETRIES -> retries of a failing request (default: 5)
+GITHUB_TIMEOUT     -> seconds before a request times out (default: 30)
+GITHUB_POOL_SIZE   -> keep-alive connections kept per host (default: 32)
+"""
+
+import os
+import random
+import threading
+import time
+
+from metrics import get_metrics
+from replay import get_recorder
+from response_cache import DEFAULT_TTL, ResponseCache, conditional_headers, make_cache_key
+from sqlite_store import shared
+from token_pool import get_token_pool, resource_for
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", 5))
+TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", 30))
+POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", 32))
+
+# Transient server-side failures worth retrying
+RETRY_STATUSES = {500, 502, 503, 504}
+# Answers that mean "there is nothing to get here"; get_json() returns None for them
+SKIP_STATUSES = {
+    401: "Unauthorized, check your GitHub token",
+    403: "Forbidden",
+    404: "Not Found",
+    409: "Conflict (empty repository?)",
+    422: "Unprocessable Entity",
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def backoff_delay(attempt: int, base: float = 1, cap: float = 60) -> float:
+    """
+    Exponential backoff with full jitter: a random delay in [0, min(cap, base * 2**attempt)].
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def get_session():
+    """
+    The shared `requests.Session`, created on first use. Its connection pool is sized for the worker threads.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _session.headers["Accept"] = "application/vnd.github+json"
+        return _session
+
+def throttle_delay(response) -> float:
+    """
+    Return how long to back off when `response` signals throttling, 0 otherwise.
+    Uses Retry-After (secondary limits) or X-RateLimit-Reset (primary limit), else 60s.
+    """
+    if response.status_code not in (403, 429):
+        return 0
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return int(retry_after)
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = response.headers.get("X-RateLimit-Reset")
+        if reset and reset.isdigit():
+            return max(int(reset) - time.time(), 1)
+    if response.status_code == 429 or "rate limit" in response.text.lower():
+        return 60
+    # A plain 403 (permissions) is not throttling
+    return 0
+
+
+@shared
+def get_cache() -> ResponseCache:
+    """
+    Open the shared response cache lazily, so importing this module has no side effects.
+    """
+    return ResponseCache()
+
+
+def _send(method: str, url: str, headers: dict = None, **kwargs):
+    """
+    Send a request with the pool token that has the most quota left.
+    Throttled requests are retried with another token (or after the earliest reset);
+    connection errors and 5xx answers are retried up to MAX_RETRIES times with backoff,
+    after which the last error is raised / the last response returned.
+    """
+    import requests
+
+    pool = get_token_pool()
+    metrics = get_metrics()
+    resource = resource_for(url)
+    attempt = 0
+    while True:
+        token = pool.acquire(resource)
+        start = time.monotonic()
+        try:
+            response = get_session().request(method, url, headers=pool.authorize(headers, token),
+                                             timeout=TIMEOUT, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            metrics.observe_request(method, url, type(error).__name__, time.monotonic() - start, 0)
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            metrics.count_retry(type(error).__name__)
+            print(f"[RETRY] {type(error).__name__} for {url}, retrying in {delay:.1f}s")
+        else:
+            metrics.observe_request(method, url, response.status_code, time.monotonic() - start,
+                                    len(response.content))
+            recorder = get_recorder()
+            if recorder is not None:
+                recorder.record(response)
+            if pool.update(token, resource, response, throttle_delay(response)):
+                metrics.count_retry("throttled")
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                return response
+            delay = backoff_delay(attempt)
+            metrics.count_retry(str(response.status_code))
+            print(f"[RETRY] {response.status_code} for {url}, retrying in {delay:.1f}s")
+        attempt += 1
+        metrics.add_sleep("backoff", delay)
+        time.sleep(delay)
+
+
+def github_get(url: str, headers: dict = None, params: dict = None):
+    """
+    Live GET through the token pool.
+    """
+    return _send("GET", url, headers, params=params)
+
+
+def github_post(url: str, headers: dict = None, json: dict = None):
+    """
+    Live POST (used for GraphQL queries) through the same token pool as github_get.
+    """
+    return _send("POST", url, headers, json=json)
+
+
+def cached_get(url: str, headers: dict = None, params: dict = None, ttl: int = DEFAULT_TTL):
+    """
+    GET `url` through the response cache:
+    - an entry younger than `ttl` seconds is returned without any request;
+    - an older one is revalidated with If-None-Match / If-Modified-Since; a 304 (free, not counted
+      against the rate limit) returns the stored response, a 200 replaces it.
+    Use ttl=0 for data that changes (commit listings, languages, issues) to always revalidate.
+    Only 200 responses are stored; errors (403, 404, ...) are always returned live
+    so the callers keep their own retry/skip handling.
+    """
+    key = make_cache_key(url, params)
+    entry = get_cache().lookup(key)
+    if entry is not None:
+        cached, age = entry
+        if age <= ttl:
+            get_metrics().count_cache("fresh")
+            return cached
+        headers = {**(headers or {}), **conditional_headers(cached)}
+
+    response = github_get(url, headers=headers, params=params)
+    if response.status_code == 304 and entry is not None:
+        get_metrics().count_cache("revalidated")
+        get_cache().touch(key)
+        return entry[0]
+    get_metrics().count_cache("miss")
+    if response.status_code == 200:
+        get_cache().put(key, response.status_code, response.headers, response.content)
+    return response
+
+
+def check_response(response, url: str):
+    """
+    Return the decoded JSON of a 200 answer, or None (with a [SKIP] line) for the SKIP_STATUSES.
+    Anything else unexpected raises.
+    """
+    if response.status_code in SKIP_STATUSES:
+        print(f"[SKIP] {response.status_code} {SKIP_STATUSES[response.status_code]}: {url}")
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+def get_json(url: str, params: dict = None, ttl: int = DEFAULT_TTL, headers: dict = None):
+    """
+    cached_get() + check_response(): the decoded JSON of `url`, or None if GitHub has nothing for us.
+    """
+    return check_response(cached_get(url, headers=headers, params=params, ttl=ttl), url)
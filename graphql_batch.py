@@ -0,0 +1,191 @@
+"""
+Batch commit lookups through the GitHub GraphQL API.
+Instead of one REST call per commit, (repo, sha) pairs are grouped into aliased queries:
+
+    query {
+      r0: repository(owner: "redis", name: "redis") {
+        c0: object(expression: "496375f") { ... on Commit { oid message authoredDate ... } }
+        c1: object(expression: "0b645d6") { ... }
+      }
+      r1: repository(owner: "netdata", name: "netdata") { ... }
+    }
+
+so up to 100 commits cost a single request.
+GraphQL has no per-file list for a commit: get_files() asks the REST commit endpoint (one request per
+commit), so stages that need file names (filter_commits) are better served by REST or git.
+
+GITHUB_GRAPHQL_URL -> endpoint (default: GITHUB_API_URL + /graphql), can point at a local stub
+"""
+
+import json
+import os
+
+from commit_source import to_utc_iso
+from github_api import GITHUB_API_URL, get_json, github_post
+
+GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", f"{GITHUB_API_URL}/graphql")
+BATCH_SIZE = 100
+
+COMMIT_FIELDS = "oid message authoredDate changedFiles additions deletions"
+
+
+def _auth_headers() -> dict:
+    token = os.getenv("GITHUB_TOKEN")
+    return {"Authorization": f"bearer {token}"} if token else {}
+
+
+def build_commit_query(pairs) -> tuple:
+    """
+    Build one aliased query for `pairs` of (repo, sha).
+    Return (query string, {(repo alias, commit alias): (repo, sha)}).
+    """
+    by_repo = {}
+    for repo, sha in pairs:
+        by_repo.setdefault(repo, []).append(sha)
+
+    aliases = {}
+    blocks = []
+    for repo_index, (repo, shas) in enumerate(by_repo.items()):
+        owner, name = repo.split("/", 1)
+        repo_alias = f"r{repo_index}"
+        commits = []
+        for commit_index, sha in enumerate(shas):
+            commit_alias = f"c{commit_index}"
+            aliases[(repo_alias, commit_alias)] = (repo, sha)
+            # json.dumps gives a correctly escaped GraphQL string literal
+            commits.append(f"{commit_alias}: object(expression: {json.dumps(sha)}) {{ ... on Commit {{ {COMMIT_FIELDS} }} }}")
+        blocks.append(f"{repo_alias}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{ {' '.join(commits)} }}")
+    return "query { " + " ".join(blocks) + " }", aliases
+
+
+def run_query(query: str, variables: dict = None, url: str = GITHUB_GRAPHQL_URL) -> dict:
+    """
+    POST a GraphQL query and return its "data" (partial data is kept when some nodes fail).
+    Rate limits are waited out by github_post (token pool).
+    """
+    response = github_post(url, headers=_auth_headers(), json={"query": query, "variables": variables or {}})
+    if response.status_code in (401, 403):
+        print(f"[SKIP] {response.status_code}: Check your GitHub token!")
+        return {}
+    response.raise_for_status()
+    payload = response.json()
+    for error in payload.get("errors", []):
+        # NOT_FOUND for a missing repo or commit only nulls that alias
+        print(f"[WARN] GraphQL: {error.get('message')}")
+    return payload.get("data") or {}
+
+
+def fetch_commits_batch(pairs, url: str = GITHUB_GRAPHQL_URL, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Fetch message, author date, changedFiles, additions and deletions for many (repo, sha) pairs.
+    Return {(repo, sha): {"oid", "message", "authoredDate", "changedFiles", "additions", "deletions"}};
+    pairs that don't resolve to a commit are missing from the result.
+    """
+    pairs = [pair for pair in dict.fromkeys(pairs) if pair[0] and pair[1]]
+    results = {}
+    for start in range(0, len(pairs), batch_size):
+        query, aliases = build_commit_query(pairs[start:start + batch_size])
+        data = run_query(query, url=url)
+        for (repo_alias, commit_alias), pair in aliases.items():
+            commit = (data.get(repo_alias) or {}).get(commit_alias)
+            if commit and commit.get("oid"):
+                commit["authoredDate"] = to_utc_iso(commit["authoredDate"])
+                results[pair] = commit
+    return results
+
+
+HISTORY_QUERY = """
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef { target { ... on Commit {
+      history(first: 100, after: $cursor) { pageInfo { hasNextPage endCursor } nodes { oid message } }
+    } } }
+  }
+}
+"""
+
+
+class GraphQLCommitSource:
+    """
+    Commit source (see commit_source.py) backed by batched GraphQL lookups.
+    Call prefetch() with all pairs a stage needs; later single lookups are answered from memory.
+    """
+    # COMMIT_SOURCE value selecting this source
+    name = "graphql"
+    # Per-file data costs a REST call per commit (get_files): commit_facts only asks for it when needed
+    lacks_files = True
+
+    def __init__(self, url: str = GITHUB_GRAPHQL_URL, batch_size: int = BATCH_SIZE):
+        self.url = url
+        self.batch_size = batch_size
+        self._commits = {}
+
+    def prefetch(self, pairs):
+        todo = [pair for pair in pairs if pair not in self._commits]
+        fetched = fetch_commits_batch(todo, url=self.url, batch_size=self.batch_size)
+        for pair in todo:
+            self._commits[pair] = fetched.get(pair)
+
+    def _commit(self, repo: str, sha: str):
+        if (repo, sha) not in self._commits:
+            self.prefetch([(repo, sha)])
+        commit = self._commits[(repo, sha)]
+        if commit is None:
+            print(f"[SKIP] Commit {sha} not found in {repo}")
+        return commit
+
+    def iter_commits(self, repo: str):
+        """
+        Yield (sha, message) along the default branch history, 100 commits per request.
+        """
+        owner, name = repo.split("/", 1)
+        cursor = None
+        while True:
+            data = run_query(HISTORY_QUERY, {"owner": owner, "name": name, "cursor": cursor}, url=self.url)
+            branch = (data.get("repository") or {}).get("defaultBranchRef")
+            if not branch:
+                return
+            history = branch["target"]["history"]
+            for node in history["nodes"]:
+                yield node["oid"], node["message"]
+            if not history["pageInfo"]["hasNextPage"]:
+                return
+            cursor = history["pageInfo"]["endCursor"]
+
+    def resolve_sha(self, repo: str, sha: str) -> str:
+        commit = self._commit(repo, sha)
+        return commit["oid"] if commit else ""
+
+    def get_message(self, repo: str, sha: str) -> str:
+        commit = self._commit(repo, sha)
+        return commit["message"] if commit else ""
+
+    def get_author_date(self, repo: str, sha: str) -> str:
+        commit = self._commit(repo, sha)
+        return commit["authoredDate"] if commit else ""
+
+    def get_stats(self, repo: str, sha: str) -> dict:
+        commit = self._commit(repo, sha)
+        if not commit:
+            return {"files_count": 0, "additions": 0, "deletions": 0}
+        return {
+            "files_count": commit["changedFiles"],
+            "additions": commit["additions"],
+            "deletions": commit["deletions"],
+        }
+
+    def get_files(self, repo: str, sha: str) -> list:
+        """
+        Changed files of a commit, from the REST commit endpoint (GraphQL has no per-file data).
+        """
+        commit = self._commit(repo, sha)
+        if not commit:
+            return []
+        data = get_json(f"{GITHUB_API_URL}/repos/{repo}/commits/{commit['oid']}")
+        if data is None:
+            return []
+        return [
+            {"filename": file["filename"], "additions": file["additions"],
+             "deletions": file["deletions"], "changes": file["changes"]}
+            for file in data.get("files", [])
+        ]
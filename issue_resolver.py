@@ -0,0 +1,94 @@
+"""
+Linked issue resolution for the memory bug classification (collect_memory_related_chains).
+A commit message can reference several issues / PRs (github.com links, "fixes #123"); all of them
+are resolved, not only the first. Each issue is fetched once per run, however many commits
+reference it, and a batch of references is fetched concurrently. Requests go through the response
+cache (revalidated, since issues can be edited).
+
+References are "owner/repo#number" strings, as produced by commit_facts.extract_issue_refs.
+"""
+
+import threading
+
+from commit_facts import extract_issue_refs
+from concurrent_enrich import run_ordered
+from github_api import GITHUB_API_URL, get_json
+
+
+def fetch_issue_text(ref: str) -> str:
+    """
+    Title and body of the issue (or PR) `ref`, "" if it can't be fetched.
+    """
+    repo, number = ref.rsplit("#", 1)
+    # The issues endpoint serves pull requests too
+    data = get_json(f"{GITHUB_API_URL}/repos/{repo}/issues/{number}", ttl=0)
+    if data is None:
+        return ""
+    print(f"[INFO] Fetched linked issue #{number} from {repo}")
+    return (data.get("title") or "") + "\n" + (data.get("body") or "")
+
+
+class IssueResolver:
+    def __init__(self, fetch=fetch_issue_text):
+        self._fetch = fetch
+        self._cond = threading.Condition()
+        # ref -> fetched text; refs being fetched by some thread
+        self._texts = {}
+        self._pending = set()
+        self.fetched = 0
+        self.reused = 0
+
+    def get(self, ref: str) -> str:
+        """
+        Text of `ref`, fetched on first use. Concurrent callers asking for the same ref wait for
+        a single fetch.
+        """
+        with self._cond:
+            while ref in self._pending:
+                self._cond.wait()
+            if ref in self._texts:
+                self.reused += 1
+                return self._texts[ref]
+            self._pending.add(ref)
+        text = ""
+        try:
+            text = self._fetch(ref)
+        finally:
+            with self._cond:
+                self._texts[ref] = text
+                self._pending.discard(ref)
+                self.fetched += 1
+                self._cond.notify_all()
+        return text
+
+    def resolve(self, refs, max_in_flight=None) -> int:
+        """
+        Fetch all references of a batch that aren't known yet, `max_in_flight` at a time.
+        Return the number of issues fetched.
+        """
+        with self._cond:
+            missing = [ref for ref in dict.fromkeys(refs) if ref not in self._texts]
+        run_ordered(self.get, missing, lambda ref, text: None, max_in_flight, stage="linked_issues")
+        return len(missing)
+
+    def text(self, refs) -> str:
+        """
+        Combined text of the referenced issues, in reference order.
+        """
+        return "\n".join(text for text in map(self.get, refs) if text)
+
+    def text_for_message(self, message: str, repo: str) -> str:
+        return self.text(extract_issue_refs(message, repo))
+
+
+_resolver = None
+
+
+def get_issue_resolver() -> IssueResolver:
+    """
+    Shared resolver, so issues fetched by one stage are reused by the next.
+    """
+    global _resolver
+    if _resolver is None:
+        _resolver = IssueResolver()
+    return _resolver
@@ -0,0 +1,57 @@
+"""
+Multi-keyword matching for commit messages (bug0_keywords / bug1_keywords).
+The keyword list is compiled once, then each message is scanned for all keywords at the same time
+and the keywords that hit are reported (not just a boolean).
+
+Keywords are grouped under a shared core word (e.g. "fix " / " fixed" / "fixes " under "fix"),
+and a group's variants are only checked when its core occurs, so a message without any core costs
+one substring search per group. In CPython that beats a hand-written automaton, whose per-character
+Python loop is slower than the C substring search behind `in`.
+"""
+
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        # Duplicates (e.g. "crash" and "assertion" appear twice in bug0_keywords) are only reported once
+        self.keywords = list(dict.fromkeys(keywords))
+        self._groups = self._build_groups(self.keywords)
+
+    @staticmethod
+    def _build_groups(keywords) -> list:
+        """
+        Return [(core, [(index, keyword), ...]), ...] such that every keyword contains its group's core.
+        """
+        cores = sorted({keyword.strip() or keyword for keyword in keywords}, key=len)
+        roots = {}
+        for core in cores:
+            # The shortest already-chosen root contained in this core, else the core itself
+            roots[core] = next((root for root in roots.values() if root in core), core)
+        groups = {}
+        for index, keyword in enumerate(keywords):
+            groups.setdefault(roots[keyword.strip() or keyword], []).append((index, keyword))
+        return list(groups.items())
+
+    def _hit_indices(self, text: str):
+        return {
+            index
+            for core, members in self._groups if core in text
+            for index, keyword in members if keyword in text
+        }
+
+    def find(self, text: str) -> list:
+        """
+        Return the keywords occurring in `text`, in keyword-list order.
+        """
+        return [self.keywords[index] for index in sorted(self._hit_indices(text))]
+
+    def contains_any(self, text: str) -> bool:
+        return any(
+            any(keyword in text for _, keyword in members)
+            for core, members in self._groups if core in text
+        )
+
+    def find_many(self, texts) -> list:
+        """
+        Bulk version of find() over a list of messages.
+        """
+        return [self.find(text) for text in texts]
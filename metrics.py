@@ -0,0 +1,302 @@
+"""
+Run instrumentation: what the GitHub calls and the stages of a run cost.
+- per endpoint (method + path with owner / repo / SHAs / numbers replaced by placeholders):
+  request count, status codes, latency histogram, bytes downloaded
+- response cache outcomes (fresh hit, revalidated with a 304, miss)
+- retries (5xx, connection errors, throttled tokens) and seconds slept (backoff, rate limit)
+- per stage: rows handled, seconds, rows / second
+Worker processes (parallel scan) send a snapshot of their metrics back to be merged into the parent's.
+The summary has the wall-clock and CPU time of the process next to the request time and sleep time,
+so it shows whether a run was network-bound (request seconds), quota-bound (rate limit sleeps) or
+CPU-bound (CPU seconds).
+
+It is written as JSON and as a Prometheus textfile (for node_exporter's textfile collector) when the
+process exits, and every METRICS_INTERVAL seconds during the run if set.
+
+METRICS_DIR      -> directory of run_metrics.json / github_pipeline.prom, "" to disable (default: metrics)
+METRICS_INTERVAL -> seconds between exports during the run, 0 for only at exit (default: 0)
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 0))
+
+# Upper bounds (seconds) of the latency histogram buckets; the last one catches everything
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf"))
+
+_SHA = re.compile(r"[0-9a-f]{7,40}")
+# The scripts import this module (through github_api) right away: close enough to the process start
+_STARTED = time.time()
+
+
+def endpoint_for(method: str, url: str) -> str:
+    """
+    Endpoint of a request, e.g. "GET /repos/:owner/:repo/commits/:sha".
+    """
+    parts = urlparse(url).path.strip("/").split("/")
+    if parts[0] == "repos" and len(parts) >= 3:
+        parts[1:3] = [":owner", ":repo"]
+    parts = [":number" if part.isdigit() else ":sha" if _SHA.fullmatch(part) else part for part in parts]
+    return f"{method} /{'/'.join(parts)}"
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, rows: int = 1):
+        with self._lock:
+            self.rows += rows
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds, 3) if self.seconds else 0,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = _STARTED
+        # endpoint -> {"count", "statuses", "buckets", "seconds", "bytes"}
+        self.endpoints = {}
+        self.cache = Counter()
+        self.retries = Counter()
+        self.sleep_seconds = Counter()
+        self.stages = {}
+        # CPU time of worker processes whose metrics were merged in
+        self.worker_cpu_seconds = 0.0
+
+    def observe_request(self, method: str, url: str, status: int, seconds: float, size: int):
+        endpoint = endpoint_for(method, url)
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                "count": 0, "statuses": Counter(), "buckets": [0] * len(LATENCY_BUCKETS), "seconds": 0.0, "bytes": 0,
+            })
+            stats["count"] += 1
+            stats["statuses"][str(status)] += 1
+            stats["seconds"] += seconds
+            stats["bytes"] += size
+            stats["buckets"][next(i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound)] += 1
+
+    def count_cache(self, outcome: str):
+        """
+        outcome: "fresh" (served without a request), "revalidated" (304) or "miss".
+        """
+        with self._lock:
+            self.cache[outcome] += 1
+
+    def count_retry(self, reason: str):
+        with self._lock:
+            self.retries[reason] += 1
+
+    def add_sleep(self, reason: str, seconds: float):
+        with self._lock:
+            self.sleep_seconds[reason] += seconds
+
+    def _stage(self, name: str) -> StageStats:
+        with self._lock:
+            return self.stages.setdefault(name, StageStats(name))
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block of a stage; rows are counted with `.add()` on the yielded StageStats.
+        """
+        stats = self._stage(name)
+        start = time.monotonic()
+        try:
+            yield stats
+        finally:
+            with stats._lock:
+                stats.seconds += time.monotonic() - start
+
+    def track(self, name: str, records):
+        """
+        Pass records through, counting them as rows of stage `name`.
+        """
+        with self.stage(name) as stats:
+            for record in records:
+                stats.add()
+                yield record
+
+    # ------------------ worker processes ------------------
+
+    def reset(self):
+        """
+        Forget everything recorded so far (a forked worker starts with a copy of its parent's metrics).
+        """
+        with self._lock:
+            self.endpoints = {}
+            self.cache = Counter()
+            self.retries = Counter()
+            self.sleep_seconds = Counter()
+            self.stages = {}
+            self.worker_cpu_seconds = 0.0
+
+    def snapshot(self, cpu_seconds: float = 0.0) -> dict:
+        """
+        Picklable copy of the raw metrics, to merge() into another process' metrics.
+        """
+        with self._lock:
+            return {
+                "endpoints": {
+                    endpoint: {**stats, "statuses": dict(stats["statuses"]), "buckets": list(stats["buckets"])}
+                    for endpoint, stats in self.endpoints.items()
+                },
+                "cache": dict(self.cache),
+                "retries": dict(self.retries),
+                "sleep_seconds": dict(self.sleep_seconds),
+                "stages": {name: (stats.rows, stats.seconds) for name, stats in self.stages.items()},
+                "cpu_seconds": cpu_seconds,
+            }
+
+    def merge(self, snapshot: dict):
+        """
+        Add a worker's snapshot. Stage seconds of parallel workers add up, like CPU time.
+        """
+        with self._lock:
+            for endpoint, other in snapshot["endpoints"].items():
+                stats = self.endpoints.setdefault(endpoint, {
+                    "count": 0, "statuses": Counter(), "buckets": [0] * len(LATENCY_BUCKETS), "seconds": 0.0, "bytes": 0,
+                })
+                stats["count"] += other["count"]
+                stats["statuses"].update(other["statuses"])
+                stats["seconds"] += other["seconds"]
+                stats["bytes"] += other["bytes"]
+                stats["buckets"] = [mine + theirs for mine, theirs in zip(stats["buckets"], other["buckets"])]
+            self.cache.update(snapshot["cache"])
+            self.retries.update(snapshot["retries"])
+            self.sleep_seconds.update(snapshot["sleep_seconds"])
+            self.worker_cpu_seconds += snapshot["cpu_seconds"]
+            for name, (rows, seconds) in snapshot["stages"].items():
+                stats = self.stages.setdefault(name, StageStats(name))
+                stats.rows += rows
+                stats.seconds += seconds
+
+    # ------------------ export ------------------
+
+    def summary(self) -> dict:
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    "count": stats["count"],
+                    "statuses": dict(stats["statuses"]),
+                    "seconds": round(stats["seconds"], 3),
+                    "mean_seconds": round(stats["seconds"] / stats["count"], 3),
+                    "bytes": stats["bytes"],
+                    "latency_buckets": {str(bound): count for bound, count in zip(LATENCY_BUCKETS, stats["buckets"])},
+                }
+                for endpoint, stats in sorted(self.endpoints.items())
+            }
+            return {
+                "wall_seconds": round(time.time() - self.started, 3),
+                "cpu_seconds": round(time.process_time(), 3),
+                "worker_cpu_seconds": round(self.worker_cpu_seconds, 3),
+                "requests": sum(stats["count"] for stats in endpoints.values()),
+                "request_seconds": round(sum(stats["seconds"] for stats in endpoints.values()), 3),
+                "bytes_downloaded": sum(stats["bytes"] for stats in endpoints.values()),
+                "cache": dict(self.cache),
+                "retries": dict(self.retries),
+                "sleep_seconds": {reason: round(seconds, 3) for reason, seconds in self.sleep_seconds.items()},
+                "endpoints": endpoints,
+                "stages": {name: stats.to_dict() for name, stats in sorted(self.stages.items())},
+            }
+
+    def prometheus(self) -> str:
+        summary = self.summary()
+        # Samples of one metric family must be grouped under its TYPE line
+        requests, durations, sizes = [], [], []
+        with self._lock:
+            for endpoint, stats in sorted(self.endpoints.items()):
+                method, path = endpoint.split(" ", 1)
+                labels = f'method="{method}",endpoint="{path}"'
+                for status, count in sorted(stats["statuses"].items()):
+                    requests.append(f'github_requests_total{{{labels},status="{status}"}} {count}')
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else bound
+                    durations.append(f'github_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                durations.append(f"github_request_duration_seconds_sum{{{labels}}} {stats['seconds']:.6f}")
+                durations.append(f"github_request_duration_seconds_count{{{labels}}} {stats['count']}")
+                sizes.append(f"github_response_bytes_total{{{labels}}} {stats['bytes']}")
+        lines = ["# TYPE github_requests_total counter", *requests,
+                 "# TYPE github_request_duration_seconds histogram", *durations,
+                 "# TYPE github_response_bytes_total counter", *sizes]
+        lines.append("# TYPE github_cache_total counter")
+        lines += [f'github_cache_total{{outcome="{outcome}"}} {count}' for outcome, count in summary["cache"].items()]
+        lines.append("# TYPE github_retries_total counter")
+        lines += [f'github_retries_total{{reason="{reason}"}} {count}' for reason, count in summary["retries"].items()]
+        lines.append("# TYPE github_sleep_seconds_total counter")
+        lines += [f'github_sleep_seconds_total{{reason="{reason}"}} {seconds}'
+                  for reason, seconds in summary["sleep_seconds"].items()]
+        lines.append("# TYPE pipeline_stage_rows_total counter")
+        lines += [f'pipeline_stage_rows_total{{stage="{name}"}} {stats["rows"]}'
+                  for name, stats in summary["stages"].items()]
+        lines.append("# TYPE pipeline_stage_seconds_total counter")
+        lines += [f'pipeline_stage_seconds_total{{stage="{name}"}} {stats["seconds"]}'
+                  for name, stats in summary["stages"].items()]
+        lines.append("# TYPE process_wall_seconds gauge")
+        lines.append(f"process_wall_seconds {summary['wall_seconds']}")
+        lines.append("# TYPE process_cpu_seconds gauge")
+        lines.append(f"process_cpu_seconds {summary['cpu_seconds']}")
+        lines.append("# TYPE worker_cpu_seconds gauge")
+        lines.append(f"worker_cpu_seconds {summary['worker_cpu_seconds']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: str = METRICS_DIR):
+        """
+        Write run_metrics.json and github_pipeline.prom to `directory` (replacing them atomically,
+        so a collector never reads half a file).
+        """
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        for name, content in (("run_metrics.json", json.dumps(self.summary(), indent=2) + "\n"),
+                              ("github_pipeline.prom", self.prometheus())):
+            path = os.path.join(directory, name)
+            with open(path + ".tmp", "w", encoding="utf-8") as file:
+                file.write(content)
+            os.replace(path + ".tmp", path)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def _export_periodically(metrics: Metrics, interval: float):
+    while True:
+        time.sleep(interval)
+        metrics.export()
+
+
+def get_metrics() -> Metrics:
+    """
+    The metrics of this process, created on first use; they are exported at exit (and every
+    METRICS_INTERVAL seconds) when METRICS_DIR is set.
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+            if METRICS_DIR:
+                atexit.register(_metrics.export)
+                if METRICS_INTERVAL > 0:
+                    threading.Thread(target=_export_periodically, args=(_metrics, METRICS_INTERVAL),
+                                     daemon=True).start()
+        return _metrics
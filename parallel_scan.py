@@ -0,0 +1,145 @@
+"""
+Parallel scan mode for collect_all_regression.
+Repos from a projects CSV are spread over a process pool, so parsing, keyword matching and CSV writes
+of one repo no longer block the others. Every repo is written to its own shard file
+(SHARD_DIR/<owner>__<name>.csv), so workers never share an output file, and a merge step
+concatenates the shards in projects-file order into the final regression_commits_all dataset.
+The merged file only depends on the shards, not on which worker finished first.
+Workers send the metrics of their scans back (see metrics.py), so they are part of the run's report.
+Workers share the SQLite files (opened with WAL and a busy timeout, see sqlite_store.py) and the
+GitHub tokens: each worker leaves GITHUB_TOKEN_RESERVE (default: workers - 1) requests of every
+token's quota to the others (see token_pool.py).
+
+SCAN_WORKERS -> default number of worker processes (default: number of CPUs)
+SHARD_DIR    -> directory holding the per-repo shards (default: regression_shards)
+"""
+
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from metrics import get_metrics
+from result_writer import discard
+
+DEFAULT_WORKERS = int(os.getenv("SCAN_WORKERS", os.cpu_count() or 1))
+SHARD_DIR = os.getenv("SHARD_DIR", "regression_shards")
+
+REGRESSION_FIELDS = ["repo", "BFC_sha", "BIC_sha"]
+
+
+def read_projects(project_path: str) -> list:
+    """
+    Return the repo full names of a projects CSV (name, stars, commits), without duplicates.
+    """
+    with open(project_path, "r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)
+        repos = [row[0].strip() for row in reader if row and row[0].strip()]
+    return list(dict.fromkeys(repos))
+
+
+def shard_path(repo: str, shard_dir: str = SHARD_DIR) -> str:
+    return os.path.join(shard_dir, repo.replace("/", "__") + ".csv")
+
+
+def scan_repo(repo: str, shard_dir: str = SHARD_DIR, max_commits: int = 500,
+              source_name: str = None, incremental: bool = True) -> int:
+    """
+    Worker: scan one repo into its shard and return the number of regressions found.
+    Commit sources and the scan state are opened inside the worker process,
+    as SQLite connections and git mirrors can't be shared across processes.
+    """
+    from collect_regression_commits import collect_all_regression
+    from commit_source import get_commit_source
+    from scan_state import ScanState
+
+    source = get_commit_source(source_name)
+    # Only REST scans with a state are incremental (new commits are appended to the shard);
+    # any other scan covers the whole history again, so it starts from an empty shard.
+    state = ScanState() if incremental and source is None else None
+    path = shard_path(repo, shard_dir)
+    if state is None:
+        discard(path)
+    try:
+        return collect_all_regression(repo, max_commits, source, state, output_file=path)
+    finally:
+        if state is not None:
+            state.close()
+
+
+def _init_worker(workers: int):
+    # One request per token may be in flight in each of the other workers
+    os.environ.setdefault("GITHUB_TOKEN_RESERVE", str(workers - 1))
+
+
+def _scan_repo_task(repo: str, *args) -> tuple:
+    """
+    scan_repo in a worker process; also return the metrics of the scan, for the parent to merge.
+    """
+    metrics = get_metrics()
+    metrics.reset()
+    start_cpu = time.process_time()
+    count = scan_repo(repo, *args)
+    return count, metrics.snapshot(time.process_time() - start_cpu)
+
+
+def merge_shards(repos, output_file: str, shard_dir: str = SHARD_DIR) -> int:
+    """
+    Concatenate the shards of `repos` (in that order) into `output_file` and return the row count.
+    Rows repeated by a resumed scan (a page interrupted half-way is scanned again) are only kept once.
+    The output is written to a temporary file first and then moved into place.
+    """
+    tmp_path = output_file + ".tmp"
+    seen = set()
+    rows = 0
+    with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(REGRESSION_FIELDS)
+        for repo in repos:
+            path = shard_path(repo, shard_dir)
+            if not os.path.isfile(path):
+                continue
+            with open(path, "r", newline="", encoding="utf-8") as shard:
+                for row in csv.reader(shard):
+                    if row and tuple(row) not in seen:
+                        seen.add(tuple(row))
+                        writer.writerow(row)
+                        rows += 1
+    os.replace(tmp_path, output_file)
+    # The merged file replaces whatever a ResultWriter checkpointed for it before
+    if os.path.isfile(output_file + ".journal"):
+        os.remove(output_file + ".journal")
+    return rows
+
+
+def scan_repos_parallel(repos, output_file: str, shard_dir: str = SHARD_DIR, max_commits: int = 500,
+                        workers: int = None, source_name: str = None, incremental: bool = True) -> int:
+    """
+    Scan `repos` with up to `workers` processes, then merge the shards into `output_file`.
+    A repo that fails is reported; its shard keeps what was found so far and a rerun continues it.
+    """
+    repos = list(repos)
+    workers = max(1, workers or DEFAULT_WORKERS)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as pool:
+        futures = {
+            pool.submit(_scan_repo_task, repo, shard_dir, max_commits, source_name, incremental): repo
+            for repo in repos
+        }
+        for future in as_completed(futures):
+            repo = futures[future]
+            try:
+                count, snapshot = future.result()
+                # Workers don't export metrics themselves: their requests go into this run's report
+                get_metrics().merge(snapshot)
+                print(f"[DONE] {repo}: {count} regression commit(s)")
+            except Exception as error:
+                failed += 1
+                print(f"[ERROR] {repo}: {error}")
+
+    rows = merge_shards(repos, output_file, shard_dir)
+    print(f"[INFO] Merged {rows} regression commit(s) from {len(repos)} repo(s) into {output_file} ({failed} failed)")
+    return rows
@@ -0,0 +1,242 @@
+"""
+Streaming version of the whole collection flow:
+    projects -> regressions -> chains -> C-file filter -> memory bug types -> lifecycle information
+
+Instead of running six scripts chained through intermediate CSVs, every stage is a generator that
+consumes records (dicts with "repo", "BFC_sha", "BIC_sha", ...) and yields enriched records.
+Stages run in their own threads connected by bounded queues, so a regression found on page 1 of a
+repo is enriched and classified right away while the scan of that repo continues.
+Intermediate CSVs are optional (`materialize_dir`).
+With a ScanState, a repo's scan cursor only moves past a page once every record found up to that
+page has left the pipeline (written or dropped), so records still queued between the stages when
+the run is killed are found again by the next run.
+
+input: filtered_projects.csv
+output: pipeline_output/regression_information.csv (plus one CSV per stage if materialized)
+"""
+
+import csv
+import os
+import queue
+import threading
+from collections import deque
+
+from collect_memory_related_chains import classify_regression_row
+from collect_regression_commits import check_regression_chain, iter_regressions, parse_repo_full_name
+from commit_source import get_commit_source
+from filter_commits import commits_touch_c_files
+from metrics import get_metrics
+from scan_state import ScanState
+
+# Default number of records buffered between two stages
+BUFFER_SIZE = 100
+
+_DONE = object()
+
+
+def buffered(records, maxsize: int = BUFFER_SIZE):
+    """
+    Run the upstream generator in a background thread, handing records over through a bounded queue.
+    The upstream stage blocks once `maxsize` records wait to be consumed.
+    """
+    handoff = queue.Queue(maxsize=maxsize)
+
+    def produce():
+        try:
+            for record in records:
+                handoff.put(record)
+        except BaseException as error:
+            handoff.put(error)
+        finally:
+            handoff.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        record = handoff.get()
+        if record is _DONE:
+            return
+        if isinstance(record, BaseException):
+            raise record
+        yield record
+
+
+def materialize(records, path: str, fieldnames: list):
+    """
+    Pass records through unchanged while appending them to a CSV (flushed per record).
+    """
+    file_exists = os.path.isfile(path) and os.stat(path).st_size > 0
+    with open(path, "a", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction="ignore")
+        if not file_exists:
+            writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            csvfile.flush()
+            yield record
+
+
+class ScanCheckpoints:
+    """
+    Scan cursor updates deferred until the records found before them are out of the pipeline.
+    Records are numbered by the scan stage ("_seq"); since every stage keeps the order of its
+    records, once the record numbered n comes out of the last stage, every record up to n has
+    been written or dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        # (records found when the update was deferred, update)
+        self._pending = deque()
+
+    def tag(self, record: dict) -> dict:
+        with self._lock:
+            self._seq += 1
+            return {**record, "_seq": self._seq}
+
+    def defer(self, save_cursor):
+        with self._lock:
+            self._pending.append((self._seq, save_cursor))
+
+    def _release(self, seq: int):
+        while True:
+            with self._lock:
+                if not self._pending or self._pending[0][0] > seq:
+                    return
+                _, save_cursor = self._pending.popleft()
+            save_cursor()
+
+    def passed(self, records):
+        """
+        Pass the final records through, saving the cursors they cover once the consumer is done
+        with each one, and the remaining ones at the end.
+        """
+        for record in records:
+            yield record
+            self._release(record["_seq"])
+        self._release(float("inf"))
+
+
+# ------------------ STAGES ------------------
+
+def iter_projects(project_path: str):
+    """
+    Yield repo full names from a projects CSV (name, stars, commits).
+    """
+    with open(project_path, "r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)
+        for row in reader:
+            if not row:
+                continue
+            repo = parse_repo_full_name(row[0].strip())
+            if repo:
+                yield repo
+
+
+def search_projects(min_commits: int = 200, max_commits: int = 50000):
+    """
+    Yield repo full names straight from the GitHub search (collect_projects), filtered by commit count.
+    """
+    from collect_projects import get_stored_commit_count, search_c_projects
+
+    for project in search_c_projects():
+        commit_count = get_stored_commit_count(project["name"])
+        if commit_count and min_commits <= commit_count < max_commits:
+            yield project["name"]
+
+
+def scan_regressions(repos, source=None, max_commits: int = 500, state=None, checkpoints: ScanCheckpoints = None):
+    for repo in repos:
+        print(f"\n[INFO] Processing {repo} ...")
+        checkpoint = checkpoints.defer if checkpoints is not None else None
+        for bfc_sha, bic_sha in iter_regressions(repo, max_commits, source, state, checkpoint):
+            record = {"repo": repo, "BFC_sha": bfc_sha, "BIC_sha": bic_sha}
+            yield checkpoints.tag(record) if checkpoints is not None else record
+
+
+def find_chains(records, source=None):
+    for record in records:
+        if check_regression_chain([record["repo"], record["BFC_sha"], record["BIC_sha"]], source):
+            yield record
+
+
+def filter_c_commits(records, source=None):
+    for record in records:
+        if commits_touch_c_files(record["repo"], record["BIC_sha"], record["BFC_sha"], source):
+            yield record
+
+
+def classify_memory_bugs(records, source=None, memory_only: bool = False):
+    """
+    Add "bug_types" to each record; with `memory_only`, drop records without a memory bug type.
+    """
+    for record in records:
+        bug_types = classify_regression_row([record["repo"], record["BFC_sha"], record["BIC_sha"]], source)
+        if bug_types:
+            print(f"  -> Matched memory bug(s): {bug_types}")
+        elif memory_only:
+            continue
+        yield {**record, "bug_types": "; ".join(bug_types)}
+
+
+def collect_information(records, source=None):
+    from analysis.collect_regression_imformation import regression_information_row
+
+    for record in records:
+        yield {**record, **regression_information_row(record, source)}
+
+
+# ------------------ PIPELINE ------------------
+
+STAGE_FIELDS = {
+    "regressions": ["repo", "BFC_sha", "BIC_sha"],
+    "chains": ["repo", "BFC_sha", "BIC_sha"],
+    "filtered": ["repo", "BIC_sha", "BFC_sha"],
+    "memory": ["repo", "BIC_sha", "bug_types", "BFC_sha"],
+}
+INFORMATION_FIELDS = [
+    "repo", "fix_period", "BIC_sha", "BIC_time", "BIC_files_count", "BIC_file_changes",
+    "BFC_sha", "BFC_time", "BFC_files_count", "BFC_file_changes", "LOC", "bug_types",
+]
+
+
+def run_pipeline(repos, source=None, materialize_dir: str = None, buffer_size: int = BUFFER_SIZE,
+                 memory_only: bool = False, state=None):
+    """
+    Build the streaming pipeline over `repos` and yield final records as they come out.
+    `state` (scan_state.ScanState) makes the repo scans incremental. Its cursors are saved once the
+    consumer is done with the records they cover, i.e. asks for the next record (see ScanCheckpoints).
+    """
+    def stage(records, name):
+        # Rows / second of each stage go to the run metrics (metrics.py)
+        records = get_metrics().track(name, records)
+        if materialize_dir:
+            records = materialize(records, os.path.join(materialize_dir, f"{name}.csv"), STAGE_FIELDS[name])
+        return buffered(records, buffer_size)
+
+    if materialize_dir:
+        os.makedirs(materialize_dir, exist_ok=True)
+    checkpoints = ScanCheckpoints() if state is not None else None
+    records = stage(scan_regressions(repos, source, state=state, checkpoints=checkpoints), "regressions")
+    records = stage(find_chains(records, source), "chains")
+    records = stage(filter_c_commits(records, source), "filtered")
+    records = stage(classify_memory_bugs(records, source, memory_only), "memory")
+    records = collect_information(records, source)
+    return checkpoints.passed(records) if checkpoints is not None else records
+
+
+def main(project_path: str, output_path: str, materialize_dir: str = None):
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    records = run_pipeline(
+        iter_projects(project_path),
+        source=get_commit_source(),
+        materialize_dir=materialize_dir,
+        state=ScanState(),
+    )
+    for _ in materialize(records, output_path, INFORMATION_FIELDS):
+        pass
+
+
+if __name__ == "__main__":
+    main("filtered_projects.csv", "pipeline_output/regression_information.csv", materialize_dir="pipeline_output")
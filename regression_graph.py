@@ -0,0 +1,251 @@
+"""
+Directed graph of the collected regressions: one edge BFC -> BIC per (repo, BFC_sha, BIC_sha) pair,
+i.e. "this fix repairs a bug introduced by that commit".
+When a BIC is itself the BFC of another pair, the edges line up into a chain
+(fix -> regression -> fix -> regression ...), of any length. collect_regression_chain only looks
+one hop ahead, through the BIC's message; the graph finds whole chains from the pairs alone,
+without any API call.
+
+Nodes are keyed by full SHA where possible: an abbreviated SHA (BICs are often written "496375f")
+is expanded with the SHA index, or matched against the longer SHAs already in the graph
+(prefix lookup on a sorted list per repo). When the full SHA of a short node shows up later,
+the two nodes are merged, so pairs can be added in any order.
+The pairs are stored in SQLite as they were given and replayed on open; new pairs update the
+graph incrementally.
+
+REGRESSION_GRAPH_PATH -> location of the SQLite file (default: regression_graph.sqlite)
+"""
+
+import bisect
+import csv
+import os
+from collections import Counter
+
+from sha_index import MIN_PREFIX, get_sha_index, prefix_matches
+from sqlite_store import SQLiteStore, shared
+
+REGRESSION_GRAPH_PATH = os.getenv("REGRESSION_GRAPH_PATH", "regression_graph.sqlite")
+
+
+class RegressionGraph(SQLiteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS regression_edges (
+            repo TEXT NOT NULL,
+            bfc  TEXT NOT NULL,
+            bic  TEXT NOT NULL,
+            PRIMARY KEY (repo, bfc, bic)
+        ) WITHOUT ROWID
+        """
+
+    def __init__(self, path: str = REGRESSION_GRAPH_PATH, index=None):
+        super().__init__(path)
+        self.index = index
+        # repo -> sorted list of node SHAs (full or abbreviated)
+        self._nodes = {}
+        # repo -> {node: set of BICs it fixes} / {node: set of BFCs fixing it}
+        self._fixes = {}
+        self._fixed_by = {}
+        # repo -> {node: longest chain below it}, dropped whenever the repo's graph changes
+        self._depth = {}
+        self._pairs = set()
+        with self._lock:
+            for repo, bfc, bic in self._conn.execute("SELECT repo, bfc, bic FROM regression_edges"):
+                self._add_pair(repo, bfc, bic)
+
+    # ------------------ nodes ------------------
+
+    def _canonical(self, repo: str, sha: str) -> str:
+        """
+        Node `sha` stands for: its expansion by the SHA index, else the only longer node it prefixes,
+        else `sha` itself.
+        """
+        sha = sha.strip().lower()
+        if len(sha) < 40 and self.index is not None:
+            sha = self.index.expand(repo, sha) or sha
+        fixes = self._fixes.setdefault(repo, {})
+        if sha in fixes:
+            return sha
+        longer = prefix_matches(self._nodes.setdefault(repo, []), sha, limit=2)
+        return longer[0] if len(longer) == 1 else sha
+
+    def _add_node(self, repo: str, node: str):
+        fixes = self._fixes[repo]
+        if node in fixes:
+            return
+        nodes = self._nodes[repo]
+        bisect.insort(nodes, node)
+        fixes[node] = set()
+        self._fixed_by.setdefault(repo, {})[node] = set()
+        # Shorter nodes that turn out to abbreviate this one (and nothing else) are merged into it
+        for length in range(MIN_PREFIX, len(node)):
+            short = node[:length]
+            if short in fixes and prefix_matches(nodes, short, limit=3) == [short, node]:
+                self._merge(repo, short, node)
+
+    def _merge(self, repo: str, old: str, new: str):
+        fixes, fixed_by = self._fixes[repo], self._fixed_by[repo]
+        for bic in fixes.pop(old):
+            fixed_by[bic].discard(old)
+            if bic != new:
+                fixes[new].add(bic)
+                fixed_by[bic].add(new)
+        for bfc in fixed_by.pop(old):
+            fixes[bfc].discard(old)
+            if bfc != new:
+                fixed_by[new].add(bfc)
+                fixes[bfc].add(new)
+        self._nodes[repo].remove(old)
+
+    def _add_pair(self, repo: str, bfc: str, bic: str) -> bool:
+        if (repo, bfc, bic) in self._pairs:
+            return False
+        self._pairs.add((repo, bfc, bic))
+        self._add_node(repo, self._canonical(repo, bfc))
+        self._add_node(repo, self._canonical(repo, bic))
+        # Adding the BIC may have merged the BFC node (or the other way round): look both up again
+        bfc, bic = self._canonical(repo, bfc), self._canonical(repo, bic)
+        self._depth.pop(repo, None)
+        if bfc == bic:
+            return False
+        self._fixes[repo][bfc].add(bic)
+        self._fixed_by[repo][bic].add(bfc)
+        return True
+
+    # ------------------ updates ------------------
+
+    def add_many(self, pairs) -> int:
+        """
+        Add (repo, bfc, bic) triples, "`bfc` fixes a bug introduced by `bic`", and store them.
+        Return the number of new edges (known pairs, and pairs of the same commit, don't count).
+        """
+        added = 0
+        with self._lock:
+            new = []
+            for repo, bfc, bic in pairs:
+                bfc, bic = (bfc or "").strip(), (bic or "").strip()
+                if not repo or not bfc or not bic or (repo, bfc, bic) in self._pairs:
+                    continue
+                added += self._add_pair(repo, bfc, bic)
+                new.append((repo, bfc, bic))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO regression_edges (repo, bfc, bic) VALUES (?, ?, ?)", new
+            )
+            self._conn.commit()
+        return added
+
+    def add(self, repo: str, bfc: str, bic: str) -> bool:
+        return self.add_many([(repo, bfc, bic)]) == 1
+
+    def update_from_csv(self, path: str) -> int:
+        """
+        Add the pairs of a regression CSV (repo, BFC_sha, BIC_sha with a header).
+        Return the number of new edges.
+        """
+        with open(path, "r", newline="", encoding="utf-8") as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader, None)
+            return self.add_many((row[0].strip(), row[1], row[2]) for row in reader if len(row) >= 3)
+
+    # ------------------ queries ------------------
+
+    def node(self, repo: str, sha: str):
+        """
+        The node `sha` (full or abbreviated) belongs to, or None if it isn't in the graph.
+        """
+        with self._lock:
+            node = self._canonical(repo, sha)
+            return node if node in self._fixes[repo] else None
+
+    def _chain_length(self, repo: str, node: str, on_path: set) -> int:
+        depth = self._depth.setdefault(repo, {})
+        if node in depth:
+            return depth[node]
+        on_path.add(node)
+        # A cycle can only come from bad data; its back edge is ignored
+        length = max((self._chain_length(repo, bic, on_path) + 1
+                      for bic in self._fixes[repo][node] if bic not in on_path), default=0)
+        on_path.discard(node)
+        depth[node] = length
+        return length
+
+    def chain_length(self, repo: str, sha: str) -> int:
+        """
+        Number of edges of the longest chain starting at `sha` (0 if it fixes nothing known).
+        """
+        with self._lock:
+            node = self._canonical(repo, sha)
+            if node not in self._fixes[repo]:
+                return 0
+            return self._chain_length(repo, node, set())
+
+    def longest_chain(self, repo: str, sha: str) -> list:
+        """
+        Nodes of the longest chain starting at `sha`: [fix, its BIC, the BIC that one fixes, ...].
+        """
+        with self._lock:
+            node = self._canonical(repo, sha)
+            if node not in self._fixes[repo]:
+                return []
+            chain = [node]
+            while self._fixes[repo][node]:
+                length = self._chain_length(repo, node, set())
+                if length == 0:
+                    break
+                # Follow a BIC whose own chain is one shorter (smallest SHA first, for stable output)
+                node = min((bic for bic in self._fixes[repo][node]
+                            if bic not in chain and self._chain_length(repo, bic, set()) == length - 1), default=None)
+                if node is None:
+                    break
+                chain.append(node)
+            return chain
+
+    def roots(self, repo: str) -> list:
+        """
+        Fixes nothing else fixes: the newest end of each chain.
+        """
+        with self._lock:
+            fixed_by = self._fixed_by.get(repo, {})
+            return [node for node in self._nodes.get(repo, [])
+                    if self._fixes[repo][node] and not fixed_by[node]]
+
+    def repos(self) -> list:
+        with self._lock:
+            return sorted(self._nodes)
+
+    def chains(self, min_length: int = 2):
+        """
+        Yield (repo, root, chain) for the longest chain of every root with at least `min_length` edges.
+        """
+        for repo in self.repos():
+            for root in self.roots(repo):
+                if self.chain_length(repo, root) >= min_length:
+                    yield repo, root, self.longest_chain(repo, root)
+
+    def write_chains(self, output_file: str, min_length: int = 2) -> Counter:
+        """
+        Write one row per chain (repo, root, length, chain) and return the count of chains per length.
+        """
+        lengths = Counter()
+        with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["repo", "root_sha", "length", "chain"])
+            for repo, root, chain in self.chains(min_length):
+                lengths[len(chain) - 1] += 1
+                writer.writerow([repo, root, len(chain) - 1, " -> ".join(chain)])
+        return lengths
+
+
+@shared
+def get_regression_graph() -> RegressionGraph:
+    """
+    Open the shared regression graph lazily (short SHAs are expanded with the shared SHA index).
+    """
+    return RegressionGraph(index=get_sha_index())
+
+
+if __name__ == "__main__":
+    graph = get_regression_graph()
+    print(f"[INFO] {graph.update_from_csv('regression_commits.csv')} new regression edge(s)")
+    lengths = graph.write_chains("regression_chains_graph.csv")
+    for length, count in sorted(lengths.items()):
+        print(f"[INFO] {count} chain(s) of length {length}")
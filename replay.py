@@ -0,0 +1,236 @@
+"""
+Record / replay of GitHub API responses, to run the scripts without a network or a real token.
+
+Recording: with GITHUB_RECORD_PATH set, every live response received by github_api.py is appended to
+that cassette (one JSON object per line: method, path, query, request body, status, headers, body).
+Record against an empty response cache (fresh GITHUB_CACHE_PATH): a 304 has no body to replay, so
+304s are not recorded.
+
+Replay: ReplayServer serves a cassette from a local HTTP server; point GITHUB_API_URL at it.
+- Responses are matched on method + path + query (+ body for POSTs). When a request was recorded
+  several times, the answers are served in recorded order and the last one repeats, so sequences
+  like 202 -> 200 (stats being computed) or 403 -> 200 (rate limit) play back as they happened.
+- X-RateLimit-Reset is recorded relative to the recording time and replayed relative to now,
+  so a recorded 403 throttles the client for the same number of seconds.
+- Conditional requests get a 304 when the ETag matches, like the real API.
+- Requests missing from the cassette get a 404 and are counted in `unmatched`.
+
+GITHUB_RECORD_PATH -> cassette to append live responses to (default: unset, no recording)
+"""
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+RECORD_PATH = os.getenv("GITHUB_RECORD_PATH", "")
+
+# Response headers the scripts look at; the others are not recorded
+RECORDED_HEADERS = [
+    "Content-Type", "ETag", "Last-Modified", "Link", "Retry-After",
+    "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Resource",
+]
+_BASE_PLACEHOLDER = "{base}"
+
+
+def request_key(method: str, path: str, query: str = "", body: bytes = b"") -> str:
+    """
+    Key of a request in a cassette: method, path, sorted query and a hash of the body (if any).
+    """
+    query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    key = f"{method.upper()} {path.rstrip('/') or '/'}" + (f"?{query}" if query else "")
+    if body:
+        key += " #" + hashlib.sha256(body).hexdigest()[:16]
+    return key
+
+
+def make_entry(method: str, path: str, status: int, body="", query: str = "", request_body: bytes = b"",
+               headers: dict = None, reset_in: float = None) -> dict:
+    """
+    A cassette entry; `body` is a string or anything JSON-serializable.
+    `reset_in` is the X-RateLimit-Reset to replay, in seconds from the time the request is served.
+    """
+    if not isinstance(body, str):
+        body = json.dumps(body)
+        headers = {"Content-Type": "application/json; charset=utf-8", **(headers or {})}
+    return {
+        "key": request_key(method, path, query, request_body),
+        "status": status,
+        "headers": headers or {},
+        "reset_in": reset_in,
+        "body": body,
+    }
+
+
+def load_cassette(path: str) -> dict:
+    """
+    Request key -> list of entries, in recorded order.
+    """
+    cassette = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                cassette.setdefault(entry["key"], []).append(entry)
+    return cassette
+
+
+def write_cassette(path: str, entries):
+    with open(path, "w", encoding="utf-8") as file:
+        for entry in entries:
+            file.write(json.dumps(entry) + "\n")
+
+
+class Recorder:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, response):
+        if response.status_code == 304:
+            return
+        request = response.request
+        url = urlsplit(request.url)
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        headers = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+        if "Link" in headers:
+            headers["Link"] = headers["Link"].replace(f"{url.scheme}://{url.netloc}", _BASE_PLACEHOLDER)
+        reset = response.headers.get("X-RateLimit-Reset")
+        entry = make_entry(request.method, url.path, response.status_code, response.text, url.query, body,
+                           headers, int(reset) - time.time() if reset and reset.isdigit() else None)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+
+
+_recorder = None
+
+
+def get_recorder():
+    """
+    The recorder of this process, or None when GITHUB_RECORD_PATH is not set.
+    """
+    global _recorder
+    if _recorder is None and RECORD_PATH:
+        _recorder = Recorder(RECORD_PATH)
+    return _recorder
+
+
+class ReplayServer:
+    def __init__(self, cassette, host: str = "127.0.0.1", port: int = 0):
+        """
+        `cassette` is a path or the dict returned by load_cassette.
+        """
+        # http.server is only needed to replay; github_api imports this module for the Recorder
+        import http.server
+
+        self.cassette = load_cassette(cassette) if isinstance(cassette, str) else cassette
+        self._lock = threading.Lock()
+        self._served = Counter()
+        self.statuses = Counter()
+        self.unmatched = Counter()
+        self._server = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_port}"
+
+    def reset_counts(self):
+        with self._lock:
+            self.statuses.clear()
+            self.unmatched.clear()
+
+    def rewind(self):
+        """
+        Serve every key from its first recorded answer again, e.g. before the next benchmark stage.
+        """
+        with self._lock:
+            self._served.clear()
+
+    def _next(self, key: str):
+        with self._lock:
+            entries = self.cassette.get(key)
+            if not entries:
+                self.unmatched[key] += 1
+                return None
+            index = min(self._served[key], len(entries) - 1)
+            self._served[key] += 1
+            return entries[index]
+
+    def _handler(self):
+        import http.server
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body are written separately: don't let Nagle hold the body back
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, True)
+
+            def _serve(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                key = request_key(self.command, url.path, url.query, self.rfile.read(length) if length else b"")
+                entry = server._next(key)
+                if entry is None:
+                    status, headers, body = 404, {"Content-Type": "application/json"}, '{"message": "Not Found"}'
+                else:
+                    status, headers, body = entry["status"], dict(entry["headers"]), entry["body"]
+                    if entry.get("reset_in") is not None:
+                        headers["X-RateLimit-Reset"] = str(int(time.time() + entry["reset_in"]))
+                    if "Link" in headers:
+                        headers["Link"] = headers["Link"].replace(_BASE_PLACEHOLDER, server.url)
+                    etag = headers.get("ETag")
+                    if status == 200 and etag and self.headers.get("If-None-Match") == etag:
+                        status, body = 304, ""
+                payload = body.encode("utf-8")
+                with server._lock:
+                    server.statuses[status] += 1
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> str:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python replay.py cassette.jsonl [port]: serve a cassette until interrupted
+    with ReplayServer(sys.argv[1], port=int(sys.argv[2]) if len(sys.argv) > 2 else 0) as replay_server:
+        print(f"[INFO] Replaying {sys.argv[1]} on {replay_server.url} (set GITHUB_API_URL to it)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
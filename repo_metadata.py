@@ -0,0 +1,150 @@
+"""
+Repo-level metadata store shared by collect_projects and the analysis stage.
+Keyed by repo full name, it keeps stars, commit count, default branch and language bytes together with
+the time each of them was fetched, so repo-level facts are fetched once per repo per refresh period
+instead of once per regression row. Only the fields a caller asks for are refreshed, and concurrent
+callers needing the same stale data wait for a single fetch. Fields GitHub has nothing for (404 / 403)
+are stored as NULL with their fetch time, so they are not asked for again before the TTL either.
+
+REPO_METADATA_PATH -> location of the SQLite file (default: repo_metadata.sqlite)
+REPO_METADATA_TTL  -> seconds before an entry is refreshed (default: 7 days)
+"""
+
+import json
+import os
+import threading
+import time
+
+from github_api import GITHUB_API_URL, get_json
+from sqlite_store import SQLiteStore, shared
+
+REPO_METADATA_PATH = os.getenv("REPO_METADATA_PATH", "repo_metadata.sqlite")
+REPO_METADATA_TTL = int(os.getenv("REPO_METADATA_TTL", 7 * 24 * 3600))
+
+_FIELDS = ["stars", "commits", "default_branch", "languages",
+           "stars_fetched_at", "commits_fetched_at", "default_branch_fetched_at", "languages_fetched_at"]
+# Refreshable fields, by the endpoint they come from
+_ENDPOINT_FIELDS = {
+    "repo": ("stars", "default_branch"),
+    "languages": ("languages",),
+}
+
+
+class RepoMetadataStore(SQLiteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS repos (
+            full_name                 TEXT PRIMARY KEY,
+            stars                     INTEGER,
+            commits                   INTEGER,
+            default_branch            TEXT,
+            languages                 TEXT,
+            stars_fetched_at          REAL,
+            commits_fetched_at        REAL,
+            default_branch_fetched_at REAL,
+            languages_fetched_at      REAL
+        )
+        """
+
+    def __init__(self, path: str = REPO_METADATA_PATH):
+        super().__init__(path)
+
+    def get(self, full_name: str):
+        """
+        Return the stored metadata of a repo as a dict (languages decoded), or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM repos WHERE full_name = ?", (full_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        metadata = dict(zip(_FIELDS, row))
+        metadata["languages"] = json.loads(metadata["languages"]) if metadata["languages"] else None
+        return metadata
+
+    def update(self, full_name: str, **fields):
+        """
+        Store the given fields of a repo (stars, commits, default_branch, languages), keeping the ones not passed.
+        """
+        metadata = self.get(full_name) or {field: None for field in _FIELDS}
+        now = time.time()
+        for field, value in fields.items():
+            metadata[field] = value
+            metadata[f"{field}_fetched_at"] = now
+        if metadata["languages"] is not None:
+            metadata["languages"] = json.dumps(metadata["languages"])
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO repos (full_name, {', '.join(_FIELDS)}) VALUES (?{', ?' * len(_FIELDS)})",
+                (full_name, *(metadata[field] for field in _FIELDS)),
+            )
+            self._conn.commit()
+
+    def is_fresh(self, metadata, field: str, ttl: int = REPO_METADATA_TTL) -> bool:
+        """
+        True if `field` of a stored repo was fetched less than `ttl` seconds ago.
+        """
+        if metadata is None or metadata[f"{field}_fetched_at"] is None:
+            return False
+        return time.time() - metadata[f"{field}_fetched_at"] <= ttl
+
+
+@shared
+def get_store() -> RepoMetadataStore:
+    """
+    Open the shared metadata store lazily.
+    """
+    return RepoMetadataStore()
+
+
+def _fetch(full_name: str, endpoint: str) -> dict:
+    """
+    The fields of `endpoint`, all None when GitHub has nothing for the repo.
+    """
+    if endpoint == "repo":
+        repo = get_json(f"{GITHUB_API_URL}/repos/{full_name}", ttl=0) or {}
+        return {"stars": repo.get("stargazers_count"), "default_branch": repo.get("default_branch")}
+    return {"languages": get_json(f"{GITHUB_API_URL}/repos/{full_name}/languages", ttl=0)}
+
+
+# (store path, repo, endpoint) being fetched by some thread
+_refreshing = set()
+_refreshing_cond = threading.Condition()
+
+
+def _refresh(store: RepoMetadataStore, full_name: str, endpoint: str, ttl: int):
+    """
+    Fetch the fields of `endpoint` if they are stale, and store them (failed fetches as NULL).
+    A caller finding the same fetch in flight waits for it instead of sending its own.
+    """
+    key = (store.path, full_name, endpoint)
+    with _refreshing_cond:
+        if key in _refreshing:
+            while key in _refreshing:
+                _refreshing_cond.wait()
+            return
+        metadata = store.get(full_name)
+        if all(store.is_fresh(metadata, field, ttl) for field in _ENDPOINT_FIELDS[endpoint]):
+            return
+        _refreshing.add(key)
+    try:
+        store.update(full_name, **_fetch(full_name, endpoint))
+    finally:
+        with _refreshing_cond:
+            _refreshing.discard(key)
+            _refreshing_cond.notify_all()
+
+
+def get_repo_metadata(full_name: str, ttl: int = REPO_METADATA_TTL, store: RepoMetadataStore = None,
+                      fields=("stars", "default_branch", "languages")) -> dict:
+    """
+    Return stars, commits, default_branch and languages of a repo. The requested `fields` are
+    refreshed from GitHub (/repos/{repo} for stars / default_branch, /repos/{repo}/languages) when
+    they are older than `ttl`; the others are returned as stored.
+    The commit count is only filled in by collect_projects, as it is expensive to compute.
+    """
+    store = store or get_store()
+    for endpoint, endpoint_fields in _ENDPOINT_FIELDS.items():
+        if any(field in fields for field in endpoint_fields):
+            _refresh(store, full_name, endpoint, ttl)
+    return store.get(full_name) or {field: None for field in _FIELDS}
@@ -0,0 +1,124 @@
+"""
+On-disk cache for GitHub REST responses, shared by all collection scripts.
+Responses are stored in SQLite keyed by URL + query params, together with the time they were fetched
+and their headers (incl. ETag / Last-Modified), so that reruns of a stage read commits from disk
+instead of spending the hourly rate limit again, and stale entries can be revalidated with a
+conditional request.
+
+GITHUB_CACHE_PATH -> location of the SQLite file (default: .github_cache.sqlite)
+GITHUB_CACHE_TTL  -> seconds a commit entry is served without asking GitHub (default: 30 days;
+                     0 revalidates every time)
+"""
+
+import json
+import os
+import time
+from urllib.parse import urlencode
+
+from sqlite_store import SQLiteStore
+
+CACHE_PATH = os.getenv("GITHUB_CACHE_PATH", ".github_cache.sqlite")
+# Commits are immutable, so a long TTL is safe for them.
+DEFAULT_TTL = int(os.getenv("GITHUB_CACHE_TTL", 30 * 24 * 3600))
+
+
+def make_cache_key(url: str, params: dict = None) -> str:
+    """
+    Build the cache key from the URL and the (sorted) query params.
+    Headers are deliberately not part of the key, so the token in use doesn't matter.
+    """
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted((str(k), str(v)) for k, v in params.items()))}"
+
+
+class CachedResponse:
+    """
+    The subset of `requests.Response` the scripts rely on, rebuilt from a cache entry.
+    """
+    from_cache = True
+
+    def __init__(self, url: str, status_code: int, headers: dict, body: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = body
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code} error for cached url: {self.url}")
+
+
+def conditional_headers(cached: CachedResponse) -> dict:
+    """
+    Build If-None-Match / If-Modified-Since headers from a stored response.
+    GitHub does not count 304 answers against the rate limit.
+    """
+    headers = {}
+    # Header names are stored as received; look them up case-insensitively
+    stored = {name.lower(): value for name, value in cached.headers.items()}
+    if stored.get("etag"):
+        headers["If-None-Match"] = stored["etag"]
+    if stored.get("last-modified"):
+        headers["If-Modified-Since"] = stored["last-modified"]
+    return headers
+
+
+class ResponseCache(SQLiteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key        TEXT PRIMARY KEY,
+            status     INTEGER NOT NULL,
+            headers    TEXT NOT NULL,
+            body       BLOB NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+        """
+
+    def __init__(self, path: str = CACHE_PATH):
+        super().__init__(path)
+
+    def lookup(self, key: str):
+        """
+        Return (CachedResponse, age in seconds) for `key`, or None if it was never stored.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, fetched_at = row
+        return CachedResponse(key, status, json.loads(headers), body), time.time() - fetched_at
+
+    def get(self, key: str, ttl: int = DEFAULT_TTL):
+        """
+        Return a CachedResponse if `key` was stored less than `ttl` seconds ago, else None.
+        """
+        entry = self.lookup(key)
+        if entry is None or entry[1] > ttl:
+            return None
+        return entry[0]
+
+    def touch(self, key: str):
+        """
+        Mark an entry as fresh again (GitHub answered 304 Not Modified).
+        """
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def put(self, key: str, status: int, headers: dict, body: bytes):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, status, headers, body, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key, status, json.dumps(dict(headers)), body, time.time()),
+            )
+            self._conn.commit()
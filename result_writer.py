@@ -0,0 +1,128 @@
+"""
+Crash-safe CSV writer for the collection scripts' outputs.
+Rows are buffered and written in batches (every `flush_rows` rows or `flush_seconds` seconds).
+Each batch is fsync'ed, then checkpointed in a journal next to the CSV (<output>.journal) with
+- the byte size of the CSV after the batch,
+- the input keys whose processing is complete (whether or not they produced a row).
+On reopen, anything written after the last checkpoint (e.g. a half-written line from a crash) is
+truncated away, and `done(key)` tells the caller which inputs to skip, so a killed job resumes
+without reprocessing or duplicating rows.
+An output that has no journal yet (written before this existed) is kept as it is.
+"""
+
+import csv
+import json
+import os
+import time
+
+
+def _hashable(key):
+    if isinstance(key, list):
+        return tuple(_hashable(part) for part in key)
+    return key
+
+
+def discard(path: str):
+    """
+    Remove an output and its journal, to rebuild it from scratch.
+    """
+    for name in (path, path + ".journal"):
+        if os.path.isfile(name):
+            os.remove(name)
+
+
+class ResultWriter:
+    def __init__(self, path: str, header: list = None, flush_rows: int = 100, flush_seconds: float = 5.0):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._committed = set()
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+        offset = self._read_journal()
+        self._file = open(path, "a+b")
+        size = self._file.seek(0, os.SEEK_END)
+        if offset is not None and size > offset:
+            print(f"[INFO] {path}: dropping {size - offset} byte(s) written after the last checkpoint")
+            self._file.truncate(offset)
+            self._file.seek(offset)
+            size = offset
+        if size == 0 and header:
+            self._write_rows([header])
+            self._checkpoint([])
+
+    def _read_journal(self):
+        """
+        Load the committed keys and return the last checkpointed size (None without a journal).
+        """
+        if not os.path.isfile(self.journal_path):
+            return None
+        offset = 0
+        with open(self.journal_path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    checkpoint = json.loads(line)
+                except ValueError:
+                    # A checkpoint cut short by a crash never completed
+                    break
+                offset = checkpoint["offset"]
+                self._committed.update(_hashable(key) for key in checkpoint["keys"])
+        return offset
+
+    def _write_rows(self, rows):
+        lines = []
+        writer = csv.writer(_LineSink(lines))
+        for row in rows:
+            writer.writerow(row)
+        self._file.write("".join(lines).encode("utf-8"))
+
+    def _checkpoint(self, keys):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        with open(self.journal_path, "a", encoding="utf-8") as journal:
+            journal.write(json.dumps({"offset": self._file.tell(), "keys": keys}) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def done(self, key) -> bool:
+        """
+        True if the input `key` was committed by this or a previous run.
+        """
+        return _hashable(key) in self._committed
+
+    def write(self, key, row=None):
+        """
+        Mark the input `key` as processed, with the output `row` it produced (None if it produced none).
+        """
+        self._pending.append((_hashable(key), row))
+        if len(self._pending) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._write_rows([row for _, row in self._pending if row is not None])
+            keys = [key for key, _ in self._pending]
+            self._checkpoint(keys)
+            self._committed.update(keys)
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _LineSink:
+    """
+    File-like target for csv.writer that collects the formatted lines.
+    """
+    def __init__(self, lines: list):
+        self.write = lines.append
@@ -0,0 +1,77 @@
+"""
+Persistent per-repo cursors for scanning a repo's commit history (collect_all_regression).
+For every repo we remember
+- the newest commit (sha + committer date) covered by the last completed scan,
+- the scan in progress, if any: the head it started from, the `since` it uses and the last page finished.
+Reruns then only page through commits newer than the last completed scan (`since` + stop at the old head),
+and an interrupted scan continues after the last finished page.
+
+SCAN_STATE_PATH -> location of the SQLite file (default: scan_state.sqlite)
+"""
+
+import os
+import time
+
+from sqlite_store import SQLiteStore
+
+SCAN_STATE_PATH = os.getenv("SCAN_STATE_PATH", "scan_state.sqlite")
+
+_FIELDS = ["newest_sha", "newest_date", "pending_sha", "pending_date", "since", "last_page", "updated_at"]
+
+
+class ScanState(SQLiteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scan_state (
+            repo         TEXT PRIMARY KEY,
+            newest_sha   TEXT,
+            newest_date  TEXT,
+            pending_sha  TEXT,
+            pending_date TEXT,
+            since        TEXT,
+            last_page    INTEGER NOT NULL DEFAULT 0,
+            updated_at   REAL
+        )
+        """
+
+    def __init__(self, path: str = SCAN_STATE_PATH):
+        super().__init__(path)
+
+    def get(self, repo: str) -> dict:
+        """
+        Return the cursor of `repo` (all fields None / 0 if it was never scanned).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM scan_state WHERE repo = ?", (repo,)
+            ).fetchone()
+        if row is None:
+            return {field: None for field in _FIELDS} | {"last_page": 0}
+        return dict(zip(_FIELDS, row))
+
+    def _save(self, repo: str, **fields):
+        state = self.get(repo)
+        state.update(fields, updated_at=time.time())
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO scan_state (repo, {', '.join(_FIELDS)}) VALUES (?{', ?' * len(_FIELDS)})",
+                (repo, *(state[field] for field in _FIELDS)),
+            )
+            self._conn.commit()
+
+    def start(self, repo: str, head_sha: str, head_date: str, since: str):
+        """
+        Remember the head a new scan starts from.
+        """
+        self._save(repo, pending_sha=head_sha, pending_date=head_date, since=since, last_page=0)
+
+    def page_done(self, repo: str, page: int):
+        self._save(repo, last_page=page)
+
+    def finish(self, repo: str):
+        """
+        The scan reached the end (or the previous head): its starting head becomes the new boundary.
+        """
+        state = self.get(repo)
+        if state["pending_sha"]:
+            self._save(repo, newest_sha=state["pending_sha"], newest_date=state["pending_date"],
+                       pending_sha=None, pending_date=None, since=None, last_page=0)
@@ -0,0 +1,143 @@
+"""
+Per-repo index of full commit SHAs, used to expand the abbreviated hashes found in commit messages
+and datasets (e.g. "496375f") without an API call.
+SHAs are kept sorted per repo, so all SHAs starting with a prefix sit next to each other and are
+found with a binary search. The index is filled from the commit listings fetched by
+collect_regression_commits or from a local clone (`git rev-list --all`), and stored in SQLite so
+later stages can use it.
+
+SHA_INDEX_PATH -> location of the SQLite file (default: sha_index.sqlite)
+"""
+
+import bisect
+import os
+import re
+import subprocess
+
+from sqlite_store import SQLiteStore, shared
+
+SHA_INDEX_PATH = os.getenv("SHA_INDEX_PATH", "sha_index.sqlite")
+
+_FULL_SHA = re.compile(r"[0-9a-f]{40}")
+# git never abbreviates below 4 hex digits
+MIN_PREFIX = 4
+
+
+def prefix_matches(shas: list, prefix: str, limit: int = None) -> list:
+    """
+    Entries of the sorted list `shas` starting with `prefix` (at most `limit` of them).
+    """
+    matches = []
+    for index in range(bisect.bisect_left(shas, prefix), len(shas)):
+        if not shas[index].startswith(prefix) or (limit and len(matches) >= limit):
+            break
+        matches.append(shas[index])
+    return matches
+
+
+def canonical_map(shas) -> dict:
+    """
+    Map every SHA of `shas` (one repo, short and full forms mixed) to its longest form in the same set,
+    when that form is unique; e.g. {"496375f", "496375fa…"} -> both map to "496375fa…".
+    Ambiguous prefixes map to themselves. Used when no index is available for a repo.
+    """
+    ordered = sorted({sha.strip().lower() for sha in shas if sha and sha.strip()})
+    mapping = {}
+    for sha in ordered:
+        longer = prefix_matches(ordered, sha)
+        # Keep only the maximal forms: those that aren't a prefix of another one
+        maximal = [candidate for candidate in longer
+                   if not any(other != candidate and other.startswith(candidate) for other in longer)]
+        mapping[sha] = maximal[0] if len(maximal) == 1 else sha
+    return mapping
+
+
+class ShaIndex(SQLiteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS commit_shas (
+            repo TEXT NOT NULL,
+            sha  TEXT NOT NULL,
+            PRIMARY KEY (repo, sha)
+        ) WITHOUT ROWID
+        """
+
+    def __init__(self, path: str = SHA_INDEX_PATH):
+        super().__init__(path)
+        # repo -> sorted list of full SHAs, loaded on first use
+        self._sorted = {}
+
+    def _shas(self, repo: str) -> list:
+        with self._lock:
+            if repo not in self._sorted:
+                rows = self._conn.execute(
+                    "SELECT sha FROM commit_shas WHERE repo = ? ORDER BY sha", (repo,)
+                ).fetchall()
+                self._sorted[repo] = [sha for (sha,) in rows]
+            return self._sorted[repo]
+
+    def add(self, repo: str, shas):
+        """
+        Add full SHAs of `repo` to the index (anything that isn't a full SHA is ignored).
+        """
+        new = {sha.lower() for sha in shas if sha and _FULL_SHA.fullmatch(sha.lower())}
+        if not new:
+            return
+        self._shas(repo)
+        with self._lock:
+            known = self._sorted[repo]
+            new.difference_update(known)
+            if not new:
+                return
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO commit_shas (repo, sha) VALUES (?, ?)", [(repo, sha) for sha in new]
+            )
+            self._conn.commit()
+            self._sorted[repo] = sorted(known + list(new))
+
+    def build_from_commits(self, repo: str, commits):
+        """
+        Index a commit listing: REST commit objects ({"sha": ...}) or plain SHAs.
+        """
+        self.add(repo, (commit["sha"] if isinstance(commit, dict) else commit for commit in commits))
+
+    def build_from_git(self, repo: str, git_dir: str) -> bool:
+        """
+        Index every commit reachable in a local clone or mirror of `repo`.
+        """
+        result = subprocess.run(["git", "--git-dir", git_dir, "rev-list", "--all"],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"[SKIP] git rev-list failed for {repo}: {result.stderr.strip()}")
+            return False
+        self.add(repo, result.stdout.split())
+        return True
+
+    def has_repo(self, repo: str) -> bool:
+        return bool(self._shas(repo))
+
+    def matches(self, repo: str, prefix: str, limit: int = None) -> list:
+        return prefix_matches(self._shas(repo), prefix.strip().lower(), limit)
+
+    def expand(self, repo: str, ref: str):
+        """
+        Return the full SHA `ref` abbreviates in `repo`, or None if it is unknown, ambiguous or too short.
+        """
+        ref = (ref or "").strip().lower()
+        if len(ref) < MIN_PREFIX:
+            return None
+        candidates = self.matches(repo, ref, limit=2)
+        return candidates[0] if len(candidates) == 1 else None
+
+    def canonical(self, repo: str, ref: str) -> str:
+        """
+        The full SHA when `ref` can be expanded, else `ref` itself (normalized).
+        """
+        return self.expand(repo, ref) or (ref or "").strip().lower()
+
+
+@shared
+def get_sha_index() -> ShaIndex:
+    """
+    Open the shared SHA index lazily.
+    """
+    return ShaIndex()
@@ -0,0 +1,64 @@
+"""
+SQLite plumbing shared by the on-disk stores (response cache, SHA index, scan state, commit facts,
+repo metadata, regression graph, analysis aggregates).
+Parallel scans (parallel_scan.py) open the same files from several processes at once, so every
+connection uses WAL (readers don't block the writer) and waits for another process's write lock
+instead of failing with "database is locked".
+
+SQLITE_BUSY_TIMEOUT -> seconds to wait for another process's write lock (default: 60)
+"""
+
+import functools
+import os
+import sqlite3
+import threading
+
+BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 60))
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Open `path` for use from any thread (callers serialize access with their own lock).
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class SQLiteStore:
+    """
+    Base of the stores: the scripts call them from worker threads, so each store has one
+    connection (`_conn`) shared behind `_lock`. The tables of `SCHEMA` are created on open.
+    """
+    SCHEMA = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def shared(open_store):
+    """
+    Decorator for the `get_x()` accessor of a module-wide store: `open_store()` only runs on the
+    first call, so importing a module opens nothing, and later calls return the same store.
+    Assigning `get_x.store` replaces it (e.g. with a temporary one in tests).
+    """
+    lock = threading.Lock()
+
+    @functools.wraps(open_store)
+    def get():
+        if get.store is None:
+            with lock:
+                if get.store is None:
+                    get.store = open_store()
+        return get.store
+
+    get.store = None
+    return get
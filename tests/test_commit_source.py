@@ -0,0 +1,128 @@
+"""
+GitMirrorCommitSource against a locally created repository: history order, messages, dates,
+abbreviated SHAs, changed files of renames, merges and paths git would quote.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sha_index  # noqa: E402
+from commit_source import GitMirrorCommitSource, _parse_show_output  # noqa: E402
+
+
+def git(cwd: str, *args, date: str = None) -> str:
+    env = {**os.environ, "GIT_AUTHOR_NAME": "a", "GIT_AUTHOR_EMAIL": "a@example.com",
+           "GIT_COMMITTER_NAME": "a", "GIT_COMMITTER_EMAIL": "a@example.com"}
+    if date:
+        env.update(GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+    result = subprocess.run(["git", *args], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def write(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+class GitMirrorCommitSourceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp(prefix="test_commit_source_")
+        # Mirrors register their SHAs in the SHA index: keep it out of the working directory
+        cls._index = sha_index.get_sha_index.store
+        sha_index.get_sha_index.store = sha_index.ShaIndex(os.path.join(cls.tmp, "sha_index.sqlite"))
+
+        work = os.path.join(cls.tmp, "work")
+        os.makedirs(work)
+        git(work, "init", "-q", "-b", "main")
+        write(os.path.join(work, "src", "parser.c"), "int a;\nint b;\n")
+        write(os.path.join(work, "README"), "readme\n")
+        git(work, "add", "-A")
+        git(work, "commit", "-q", "-m", "Initial commit\n\nWith a body", date="2021-05-01T10:00:00+02:00")
+        cls.initial = git(work, "rev-parse", "HEAD")
+
+        # Rename with a change, plus files whose names git quotes in plain numstat output
+        git(work, "mv", "src/parser.c", "src/lexer.c")
+        write(os.path.join(work, "src", "lexer.c"), "int a;\nint b;\nint c;\n")
+        write(os.path.join(work, "tab\tname.c"), "x\n")
+        write(os.path.join(work, "quo\"te.h"), "y\n")
+        write(os.path.join(work, "ünïcode.c"), "z\n")
+        git(work, "add", "-A")
+        git(work, "commit", "-q", "-m", "Rename parser", date="2021-05-02T10:00:00Z")
+        cls.rename = git(work, "rev-parse", "HEAD")
+
+        git(work, "checkout", "-q", "-b", "feature", cls.initial)
+        write(os.path.join(work, "docs", "guide.md"), "guide\n")
+        git(work, "add", "-A")
+        git(work, "commit", "-q", "-m", "Add guide", date="2021-05-03T10:00:00Z")
+        git(work, "checkout", "-q", "main")
+        git(work, "merge", "-q", "--no-ff", "-m", "Merge feature", "feature", date="2021-05-04T10:00:00Z")
+        cls.merge = git(work, "rev-parse", "HEAD")
+
+        cls.source = GitMirrorCommitSource(mirror_dir=os.path.join(cls.tmp, "mirrors"),
+                                           url_template=os.path.join(cls.tmp, "{repo}"), blob_filter="")
+        cls.repo = "work"
+
+    @classmethod
+    def tearDownClass(cls):
+        sha_index.get_sha_index.store.close()
+        sha_index.get_sha_index.store = cls._index
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_iter_commits_newest_first(self):
+        commits = list(self.source.iter_commits(self.repo))
+        self.assertEqual(len(commits), 4)
+        self.assertEqual(commits[0], (self.merge, "Merge feature"))
+        self.assertIn((self.initial, "Initial commit\n\nWith a body"), commits)
+
+    def test_message_and_date_in_utc(self):
+        self.assertEqual(self.source.get_message(self.repo, self.initial), "Initial commit\n\nWith a body")
+        self.assertEqual(self.source.get_author_date(self.repo, self.initial), "2021-05-01T08:00:00Z")
+
+    def test_resolves_abbreviated_shas(self):
+        self.assertEqual(self.source.resolve_sha(self.repo, self.rename[:7]), self.rename)
+        self.assertEqual(self.source.resolve_sha(self.repo, "0000000"), "")
+        self.assertEqual(self.source.get_files(self.repo, "0000000"), [])
+
+    def test_rename_and_quoted_paths(self):
+        files = {file["filename"]: file for file in self.source.get_files(self.repo, self.rename)}
+        self.assertEqual(set(files), {"src/lexer.c", "tab\tname.c", "quo\"te.h", "ünïcode.c"})
+        self.assertEqual(files["src/lexer.c"]["additions"], 1)
+        self.assertEqual(files["src/lexer.c"]["changes"], 1)
+        self.assertEqual(self.source.get_stats(self.repo, self.rename),
+                         {"files_count": 4, "additions": 4, "deletions": 0})
+
+    def test_merge_is_diffed_against_first_parent(self):
+        files = self.source.get_files(self.repo, self.merge)
+        self.assertEqual([file["filename"] for file in files], ["docs/guide.md"])
+
+    def test_prefetch_then_lookups(self):
+        source = GitMirrorCommitSource(mirror_dir=self.source.mirror_dir, url_template=self.source.url_template,
+                                       blob_filter="", update=False)
+        source.prefetch([(self.repo, self.initial[:8]), (self.repo, self.merge)])
+        self.assertIn((self.repo, self.initial), source._details)
+        self.assertIn((self.repo, self.merge), source._details)
+
+
+class ParseShowOutputTest(unittest.TestCase):
+    def test_binary_files_and_renames(self):
+        output = ("\x1e" + "a" * 40 + "\x002021-01-01T00:00:00+00:00\x00msg\n\x00\x00\n"
+                  "-\t-\timg.png\x003\t1\t\x00old dir/a.c\x00new dir/a.c\x00")
+        commit = _parse_show_output(output)["a" * 40]
+        self.assertEqual(commit["message"], "msg")
+        self.assertEqual(commit["files"], [
+            {"filename": "img.png", "additions": 0, "deletions": 0, "changes": 0},
+            {"filename": "new dir/a.c", "additions": 3, "deletions": 1, "changes": 4},
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Deduplication of (repo, SHA, SHA) rows where a commit is written both short and in full, with a SHA
+index that knows the whole repo, part of it, or nothing.
+"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from entry_deduplicate import deduplicate_commits_csv, repo_canonicalizer  # noqa: E402
+from sha_index import ShaIndex  # noqa: E402
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+INDEXED = "496375fc36134c72461e6fb97f314be3daa7fb1a"
+# Part of the repo's history the index hasn't seen (e.g. older than a `since` scan)
+UNINDEXED = "0b645d6e26b4e7d1aa1cbf1a5e7eb2c5b2e66a1d"
+# Indexed too, sharing the 7-digit prefix of INDEXED
+SIBLING = "496375f000000000000000000000000000000000"
+OTHER = "abc1234000000000000000000000000000000000"
+
+
+class DeduplicateCommitsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="test_dedup_")
+        self.index = ShaIndex(os.path.join(self.tmp, "sha_index.sqlite"))
+        self.index.add("redis/redis", [INDEXED, SIBLING])
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_partially_indexed_repo(self):
+        shas = ["496375fc", INDEXED, "0b645d6", UNINDEXED.upper()]
+        canonical = repo_canonicalizer("redis/redis", shas, self.index)
+        self.assertEqual(canonical("496375fc"), INDEXED)
+        self.assertEqual(canonical(INDEXED), INDEXED)
+        # Unknown to the index, merged with its full form found in the same file
+        self.assertEqual(canonical("0b645d6"), UNINDEXED)
+        self.assertEqual(canonical(UNINDEXED.upper()), UNINDEXED)
+
+    def test_ambiguous_prefix_is_kept(self):
+        # The file only has one of the two indexed commits starting with 496375f
+        canonical = repo_canonicalizer("redis/redis", ["496375f", INDEXED], self.index)
+        self.assertEqual(canonical("496375f"), "496375f")
+
+    def test_unindexed_repo(self):
+        canonical = repo_canonicalizer("netdata/netdata", ["abc1234", OTHER], self.index)
+        self.assertEqual(canonical("abc1234"), OTHER)
+
+    @unittest.skipIf(pandas is None, "pandas is not installed")
+    def test_csv(self):
+        input_path, output_path = os.path.join(self.tmp, "in.csv"), os.path.join(self.tmp, "out.csv")
+        rows = [
+            ["redis/redis", INDEXED, UNINDEXED],
+            ["redis/redis", "496375fc", "0b645d6"],
+            ["netdata/netdata", OTHER, "def5678"],
+            ["netdata/netdata", "abc1234", "def5678"],
+            ["netdata/netdata", "abc1234", "fedcba9"],
+        ]
+        with open(input_path, "w", newline="", encoding="utf-8") as file:
+            csv.writer(file).writerows(rows)
+        deduplicate_commits_csv(input_path, output_path, index=self.index)
+        with open(output_path, newline="", encoding="utf-8") as file:
+            self.assertEqual(list(csv.reader(file)), [rows[0], rows[2], rows[4]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+graphql_batch against a local stub GraphQL endpoint: aliased batch queries, parsing of the answers
+into commit facts, and the REST fallback for changed files.
+"""
+
+import http.server
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COMMITS = {
+    ("redis/redis", "496375f"): {
+        "oid": "496375fc36134c72461e6fb97f314be3daa7fb1a", "message": "Fix crash in ziplist",
+        "authoredDate": "2021-03-01T12:00:00+01:00", "changedFiles": 2, "additions": 10, "deletions": 3,
+    },
+    ("redis/redis", "0b645d6"): {
+        "oid": "0b645d6e26b4e7d1aa1cbf1a5e7eb2c5b2e66a1d", "message": "Add tests",
+        "authoredDate": "2021-03-02T08:30:00Z", "changedFiles": 1, "additions": 40, "deletions": 0,
+    },
+    ("netdata/netdata", "abc1234"): {
+        "oid": "abc1234000000000000000000000000000000000", "message": "Fix leak",
+        "authoredDate": "2020-12-31T23:00:00-02:00", "changedFiles": 1, "additions": 1, "deletions": 1,
+    },
+}
+REST_FILES = {
+    "496375fc36134c72461e6fb97f314be3daa7fb1a": [
+        {"filename": "src/ziplist.c", "additions": 8, "deletions": 3, "changes": 11, "status": "modified"},
+        {"filename": "tests/ziplist.tcl", "additions": 2, "deletions": 0, "changes": 2, "status": "modified"},
+    ],
+}
+
+_REPO_BLOCK = re.compile(r'(r\d+): repository\(owner: ("[^"]*"), name: ("[^"]*")\) \{(.*?\}\s*\}\s*)\}')
+_COMMIT = re.compile(r'(c\d+): object\(expression: ("[^"]*")\)')
+
+
+class StubGitHub(http.server.BaseHTTPRequestHandler):
+    """
+    Answers aliased commit queries like GitHub does (unknown commits null their alias and add an
+    error), and REST commit lookups for REST_FILES.
+    """
+    queries = []
+
+    def _reply(self, status: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["query"]
+        StubGitHub.queries.append(query)
+        data, errors = {}, []
+        for repo_alias, owner, name, body in _REPO_BLOCK.findall(query):
+            repo = f"{json.loads(owner)}/{json.loads(name)}"
+            data[repo_alias] = {}
+            for commit_alias, expression in _COMMIT.findall(body):
+                commit = COMMITS.get((repo, json.loads(expression)))
+                data[repo_alias][commit_alias] = commit
+                if commit is None:
+                    errors.append({"type": "NOT_FOUND", "message": f"Could not resolve {expression}"})
+        self._reply(200, {"data": data, **({"errors": errors} if errors else {})})
+
+    def do_GET(self):
+        sha = self.path.rstrip("/").rsplit("/", 1)[-1]
+        if sha in REST_FILES:
+            self._reply(200, {"sha": sha, "commit": {"message": ""}, "files": REST_FILES[sha]})
+        else:
+            self._reply(404, {"message": "Not Found"})
+
+    def log_message(self, *args):
+        pass
+
+
+# The API base URL and caches are read when github_api is imported: start the stub first
+_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubGitHub)
+threading.Thread(target=_server.serve_forever, daemon=True).start()
+_workdir = tempfile.mkdtemp(prefix="test_graphql_")
+os.environ.update({
+    "GITHUB_API_URL": f"http://127.0.0.1:{_server.server_port}",
+    "GITHUB_CACHE_PATH": os.path.join(_workdir, "cache.sqlite"),
+    "METRICS_DIR": "",
+})
+
+import graphql_batch  # noqa: E402
+from graphql_batch import GraphQLCommitSource, build_commit_query, fetch_commits_batch  # noqa: E402
+
+
+class BuildCommitQueryTest(unittest.TestCase):
+    def test_groups_pairs_by_repo_under_aliases(self):
+        query, aliases = build_commit_query([
+            ("redis/redis", "496375f"), ("netdata/netdata", "abc1234"), ("redis/redis", "0b645d6"),
+        ])
+        self.assertEqual(query.count("repository("), 2)
+        self.assertEqual(aliases, {
+            ("r0", "c0"): ("redis/redis", "496375f"),
+            ("r0", "c1"): ("redis/redis", "0b645d6"),
+            ("r1", "c0"): ("netdata/netdata", "abc1234"),
+        })
+
+    def test_escapes_string_literals(self):
+        query, _ = build_commit_query([('own"er/name', 'a"b')])
+        self.assertIn('owner: "own\\"er"', query)
+        self.assertIn('expression: "a\\"b"', query)
+
+
+class FetchCommitsBatchTest(unittest.TestCase):
+    def setUp(self):
+        StubGitHub.queries.clear()
+
+    def test_batches_and_parses_answers(self):
+        pairs = list(COMMITS) + [("redis/redis", "deadbee"), ("redis/redis", "496375f")]
+        results = fetch_commits_batch(pairs, url=graphql_batch.GITHUB_GRAPHQL_URL, batch_size=2)
+
+        # 4 distinct pairs, 2 per query
+        self.assertEqual(len(StubGitHub.queries), 2)
+        self.assertEqual(set(results), set(COMMITS))
+        commit = results[("redis/redis", "496375f")]
+        self.assertEqual(commit["oid"], "496375fc36134c72461e6fb97f314be3daa7fb1a")
+        # Author dates are normalised to UTC, like the REST API
+        self.assertEqual(commit["authoredDate"], "2021-03-01T11:00:00Z")
+        self.assertEqual(results[("netdata/netdata", "abc1234")]["authoredDate"], "2021-01-01T01:00:00Z")
+
+
+class GraphQLCommitSourceTest(unittest.TestCase):
+    def setUp(self):
+        StubGitHub.queries.clear()
+        self.source = GraphQLCommitSource(url=graphql_batch.GITHUB_GRAPHQL_URL)
+
+    def test_prefetched_lookups_are_answered_from_memory(self):
+        self.source.prefetch(list(COMMITS))
+        self.assertEqual(len(StubGitHub.queries), 1)
+        self.assertEqual(self.source.resolve_sha("redis/redis", "0b645d6"), "0b645d6e26b4e7d1aa1cbf1a5e7eb2c5b2e66a1d")
+        self.assertEqual(self.source.get_message("netdata/netdata", "abc1234"), "Fix leak")
+        self.assertEqual(self.source.get_stats("redis/redis", "0b645d6"),
+                         {"files_count": 1, "additions": 40, "deletions": 0})
+        self.assertEqual(len(StubGitHub.queries), 1)
+
+    def test_missing_commit(self):
+        self.assertEqual(self.source.resolve_sha("redis/redis", "deadbee"), "")
+        self.assertEqual(self.source.get_stats("redis/redis", "deadbee"),
+                         {"files_count": 0, "additions": 0, "deletions": 0})
+        self.assertEqual(self.source.get_files("redis/redis", "deadbee"), [])
+
+    def test_files_come_from_rest(self):
+        files = self.source.get_files("redis/redis", "496375f")
+        self.assertEqual([file["filename"] for file in files], ["src/ziplist.c", "tests/ziplist.tcl"])
+        self.assertEqual(files[0], {"filename": "src/ziplist.c", "additions": 8, "deletions": 3, "changes": 11})
+
+
+if __name__ == "__main__":
+    unittest.main()
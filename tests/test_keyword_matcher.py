@@ -0,0 +1,74 @@
+"""
+KeywordMatcher against plain substring search, on the bug0 / bug1 keyword lists and on random texts
+built from keyword fragments (overlapping variants like "fix " / " fixed" / "fixes ").
+"""
+
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("METRICS_DIR", "")
+
+from collect_regression_commits import bug0_keywords, bug1_keywords  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+
+MESSAGES = [
+    "Fix crash in ziplist when the list is empty",
+    "fixed a regression introduced by 496375f",
+    "This fixes the heap overflow reported in issue #12",
+    "Revert \"avoid double close\"\n\nCaused by a4c1b2e, regressed by 0b645d6",
+    "Update README",
+    "prefix fixes suffix",
+    "fix",
+    "",
+    "stack-wanted: steps to reproduce the hang in differential testing",
+]
+
+
+def substring_find(keywords, text: str) -> list:
+    return [keyword for keyword in dict.fromkeys(keywords) if keyword in text]
+
+
+def random_texts(keywords, count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    fragments = keywords + [" ", "x", "fi", "xed", "es", "a ", " b", "\n", "ü"]
+    texts = []
+    for _ in range(count):
+        text = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 8)))
+        # Cut keywords in half at the edges too
+        texts.append(text[rng.randint(0, 3):])
+    return texts
+
+
+class KeywordMatcherTest(unittest.TestCase):
+    def check(self, keywords, texts):
+        matcher = KeywordMatcher(keywords)
+        for text in texts:
+            with self.subTest(text=text):
+                expected = substring_find(keywords, text)
+                self.assertEqual(matcher.find(text), expected)
+                self.assertEqual(matcher.contains_any(text), bool(expected))
+        self.assertEqual(matcher.find_many(texts), [substring_find(keywords, text) for text in texts])
+
+    def test_bug0_keywords(self):
+        self.check(bug0_keywords, MESSAGES + random_texts(bug0_keywords, 500))
+
+    def test_bug1_keywords(self):
+        self.check(bug1_keywords, MESSAGES + random_texts(bug1_keywords, 200, seed=1))
+
+    def test_duplicates_are_reported_once(self):
+        matcher = KeywordMatcher(["crash", "leak", "crash"])
+        self.assertEqual(matcher.keywords, ["crash", "leak"])
+        self.assertEqual(matcher.find("leak after crash"), ["crash", "leak"])
+
+    def test_keywords_sharing_a_core(self):
+        keywords = ["fix ", " fix", "fixed ", "prefix", "x"]
+        self.check(keywords, ["prefix", "fixed it", "a fix", "x", "fi x", "fixe"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+MemoryBugClassifier against the per-pattern loop it replaced: same labels, in the same order,
+for texts hitting every bug type, several of them, none, and non-ASCII text.
+"""
+
+import os
+import re
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("METRICS_DIR", "")
+
+from collect_memory_related_chains import (  # noqa: E402
+    MemoryBugClassifier, match_memory_bug_type, memory_bug_patterns,
+)
+
+TEXTS = [
+    "Fix null pointer dereference in parser",
+    "avoid NULL ptr access when the list is empty",
+    "Fix segfault on startup (SIGSEGV in main)",
+    "heap-buffer-overflow in ziplistFind",
+    "stack based buffer overrun when the name is long",
+    "Fix invalid read of size 4 reported by valgrind",
+    "integer overflow in size computation; wrap around on 32 bit",
+    "Fix use-after-free of the client object",
+    "dangling pointer to the freed object",
+    "Fix memory leak in config rewrite: leaked 24 bytes",
+    "Direct leak of 7 byte(s) in 1 object(s) allocated from:",
+    "double free in error path, corrupted double-linked list",
+    "divide by zero when the interval is 0; division by 0",
+    "AddressSanitizer: heap-use-after-free; found by ubsan",
+    "invalid memory access, access violation on Windows",
+    "make sure only valid memory is accessed, no invalid access",
+    "index -1 out of range",
+    "Update README and bump version",
+    "",
+    # Non-ASCII: IGNORECASE folds "ſ" (long s) onto "s", so the literal prefilter must not skip it
+    "ſegfault while parsing",
+    "Fix use after free in café handling — see #123",
+    "null pointer dereference",
+]
+
+
+def loop_labels(text: str) -> list:
+    """
+    The labelling loop match_memory_bug_type used before the classifier.
+    """
+    matched = []
+    lower_text = text.lower()
+    for bug_type, patterns in memory_bug_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, lower_text, flags=re.IGNORECASE):
+                matched.append(bug_type)
+                break
+    return matched
+
+
+class MemoryBugClassifierTest(unittest.TestCase):
+    def test_same_labels_as_the_loop(self):
+        classifier = MemoryBugClassifier()
+        for text in TEXTS:
+            with self.subTest(text=text):
+                self.assertEqual(classifier.classify(text), loop_labels(text))
+                self.assertEqual(match_memory_bug_type(text), loop_labels(text))
+
+    def test_texts_cover_every_bug_type(self):
+        labels = {label for text in TEXTS for label in loop_labels(text)}
+        self.assertEqual(labels, set(memory_bug_patterns))
+
+    def test_classify_many(self):
+        classifier = MemoryBugClassifier()
+        self.assertEqual(classifier.classify_many(TEXTS), [loop_labels(text) for text in TEXTS])
+
+    def test_custom_patterns(self):
+        patterns = {"Leak": [r"\bleak"], "Race": [r"data[- ]race", r"\brace\b"]}
+        classifier = MemoryBugClassifier(patterns)
+        self.assertEqual(classifier.classify("Fix a data race and a leak"), ["Leak", "Race"])
+        self.assertEqual(classifier.classify("Trace output"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+get_repo_metadata against replayed answers: only the endpoints of the requested fields are asked,
+concurrent callers share one fetch, and a repo GitHub has nothing for is remembered until the TTL.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("METRICS_DIR", "")
+
+import github_api  # noqa: E402
+import repo_metadata  # noqa: E402
+from replay import ReplayServer, make_entry  # noqa: E402
+from repo_metadata import RepoMetadataStore, get_repo_metadata  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+
+class RepoMetadataTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="test_repo_metadata_")
+        cassette = {}
+        for entry in (
+            make_entry("GET", "/repos/redis/redis", 200, {"stargazers_count": 60000, "default_branch": "unstable"}),
+            make_entry("GET", "/repos/redis/redis/languages", 200, {"C": 1000, "Tcl": 200}),
+        ):
+            cassette.setdefault(entry["key"], []).append(entry)
+        self.server = ReplayServer(cassette).__enter__()
+        self._cache = github_api.get_cache.store
+        github_api.get_cache.store = ResponseCache(os.path.join(self.tmp, "cache.sqlite"))
+        self._url = mock.patch.object(repo_metadata, "GITHUB_API_URL", self.server.url)
+        self._url.start()
+        self.store = RepoMetadataStore(os.path.join(self.tmp, "repo_metadata.sqlite"))
+
+    def tearDown(self):
+        self._url.stop()
+        self.store.close()
+        github_api.get_cache.store.close()
+        github_api.get_cache.store = self._cache
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def requests(self) -> int:
+        return sum(self.server.statuses.values())
+
+    def test_only_requested_fields_are_fetched(self):
+        metadata = get_repo_metadata("redis/redis", store=self.store, fields=["languages"])
+        self.assertEqual(metadata["languages"], {"C": 1000, "Tcl": 200})
+        self.assertIsNone(metadata["stars"])
+        self.assertEqual(self.requests(), 1)
+
+        metadata = get_repo_metadata("redis/redis", store=self.store)
+        self.assertEqual((metadata["stars"], metadata["default_branch"]), (60000, "unstable"))
+        self.assertEqual(self.requests(), 2)
+        get_repo_metadata("redis/redis", store=self.store)
+        self.assertEqual(self.requests(), 2)
+
+    def test_concurrent_callers_share_one_fetch(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                get_repo_metadata("redis/redis", store=self.store, fields=["languages"])["languages"]))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{"C": 1000, "Tcl": 200}] * 8)
+        self.assertEqual(self.requests(), 1)
+
+    def test_missing_repo_is_only_asked_again_after_the_ttl(self):
+        for _ in range(3):
+            metadata = get_repo_metadata("gone/gone", store=self.store)
+        self.assertIsNone(metadata["stars"])
+        self.assertIsNone(metadata["languages"])
+        self.assertIsNotNone(metadata["languages_fetched_at"])
+        self.assertEqual(self.server.statuses, {404: 2})
+
+        get_repo_metadata("gone/gone", store=self.store, ttl=-1, fields=["languages"])
+        self.assertEqual(self.server.statuses, {404: 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
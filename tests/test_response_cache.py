@@ -0,0 +1,92 @@
+"""
+cached_get() and the response cache against replayed answers: fresh entries are served without a
+request, stale ones are revalidated with If-None-Match (a 304 keeps the stored body, a 200 replaces
+it), and errors are never stored.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("METRICS_DIR", "")
+
+import github_api  # noqa: E402
+from replay import ReplayServer, make_entry  # noqa: E402
+from response_cache import CachedResponse, ResponseCache, conditional_headers, make_cache_key  # noqa: E402
+
+PATH = "/repos/redis/redis/languages"
+
+
+class CachedGetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="test_response_cache_")
+        cassette = {}
+        for entry in (
+            make_entry("GET", PATH, 200, {"C": 100}, headers={"ETag": '"v1"'}),
+            make_entry("GET", PATH, 200, {"C": 120}, headers={"ETag": '"v2"'}),
+            make_entry("GET", "/repos/redis/missing", 404, {"message": "Not Found"}),
+        ):
+            cassette.setdefault(entry["key"], []).append(entry)
+        self.server = ReplayServer(cassette).__enter__()
+        self.url = self.server.url + PATH
+        self._cache = github_api.get_cache.store
+        github_api.get_cache.store = ResponseCache(os.path.join(self.tmp, "cache.sqlite"))
+
+    def tearDown(self):
+        github_api.get_cache.store.close()
+        github_api.get_cache.store = self._cache
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def get(self, url: str = None, ttl: int = 0):
+        return github_api.cached_get(url or self.url, ttl=ttl)
+
+    def test_fresh_entry_is_served_without_a_request(self):
+        self.assertEqual(self.get().json(), {"C": 100})
+        response = self.get(ttl=3600)
+        self.assertTrue(getattr(response, "from_cache", False))
+        self.assertEqual(response.json(), {"C": 100})
+        self.assertEqual(self.server.statuses, {200: 1})
+
+    def test_stale_entry_is_revalidated_with_its_etag(self):
+        self.assertEqual(self.get().json(), {"C": 100})
+        # The resource changed: the conditional request gets the new body, which replaces the entry
+        self.assertEqual(self.get().json(), {"C": 120})
+        # Unchanged since: 304, answered from the stored entry
+        response = self.get()
+        self.assertTrue(getattr(response, "from_cache", False))
+        self.assertEqual(response.json(), {"C": 120})
+        self.assertEqual(self.server.statuses, {200: 2, 304: 1})
+        # The 304 made the entry fresh again
+        _, age = github_api.get_cache().lookup(make_cache_key(self.url))
+        self.assertLess(age, 60)
+
+    def test_errors_are_not_stored(self):
+        url = self.server.url + "/repos/redis/missing"
+        self.assertEqual(self.get(url, ttl=3600).status_code, 404)
+        self.assertEqual(self.get(url, ttl=3600).status_code, 404)
+        self.assertIsNone(github_api.get_cache().lookup(make_cache_key(url)))
+        self.assertEqual(self.server.statuses, {404: 2})
+
+
+class CacheKeyTest(unittest.TestCase):
+    def test_params_order_does_not_matter(self):
+        self.assertEqual(make_cache_key("u", {"page": 2, "per_page": 100}),
+                         make_cache_key("u", {"per_page": 100, "page": 2}))
+        self.assertEqual(make_cache_key("u"), "u")
+
+    def test_conditional_headers(self):
+        cached = CachedResponse("u", 200, {"etag": '"v1"', "Last-Modified": "Mon, 01 Mar 2021 12:00:00 GMT"}, b"{}")
+        self.assertEqual(conditional_headers(cached), {
+            "If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Mar 2021 12:00:00 GMT",
+        })
+        self.assertEqual(conditional_headers(CachedResponse("u", 200, {}, b"{}")), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+ResultWriter crash safety: a reopened output is cut back to its last checkpoint and resumes after
+the committed keys, and no key reaches the journal before its rows are fsync'ed.
+"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import result_writer  # noqa: E402
+from result_writer import ResultWriter, discard  # noqa: E402
+
+HEADER = ["repo", "BIC_sha", "BFC_sha"]
+
+
+def read_rows(path: str) -> list:
+    with open(path, newline="", encoding="utf-8") as file:
+        return list(csv.reader(file))
+
+
+class ResultWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="test_result_writer_")
+        self.path = os.path.join(self.tmp, "out.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_resume_skips_committed_keys(self):
+        with ResultWriter(self.path, header=HEADER) as writer:
+            writer.write(["a", "1"], ["a", "1", "x"])
+            writer.write(["b", "2"])  # processed, no output row
+        with ResultWriter(self.path, header=HEADER) as writer:
+            self.assertTrue(writer.done(["a", "1"]))
+            self.assertTrue(writer.done(("b", "2")))
+            self.assertFalse(writer.done(["c", "3"]))
+            writer.write(["c", "3"], ["c", "3", "y, with a comma"])
+        self.assertEqual(read_rows(self.path), [HEADER, ["a", "1", "x"], ["c", "3", "y, with a comma"]])
+
+    def test_crash_after_checkpoint_is_truncated(self):
+        writer = ResultWriter(self.path, header=HEADER, flush_rows=2)
+        writer.write("a", ["a", "1", "x"])
+        writer.write("b", ["b", "2", "x"])  # checkpoint
+        writer.write("c", ["c", "3", "x"])  # still pending when the process dies
+        # A batch of the crashed run reached the CSV, its checkpoint didn't
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("c,3,x\nd,4,half a li")
+        with open(self.path + ".journal", "a", encoding="utf-8") as journal:
+            journal.write('{"offset": 99')
+        writer._file.close()
+
+        with ResultWriter(self.path, header=HEADER) as writer:
+            self.assertTrue(writer.done("b"))
+            self.assertFalse(writer.done("c"))
+            writer.write("c", ["c", "3", "x"])
+        self.assertEqual(read_rows(self.path), [HEADER, ["a", "1", "x"], ["b", "2", "x"], ["c", "3", "x"]])
+
+    def test_rows_are_fsynced_before_their_keys_are_journaled(self):
+        writer = ResultWriter(self.path, header=HEADER)
+        events = []
+        fsync = os.fsync
+
+        def record(fd):
+            target = "csv" if fd == writer._file.fileno() else "journal"
+            with open(writer.journal_path, encoding="utf-8") as journal:
+                events.append((target, '"k"' in journal.read(), os.path.getsize(self.path)))
+            fsync(fd)
+
+        with mock.patch.object(result_writer.os, "fsync", side_effect=record):
+            writer.write("k", ["k", "1", "x"])
+            writer.flush()
+        writer.close()
+        size = os.path.getsize(self.path)
+        # The CSV is synced with the row and before the key is in the journal; then the journal is
+        self.assertEqual(events, [("csv", False, size), ("journal", True, size)])
+
+    def test_output_without_journal_is_kept(self):
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("repo,BIC_sha,BFC_sha\nold,1,x\n")
+        with ResultWriter(self.path, header=HEADER) as writer:
+            writer.write("new", ["new", "2", "x"])
+        self.assertEqual(read_rows(self.path), [HEADER, ["old", "1", "x"], ["new", "2", "x"]])
+
+    def test_discard(self):
+        with ResultWriter(self.path, header=HEADER) as writer:
+            writer.write("a", ["a", "1", "x"])
+        discard(self.path)
+        self.assertFalse(os.path.exists(self.path) or os.path.exists(self.path + ".journal"))
+        with ResultWriter(self.path, header=HEADER) as writer:
+            self.assertFalse(writer.done("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
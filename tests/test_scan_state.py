@@ -0,0 +1,119 @@
+"""
+Incremental commit scanning (iter_commit_messages + ScanState) against a replayed commit listing:
+an interrupted scan resumes after its last finished page, and a rerun only pages through the
+commits newer than the last completed scan.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("METRICS_DIR", "")
+
+import collect_regression_commits  # noqa: E402
+import github_api  # noqa: E402
+import sha_index  # noqa: E402
+from replay import ReplayServer, make_entry  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from scan_state import ScanState  # noqa: E402
+
+REPO = "redis/redis"
+PATH = f"/repos/{REPO}/commits"
+
+
+def commit(number: int) -> dict:
+    date = f"2021-01-01T00:{number // 60:02d}:{number % 60:02d}Z"
+    return {"sha": f"{number:040x}", "commit": {"message": f"commit {number}", "committer": {"date": date}}}
+
+
+def listing(commits, page: int, since: str = None) -> dict:
+    query = f"per_page=100&page={page}" + (f"&since={since}" if since else "")
+    return make_entry("GET", PATH, 200, commits[(page - 1) * 100:page * 100], query)
+
+
+# 250 commits, newest first: pages of 100, 100 and 50
+HISTORY = [commit(number) for number in range(250, 0, -1)]
+HEAD_DATE = HISTORY[0]["commit"]["committer"]["date"]
+# Commits pushed after the first scan; GitHub's `since` also returns the commit at that date
+NEW = [commit(number) for number in range(253, 250, -1)]
+NEW_HEAD_DATE = NEW[0]["commit"]["committer"]["date"]
+
+
+class IncrementalScanTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="test_scan_state_")
+        entries = [listing(HISTORY, page) for page in (1, 2, 3, 4)]
+        entries += [listing(NEW + HISTORY[:1], page, since=HEAD_DATE) for page in (1, 2)]
+        entries += [listing(NEW[:1], page, since=NEW_HEAD_DATE) for page in (1, 2)]
+        cassette = {}
+        for entry in entries:
+            cassette.setdefault(entry["key"], []).append(entry)
+        self.server = ReplayServer(cassette).__enter__()
+
+        self._cache, self._index = github_api.get_cache.store, sha_index.get_sha_index.store
+        github_api.get_cache.store = ResponseCache(os.path.join(self.tmp, "cache.sqlite"))
+        sha_index.get_sha_index.store = sha_index.ShaIndex(os.path.join(self.tmp, "sha_index.sqlite"))
+        self._url = mock.patch.object(collect_regression_commits, "GITHUB_API_URL", self.server.url)
+        self._url.start()
+        self.state = ScanState(os.path.join(self.tmp, "scan_state.sqlite"))
+
+    def tearDown(self):
+        self._url.stop()
+        self.state.close()
+        github_api.get_cache.store.close()
+        sha_index.get_sha_index.store.close()
+        github_api.get_cache.store, sha_index.get_sha_index.store = self._cache, self._index
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def scan(self, limit: int = None) -> list:
+        shas = []
+        commits = collect_regression_commits.iter_commit_messages(REPO, state=self.state, discovery="scan")
+        for sha, _ in commits:
+            shas.append(sha)
+            if len(shas) == limit:
+                # Interrupted: the generator is dropped mid-page
+                commits.close()
+                break
+        return shas
+
+    def test_interrupted_scan_resumes_after_last_finished_page(self):
+        self.assertEqual(len(self.scan(limit=150)), 150)
+        cursor = self.state.get(REPO)
+        self.assertEqual(cursor["pending_sha"], HISTORY[0]["sha"])
+        self.assertEqual(cursor["last_page"], 1)
+        self.assertIsNone(cursor["newest_sha"])
+
+        # Page 2 was cut short: it is scanned again, page 1 isn't
+        self.assertEqual(self.scan(), [item["sha"] for item in HISTORY[100:]])
+        cursor = self.state.get(REPO)
+        self.assertEqual((cursor["newest_sha"], cursor["newest_date"]), (HISTORY[0]["sha"], HEAD_DATE))
+        self.assertIsNone(cursor["pending_sha"])
+        self.assertEqual(cursor["last_page"], 0)
+
+    def test_rerun_only_fetches_newer_commits(self):
+        self.assertEqual(len(self.scan()), len(HISTORY))
+        self.server.reset_counts()
+
+        self.assertEqual(self.scan(), [item["sha"] for item in NEW])
+        # One page with `since`, stopping at the previous head
+        self.assertEqual(sum(self.server.statuses.values()), 1)
+        self.assertFalse(self.server.unmatched)
+        cursor = self.state.get(REPO)
+        self.assertEqual(cursor["newest_sha"], NEW[0]["sha"])
+        self.assertIsNone(cursor["pending_sha"])
+
+        # Nothing new: the rerun yields nothing and the boundary stays
+        self.assertEqual(self.scan(), [])
+        self.assertEqual(self.state.get(REPO)["newest_sha"], NEW[0]["sha"])
+        self.assertFalse(self.server.unmatched)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+TokenPool scheduling: the token with the most quota left goes first, quotas and throttling are
+tracked per rate-limit resource, and a throttled request is retried with another token
+(replayed 403 -> 200, without sleeping).
+"""
+
+import os
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("METRICS_DIR", "")
+
+import github_api  # noqa: E402
+import token_pool  # noqa: E402
+from replay import ReplayServer, make_entry  # noqa: E402
+from token_pool import TokenPool, resource_for  # noqa: E402
+
+
+def quota(remaining: int, reset_in: float = 3600) -> SimpleNamespace:
+    return SimpleNamespace(headers={"X-RateLimit-Remaining": str(remaining),
+                                    "X-RateLimit-Reset": str(int(time.time() + reset_in))})
+
+
+class TokenPoolTest(unittest.TestCase):
+    def test_resource_for(self):
+        self.assertEqual(resource_for("https://api.github.com/graphql"), "graphql")
+        self.assertEqual(resource_for("https://api.github.com/search/commits"), "search")
+        self.assertEqual(resource_for("https://api.github.com/repos/a/b/commits"), "core")
+
+    def test_most_quota_left_goes_first(self):
+        pool = TokenPool(["token-a", "token-b", "token-a", ""])
+        self.assertEqual(pool.tokens, ["token-a", "token-b"])
+        pool.update("token-a", "core", quota(2))
+        pool.update("token-b", "core", quota(3))
+        # Requests in flight count against the quota; ties go to the token listed first
+        self.assertEqual([pool.acquire("core") for _ in range(5)],
+                         ["token-b", "token-a", "token-b", "token-a", "token-b"])
+
+    def test_quotas_are_per_resource(self):
+        pool = TokenPool(["token-a", "token-b"])
+        pool.update("token-a", "core", quota(0))
+        pool.update("token-b", "core", quota(100))
+        self.assertEqual(pool.acquire("core"), "token-b")
+        self.assertEqual(pool.acquire("search"), "token-a")
+
+    def test_throttled_token_leaves_rotation_for_its_resource(self):
+        pool = TokenPool(["token-a", "token-b"])
+        pool.update("token-b", "core", quota(10))
+        self.assertTrue(pool.update("token-a", "core", quota(4000), delay=60))
+        self.assertEqual(pool.acquire("core"), "token-b")
+        self.assertEqual(pool.acquire("graphql"), "token-a")
+        self.assertFalse(pool.update("token-b", "core", quota(9)))
+
+    def test_sleeps_until_a_token_is_back(self):
+        pool = TokenPool(["token-a"])
+        pool.update("token-a", "core", quota(0, reset_in=30))
+        sleeps = []
+
+        def sleep(delay):
+            sleeps.append(delay)
+            pool.update("token-a", "core", quota(5000))
+
+        with mock.patch("token_pool.time.sleep", side_effect=sleep):
+            self.assertEqual(pool.acquire("core"), "token-a")
+        self.assertEqual(len(sleeps), 1)
+        self.assertAlmostEqual(sleeps[0], 30, delta=2)
+
+    def test_reserve_is_left_to_other_processes(self):
+        pool = TokenPool(["token-a", "token-b"], reserve=2)
+        pool.update("token-a", "core", quota(2))
+        pool.update("token-b", "core", quota(3))
+        self.assertEqual(pool.acquire("core"), "token-b")
+
+    def test_authorize_keeps_the_scheme(self):
+        self.assertEqual(TokenPool.authorize({"Authorization": "bearer old"}, "new"), {"Authorization": "bearer new"})
+        self.assertEqual(TokenPool.authorize({}, "new"), {"Authorization": "token new"})
+        self.assertIsNone(TokenPool.authorize(None, None))
+
+
+class ThrottledRequestTest(unittest.TestCase):
+    def test_throttled_request_is_retried_with_another_token(self):
+        path = "/repos/redis/redis"
+        cassette = {}
+        for entry in (
+            make_entry("GET", path, 403, {"message": "API rate limit exceeded"},
+                       headers={"X-RateLimit-Remaining": "0"}, reset_in=3600),
+            make_entry("GET", path, 200, {"full_name": "redis/redis"},
+                       headers={"X-RateLimit-Remaining": "4999"}, reset_in=3600),
+        ):
+            cassette.setdefault(entry["key"], []).append(entry)
+
+        pool = TokenPool(["token-a", "token-b"])
+        with ReplayServer(cassette) as server, mock.patch.object(token_pool, "_pool", pool), \
+                mock.patch("time.sleep") as sleep:
+            response = github_api.github_get(server.url + path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(server.statuses, {403: 1, 200: 1})
+        sleep.assert_not_called()
+        # token-a is out of rotation for core until the reset, token-b served the retry
+        self.assertEqual(pool.acquire("core"), "token-b")
+        self.assertEqual(pool._quota[("token-b", "core")][0], 4998)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Pool of GitHub tokens shared by every request made through github_api.py.
+Each request is sent with the token that has the most quota left, as reported by the
+X-RateLimit-Remaining / X-RateLimit-Reset headers of its previous responses. Quotas are tracked
+per rate-limit resource (core, search, graphql), since GitHub counts them separately.
+A token that runs out (or is throttled) is taken out of rotation until its reset time;
+the caller only sleeps when every token is out.
+Quotas are per token on GitHub's side, but each process has its own pool. Several processes using
+the same tokens (parallel_scan.py) each see the remaining quota of their last response, which
+doesn't count the other processes' requests in flight: `reserve` requests of every token are kept
+for those, and a request that still overshoots gets a 403 and takes its token out of rotation.
+
+GITHUB_TOKENS        -> comma-separated tokens (falls back to GITHUB_TOKEN)
+GITHUB_TOKEN_RESERVE -> requests of each token's quota left to other processes (default: 0)
+"""
+
+import os
+import threading
+import time
+
+from metrics import get_metrics
+
+
+def resource_for(url: str) -> str:
+    """
+    Rate-limit resource a request to `url` is counted against.
+    """
+    if url.rstrip("/").endswith("/graphql"):
+        return "graphql"
+    if "/search/" in url:
+        return "search"
+    return "core"
+
+
+def _label(token) -> str:
+    return f"token ...{token[-4:]}" if token else "anonymous access"
+
+
+class TokenPool:
+    def __init__(self, tokens, reserve: int = 0):
+        # None stands for "no token": requests go out with the caller's headers as they are
+        self.tokens = list(dict.fromkeys(token for token in tokens if token)) or [None]
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        # (token, resource) -> [remaining, reset timestamp]
+        self._quota = {}
+        # (token, resource) -> timestamp until which the token is out of rotation
+        self._blocked = {}
+
+    def _remaining(self, key, now: float) -> float:
+        if self._blocked.get(key, 0) > now:
+            return 0
+        remaining, reset_at = self._quota.get(key, (None, 0))
+        if remaining is None or reset_at <= now:
+            # Never used, or the window has been reset since: try it first
+            return float("inf")
+        return remaining - self.reserve
+
+    def acquire(self, resource: str = "core"):
+        """
+        Return the token with the most quota left for `resource`, sleeping until the earliest
+        reset if all of them are exhausted.
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                # Most quota left wins; ties go to the token listed first
+                remaining, token = max(
+                    ((self._remaining((token, resource), now), token) for token in self.tokens),
+                    key=lambda candidate: candidate[0],
+                )
+                if remaining > 0:
+                    quota = self._quota.get((token, resource))
+                    if quota is not None and remaining != float("inf"):
+                        # Count requests in flight, so concurrent callers spread over the tokens
+                        quota[0] -= 1
+                    return token
+                wake_at = min(
+                    max(self._blocked.get((token, resource), 0), self._quota.get((token, resource), (0, 0))[1])
+                    for token in self.tokens
+                )
+            delay = max(wake_at - time.time(), 1)
+            print(f"[WAIT] All {len(self.tokens)} token(s) exhausted for {resource}, sleeping {delay:.0f}s")
+            get_metrics().add_sleep(f"rate_limit_{resource}", delay)
+            time.sleep(delay)
+
+    def update(self, token, resource: str, response, delay: float = 0) -> bool:
+        """
+        Record the quota reported by `response`. `delay` > 0 means the response was throttled:
+        the token is then taken out of rotation until its reset (or for `delay` seconds)
+        and True is returned, telling the caller to retry the request.
+        """
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        with self._lock:
+            key = (token, resource)
+            if remaining is not None and remaining.isdigit() and reset is not None and reset.isdigit():
+                self._quota[key] = [int(remaining), int(reset)]
+            if not delay:
+                return False
+            self._blocked[key] = time.time() + delay
+        print(f"[WAIT] {_label(token)} throttled for {resource}, out of rotation for {delay:.0f}s")
+        return True
+
+    @staticmethod
+    def authorize(headers: dict, token) -> dict:
+        """
+        Return `headers` with the Authorization set to `token`, keeping the caller's scheme (token / bearer).
+        """
+        if token is None:
+            return headers
+        headers = dict(headers or {})
+        scheme = headers.get("Authorization", "token").split(" ", 1)[0]
+        headers["Authorization"] = f"{scheme} {token}"
+        return headers
+
+
+_pool = None
+
+
+def get_token_pool() -> TokenPool:
+    """
+    Build the shared pool from GITHUB_TOKENS (or GITHUB_TOKEN) on first use, i.e. on the first live request.
+    """
+    global _pool
+    if _pool is None:
+        tokens = os.getenv("GITHUB_TOKENS") or os.getenv("GITHUB_TOKEN") or ""
+        _pool = TokenPool((token.strip() for token in tokens.split(",")),
+                          reserve=int(os.getenv("GITHUB_TOKEN_RESERVE", 0)))
+        if len(_pool.tokens) > 1:
+            print(f"[INFO] Using a pool of {len(_pool.tokens)} GitHub tokens")
+        elif _pool.tokens == [None]:
+            # Checked here, on the first live request, rather than when a script is imported
+            print("[WARN] GITHUB_TOKEN (or GITHUB_TOKENS) is not set, using anonymous access (60 requests / hour)")
+    return _pool